@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
+from collections import deque
 from datetime import datetime
 import io
+import os
 import time
 import streamlit.components.v1 as components
 
@@ -12,11 +14,9 @@ from bot.constants import (
     PLAN_URL,
     USER_AGENT,
 )
-from bot.manager import GlobalManager
+from bot.manager import GlobalManager, LOG_FEED_SIZE
+from bot.remote import RemoteManager
 from bot.jsf import form_verilerini_topla
-from bot.scheduler import safe_run
-from bot.auth import login, fetch_accounts_backend, switch_account_backend
-from bot.drafts import veriyi_dataframe_yap
 
 
 
@@ -39,17 +39,93 @@ try:
 except:
     TEAMS_WEBHOOK_URL = ""
 
+# Set when the bot runs in its own process (python -m bot.worker); the UI is then only a client
+BOT_WORKER_URL = os.environ.get("BOT_WORKER_URL", "")
+BOT_WORKER_TOKEN = os.environ.get("BOT_WORKER_TOKEN", "")
+
 # --- FONKSİYONLAR ---
 
 
 @st.fragment(run_every=2)  # <--- SİHİRLİ DOKUNUŞ: 2 saniyede bir çalışır
 def canli_loglari_goster(manager):
     st.info("⚡ Canlı Log Akışı (Otomatik Yenilenir)")
+    # Sekme başına imleç: her turda yalnızca yeni satırlar çekilir
+    akis = st.session_state.setdefault("log_feed", {"email": None, "seq": 0, "lines": deque(maxlen=LOG_FEED_SIZE), "text": ""})
+    if akis["email"] != manager.email:
+        akis.update(email=manager.email, seq=0, text="")
+        akis["lines"].clear()
+
+    yeni = manager.logs_since(akis["seq"])
+    if yeni["reset"]:
+        akis["lines"].clear()
+    if yeni["lines"] or yeni["reset"]:
+        akis["lines"].extend(yeni["lines"])
+        # En yeni üstte; metin yalnızca değişince yeniden kurulur
+        akis["text"] = "\n".join(reversed(akis["lines"]))
+    akis["seq"] = yeni["seq"]
+
     log_container = st.container(height=400)
     with log_container:
-        # En güncel logları çek
-        for log in manager.logs:
-            st.text(log)
+        # Tek öğe: içerik aynıysa tarayıcı tarafında yeniden çizim olmaz
+        st.text(akis["text"])
+
+LOG_PAGE_SIZE = 100
+
+def log_gecmisi(manager):
+    """Sayfalı log geçmişi (veritabanından, en yeniden eskiye)."""
+    st.subheader("🗂️ Log Geçmişi")
+    # Her sayfanın başlangıç imleci; None = en yeni sayfa
+    cursors = st.session_state.setdefault("log_page_cursors", [None])
+    rows = manager.get_log_page(before_id=cursors[-1], limit=LOG_PAGE_SIZE)
+
+    if rows:
+        st.dataframe(
+            pd.DataFrame(rows),
+            column_config={
+                "id": None,
+                "created_at": st.column_config.TextColumn("🕒 Zaman", width="medium"),
+                "type": st.column_config.TextColumn("Seviye", width="small"),
+                "account": st.column_config.TextColumn("Hesap", width="medium"),
+                "draft_key": st.column_config.TextColumn("Taslak", width="medium"),
+                "message": st.column_config.TextColumn("Mesaj", width="large"),
+            },
+            hide_index=True,
+            width="stretch"
+        )
+    else:
+        st.info("Kayıtlı log yok.")
+
+    newer_col, page_col, older_col = st.columns([1, 2, 1])
+    with newer_col:
+        if st.button("◀ Daha Yeni", disabled=len(cursors) == 1, width="stretch"):
+            cursors.pop()
+            st.rerun()
+    with page_col:
+        st.caption(f"Sayfa {len(cursors)}")
+    with older_col:
+        if st.button("Daha Eski ▶", disabled=len(rows) < LOG_PAGE_SIZE, width="stretch"):
+            cursors.append(rows[-1]["id"])
+            st.rerun()
+
+def http_izi(manager):
+    """Son döngünün adım bazında HTTP istek özeti."""
+    with st.expander("📊 Son Döngü HTTP Özeti"):
+        rows = manager.get_trace_summary()
+        if not rows:
+            st.caption("Henüz izlenmiş bir döngü yok.")
+            return
+        st.dataframe(
+            pd.DataFrame(rows),
+            column_config={
+                "grp": st.column_config.TextColumn("Adım"),
+                "requests": st.column_config.NumberColumn("İstek"),
+                "total_ms": st.column_config.NumberColumn("Toplam (ms)", format="%.0f"),
+                "max_ms": st.column_config.NumberColumn("En Uzun (ms)", format="%.0f"),
+                "bytes": st.column_config.NumberColumn("Bayt"),
+            },
+            hide_index=True,
+            width="stretch"
+        )
 
 @st.fragment(run_every=5)  # <--- 5 saniyede bir durum tablosunu yeniler
 def canli_takip_listesi(manager):
@@ -61,14 +137,14 @@ def canli_takip_listesi(manager):
     else:
         st.markdown("**:red[● DURDURULDU]**", help="Bot şu an işlem yapmıyor.")
 
-    # Tabloyu Getir
-    watch_df = manager.get_watch_list_df()
+    # Tabloyu Getir (sürüm değişmedikçe aynı anlık görüntü)
+    watch_tbl = manager.tasks_snapshot()
 
-    if not watch_df.empty:
+    if watch_tbl.num_rows:
         # Tabloyu salt okunur (static) gösterelim, düzenleme yapmak isterse kullanıcı durdurup yapsın
         # (Sürekli yenilenen tabloda edit yapmak zordur, imleç kaybolur)
         st.dataframe(
-            watch_df,
+            watch_tbl,
             column_config={
                 "account_name": "Hesap",
                 "name": "Taslak Adı",
@@ -163,21 +239,44 @@ def main():
                     st.error("Lütfen tüm alanları doldurun.")
                 else:
                     with st.spinner("Bağlanılıyor..."):
+                        # WORKER MODE: the worker keeps the managers, just log in there
+                        if BOT_WORKER_URL:
+                            try:
+                                remote_mgr, existing = RemoteManager.connect(
+                                    BOT_WORKER_URL, email_input, pass_input, TEAMS_WEBHOOK_URL, token=BOT_WORKER_TOKEN
+                                )
+                            except Exception as e:
+                                st.error(f"Bot servisine bağlanılamadı: {e}")
+                            else:
+                                if remote_mgr:
+                                    st.session_state.authenticated = True
+                                    st.session_state.my_manager = remote_mgr
+                                    if existing:
+                                        st.success("Aktif oturum bulundu, bağlanıldı!")
+                                        time.sleep(1)
+                                    st.rerun()
+                                else:
+                                    st.error("Giriş başarısız.")
+
                         # CHECK 1: Is there already a running bot for this user?
-                        if email_input in BOT_STORE:
+                        elif email_input in BOT_STORE:
                             existing_mgr = BOT_STORE[email_input]
-                            existing_mgr.password = pass_input 
-                            
-                            st.session_state.authenticated = True
-                            st.session_state.my_manager = existing_mgr
-                            st.success("Aktif oturum bulundu, bağlanıldı!")
-                            time.sleep(1)
-                            st.rerun()
+                            # The running bot is only handed over with this user's password
+                            if existing_mgr.sifre_dogrula(pass_input):
+                                existing_mgr.password = pass_input 
+                                
+                                st.session_state.authenticated = True
+                                st.session_state.my_manager = existing_mgr
+                                st.success("Aktif oturum bulundu, bağlanıldı!")
+                                time.sleep(1)
+                                st.rerun()
+                            else:
+                                st.error("Giriş başarısız.")
                         
                         # NO: This is a fresh login. Verify credentials first.
                         else:
                             temp_mgr = GlobalManager(email_input, pass_input, TEAMS_WEBHOOK_URL)
-                            success = login(temp_mgr)
+                            success = temp_mgr.giris_yap()
                             
                             if success:
                                 BOT_STORE[email_input] = temp_mgr
@@ -250,7 +349,15 @@ def main():
                 manager.mins_threshold = min_limit
                 if manager.is_running: manager.start_bot_process()
                 st.toast("✅ Zamanlayıcı güncellendi")
-            
+
+        # Paralellik Ayarı
+        with st.expander("Paralel İşlem"):
+            manager.max_parallel_drafts = st.number_input(
+                "Aynı anda en fazla taslak", min_value=1, max_value=16,
+                value=manager.max_parallel_drafts,
+                help="Bir kontrol döngüsünde aynı anda işlenen toplam taslak sayısı (hesap başına bir taslak)."
+            )
+
         st.divider()
         st.caption(f"Aktif Mil Sınır: **{manager.mile_threshold} Mil**")
         if manager.scheduler_mode == "interval":
@@ -327,14 +434,13 @@ def main():
     tab_selection, tab_dashboard, tab_logs = st.tabs([ "Taslak Seçimi", "Aktif Takip (Dashboard)", "Loglar"])
 
     with tab_dashboard:
-        if manager.history:
-            st.success(f"🎉 Toplam {len(manager.history)} işlemde fırsat yakalandı!")
-            
-            # Convert deque to DataFrame
-            history_df = pd.DataFrame(manager.history)
+        # Sürüm değişmedikçe aynı (değişmez) tablo kullanılır
+        history_tbl = manager.history_snapshot()
+        if history_tbl.num_rows:
+            st.success(f"🎉 Toplam {history_tbl.num_rows} işlemde fırsat yakalandı!")
             
             st.dataframe(
-                history_df,
+                history_tbl,
                 column_config={
                     "account": st.column_config.TextColumn("Hesap", width="medium"),
                     "name": st.column_config.TextColumn("📦 İşlenen Taslak", width="medium"),
@@ -346,7 +452,7 @@ def main():
             )
             
             if st.button("Geçmişi Temizle"):
-                manager.history.clear()
+                manager.clear_history()
                 st.rerun()
 
     with tab_selection:
@@ -370,26 +476,11 @@ def main():
                 st.caption("Hesap Değiştir")
                 
                 # DURUM 1: Henüz hesaplar çekilmediyse "Getir" butonu göster
+                # (liste bellekteki hesap dizininden gelir; sunucuya yalnızca butonla gidilir)
                 if not manager.available_accounts:
-                    with st.spinner("Hesaplar çekiliyor..."):
-                            if not manager.session.cookies: 
-                                login(manager)
-                            
-                            fetch_success = fetch_accounts_backend(manager)
-                            
-                            if fetch_success:
-                                st.success("Listelendi!")
-                                time.sleep(0.5)
-                                st.rerun()
-                            else:
-                                st.error("Çekilemedi.")
-                    # FIX: Logic is now INSIDE the button check
                     if st.button("Hesapları Getir", key="fetch_acc_btn", width="stretch"):
                         with st.spinner("Hesaplar çekiliyor..."):
-                            if not manager.session.cookies: 
-                                login(manager)
-                            
-                            fetch_success = fetch_accounts_backend(manager)
+                            fetch_success = manager.hesaplari_getir()
                             
                             if fetch_success:
                                 st.success("Listelendi!")
@@ -413,14 +504,22 @@ def main():
                                     width="stretch"):
                             
                             with st.spinner(f"{acc['name']} hesabına geçiliyor..."):
-                                success = switch_account_backend(manager, acc['id'])
+                                success = manager.hesap_degistir(acc['id'])
                                 if success:
                                     st.success("Geçiş yapıldı!")
                                     time.sleep(1)
                                     st.rerun()
                                 else:
                                     st.error("Geçiş başarısız.")
-        df, hata = veriyi_dataframe_yap(manager)
+
+                    # Hesap listesi günde bir kendiliğinden yenilenir; gerekirse elle
+                    if st.button("🔄 Listeyi Yenile", key="refresh_acc_btn", type="tertiary", width="stretch"):
+                        with st.spinner("Hesaplar çekiliyor..."):
+                            if manager.hesaplari_getir(yenile=True):
+                                st.rerun()
+                            else:
+                                st.error("Çekilemedi.")
+        df, hata = manager.taslaklari_getir()
         
         if df is not None and not df.empty:
             desired_order = [
@@ -490,6 +589,8 @@ def main():
 
     with tab_logs:
         canli_loglari_goster(manager)
+        log_gecmisi(manager)
+        http_izi(manager)
 
     
     # 1. BÖLÜM: TAKİP LİSTESİ YÖNETİMİ
@@ -522,16 +623,19 @@ def main():
                 if manager.scheduler_mode == "interval":
                     try:
                         # Trigger immediate run
-                        manager.scheduler.add_job(safe_run, 'date', run_date=datetime.now(), args=[manager])
+                        manager.run_now()
                         st.toast("Bot başlatıldı, ilk kontrol yapılıyor...")
                     except: pass
                 st.rerun()
             
     if manager.is_running:
-        job = manager.scheduler.get_job('user_task')
-        if job and job.next_run_time:
-            next_run = job.next_run_time.strftime("%H:%M:%S")
-            st.info(f"⏳ **Sonraki Planlanmış Çalışma:** {next_run}")
+        next_run_time = manager.next_run_time()
+        if next_run_time:
+            # Ofset ve rastgele sapma dahil gerçek çalışma zamanı
+            next_run = next_run_time.strftime("%H:%M:%S")
+            offset = manager.schedule_offset
+            kaydirma = f" (yük dağıtımı: +{offset // 60} dk {offset % 60} sn)" if offset else ""
+            st.info(f"⏳ **Sonraki Planlanmış Çalışma:** {next_run}{kaydirma}")
         else:
             st.warning("⚠️ Bot çalışıyor ama zamanlayıcı bulunamadı.")
 
@@ -539,7 +643,7 @@ def main():
     watch_df = manager.get_watch_list_df()
 
     if not watch_df.empty:
-        visible_cols = ["account_name", "name", "max_mile", "targets", "loc", "date", "found_warehouses"]
+        visible_cols = ["account_name", "name", "max_mile", "targets", "interval_min", "priority", "loc", "date", "found_warehouses"]
         display_df = watch_df[[c for c in visible_cols if c in watch_df.columns]]
         edited_watch_df = st.data_editor(
             display_df,
@@ -549,17 +653,20 @@ def main():
                 "date": "Created",
                 "loc": "From",
                 "max_mile": st.column_config.NumberColumn("Limit", step=50, help="Bu taslak için özel mil sınırı"),
-                "targets": st.column_config.TextColumn("Hedefler", help="Örn: AVP1, TEB3")
+                "targets": st.column_config.TextColumn("Hedefler", help="Örn: AVP1, TEB3"),
+                "interval_min": st.column_config.NumberColumn("Aralık (dk)", min_value=1, step=5, help="Bu taslak için kontrol aralığı. Boş: genel zamanlayıcıya göre"),
+                "priority": st.column_config.NumberColumn("Öncelik", step=1, help="Aynı anda vadesi gelenlerden yüksek öncelikli olan önce kontrol edilir")
             },
             disabled=["account_name", "name", "date", "loc"],
             num_rows="dynamic",
             key="watch_list_editor",
             width='stretch'
         )
-        new_data = edited_watch_df.to_dict("records")
-        if str(new_data) != str(st.session_state.get('last_saved_data', '')):
+        # Empty cells come back as NaN, which never equals itself; None keeps the comparison stable
+        new_data = edited_watch_df.astype(object).where(edited_watch_df.notna(), None).to_dict("records")
+        if new_data != st.session_state.get('last_saved_data'):
             manager.update_watch_list_from_df(new_data)
-            st.session_state['last_saved_data'] = str(new_data) # Cache for next comparison
+            st.session_state['last_saved_data'] = new_data # Cache for next comparison
             st.toast("✅ Değişiklikler otomatik kaydedildi!", icon="💾")
     else:
         st.info("Takip listesi şu an boş. Yukarıdan taslak seçip ekleyin.")
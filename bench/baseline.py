@@ -0,0 +1,155 @@
+"""
+The BeautifulSoup/html.parser parsers as they were before the lxml rewrite
+(bot/drafts.py and bot/analysis.py of the baseline commit, copied unchanged
+apart from the function names), kept only as a reference for
+`python -m bench.parsers --baseline`. The bot does not import this module.
+"""
+from bs4 import BeautifulSoup
+import re
+import pandas as pd
+
+from bot.notify import teams_bildirim_gonder
+
+def eski_html_tabloyu_parse_et(mgr, html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    rows = soup.find_all("tr", role="row")
+    if not rows: return pd.DataFrame()
+
+    takip_edilen_tarihler = set(mgr.watch_list.keys())
+    
+    veri_listesi = []
+    for row in rows:
+        cells = row.find_all("td")
+        if not cells or len(cells) < 11: continue
+        try:
+            name_input = cells[2].find("input")
+            draft_name = name_input['value'] if name_input else cells[2].get_text(strip=True)
+            name_input_id = name_input["id"]
+            open_link = row.find("a", title="Open Draft Shipment")
+            if not open_link: open_link = cells[1].find("a") 
+            row_action_id = open_link.get("id") if open_link else None
+            
+            # Copy butonu bulma
+            copy_link = row.find("a", title=lambda x: x and ("duplicate" in x.lower() or "copy" in x.lower()))
+            if not copy_link:
+                copy_icon = row.find("span", class_=lambda x: x and ("copy" in x or "clone" in x))
+                if copy_icon: copy_link = copy_icon.find_parent("a")
+            copy_action_id = copy_link.get("id") if copy_link else None
+
+            from_loc = cells[3].get_text(strip=True)
+            created_date = cells[10].get_text(strip=True)
+            units = cells[9].get_text(strip=True)
+            skus = cells[8].get_text(strip=True)
+            
+            # --- AUTO SELECT MANTIĞI ---
+            # Eğer bu draft ismi, oluşturduğumuz kopyalar listesindeyse TRUE yap
+            
+
+            secili_mi = created_date in takip_edilen_tarihler
+            veri_listesi.append({
+                "Seç": secili_mi, # Dinamik seçim
+                "Draft Name": draft_name,
+                "From": from_loc,
+                "SKUs": skus,
+                "Units": units,
+                "Created": created_date,
+                "Action ID": row_action_id,
+                "Copy ID": copy_action_id,
+                "Name Input ID": name_input_id
+            })
+            
+        except Exception as e: 
+            print(e)
+            continue
+    return pd.DataFrame(veri_listesi)
+
+def eski_analizi_yap(mgr, xml_response, draft_item):
+
+    """
+    Returns:
+    - True: Opportunity found (Copy)
+    - False: Continue waiting
+    - "STOP": Bad keyword found (Remove from list)
+    """
+
+    mgr.add_log("📊 Sonuçlar analiz ediliyor...")
+    
+    draft_name = draft_item.get('name', 'Bilinmiyor')
+    limit_mile = draft_item.get('max_mile', mgr.mile_threshold)
+    target_warehouses_str = draft_item.get('targets', "")
+    known_warehouses = draft_item.get('found_warehouses', [])
+
+    html_parts = re.findall(r'<!\[CDATA\[(.*?)]]>', xml_response, re.DOTALL)
+    full_html = "".join(html_parts)
+    soup = BeautifulSoup(full_html, 'html.parser')
+    
+    plans_table = soup.find("tbody", id=lambda x: x and "plans" in x)
+    if not plans_table: return False
+
+    rows = plans_table.find_all("tr")
+    current_option = "Bilinmiyor"
+
+    target_list = [t.strip().upper() for t in target_warehouses_str.split(',') if t.strip()]
+    previously_found = set(k.upper() for k in known_warehouses)
+    
+    bulunan_firsatlar = {} # Dictionary to store merged results
+    firsat_sayisi = 0
+    found_new = {"found_new": []}
+
+    for row in rows:
+        if "ui-rowgroup-header" in row.get("class", []):
+            current_option = row.get_text(strip=True)
+            continue
+            
+        cells = row.find_all("td")
+        if len(cells) > 3:
+            dist_text = cells[3].get_text(strip=True)
+            if "mi" in dist_text:
+                try:
+                    mil = int(dist_text.replace("mi", "").replace(",", "").strip())
+                    dest = cells[2].get_text(strip=True).upper()
+                    dest = dest.split(":")[0]
+                    
+                    if "Amazon Optimized" in current_option: continue
+                    
+                    # --- PRIORITY 1: TARGET WAREHOUSE (STOP CONDITION) ---
+                    if any(target in dest for target in target_list):
+                        mgr.add_log(f"🎯 HEDEF DEPO BULUNDU! ({dest}) - Takip Bitiyor.", "success")
+                        teams_bildirim_gonder(
+                            mgr=mgr,
+                            title="🎯 Hedef Depo Yakalandı!",
+                            message=f"**{draft_name}** için hedef depo (**{dest}**) bulundu. Takip listesinden çıkarılıyor.",
+                            status="success",
+                            facts={"Depo": dest, "Mesafe": f"{mil} Mil", "Plan": current_option}
+                        )
+                        return {"found_target": [{dest:mil}]} # Special signal to STOP
+                    
+                    # --- PRIORITY 2: MILE LIMIT (COPY CONDITION) ---
+                    elif mil < limit_mile:
+                        if dest in previously_found:
+                            print(f"Skipping {dest} (Already copied)")
+                            mgr.add_log(f"Skipping {dest} (Already copied)")
+                            found_new["found_new"].append({dest: mil})
+                            continue
+                        mgr.add_log(f"✅ MESAFE UYGUN: {mil} Mil ({dest})", "success")
+                        firsat_sayisi += 1
+                        bulunan_firsatlar[current_option] = f"{mil} Mil ➡️ {dest}"
+                        found_new["found_new"].append({dest: mil})
+
+                except Exception as e: 
+                    mgr.add_log(f"Analiz hatasi: {e}")
+                    pass
+
+    # --- SEND SINGLE NOTIFICATION ---
+    if bulunan_firsatlar:
+        teams_bildirim_gonder(
+            mgr=mgr,
+            title=f"{firsat_sayisi} Adet Fırsat Bulundu!",
+            message=f"**{draft_name}** için aşağıdaki planlar kriterlerinize ({mgr.mile_threshold} mil altı) uyuyor:",
+            status="success",
+            facts=bulunan_firsatlar # Passes the dictionary we built
+        )
+        return found_new
+
+    return False
+
@@ -0,0 +1,157 @@
+"""
+Offline benchmark: runs the real scheduler cycle (gorev) against bench.fake_server.
+
+    python -m bench.benchmark --accounts 3 --drafts 10 --cycles 3
+
+Starts the stand-in server, logs in, puts the first M drafts of every account
+on the watch list and runs C cycles. Reports per cycle the wall time, requests
+and response bytes per draft and the bot's CPU time per draft (from the HTTP
+trace, see bot/trace.py). --json writes the results for comparing changes.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_EMAIL = "bench@example.com"
+
+
+def sunucuyu_baslat(args):
+    cmd = [
+        sys.executable, "-m", "bench.fake_server",
+        "--port", str(args.port),
+        "--accounts", str(args.accounts),
+        "--drafts", str(args.drafts),
+        "--plan-seconds", str(args.plan_seconds),
+        "--near-rate", str(args.near_rate),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--viewstate-bytes", str(args.viewstate_bytes),
+    ]
+    server = subprocess.Popen(cmd, cwd=REPO_ROOT)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{args.port}/__stats", timeout=1)
+            return server
+        except OSError:
+            if server.poll() is not None: break
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("Fake server did not start.")
+
+
+def takip_listesini_kur(mgr, drafts_per_account):
+    """Puts the first drafts of every account on the watch list, as the UI would."""
+    from bot.auth import login
+
+    if not login(mgr):
+        raise SystemExit("Login to the fake server failed.")
+    for account in mgr.available_accounts:
+        ctx = mgr.session_pool.get(account["id"], account["name"])
+        if ctx is None:
+            raise SystemExit(f"Could not switch to {account['name']}.")
+        for row in ctx.draft_page.get(ctx).rows[:drafts_per_account]:
+            mgr.save_task({
+                "date": row["Created"],
+                "name": row["Draft Name"],
+                "loc": row["From"],
+                "account_id": account["id"],
+                "account_name": account["name"],
+                "max_mile": mgr.mile_threshold,
+                "targets": "",
+                "found_warehouses": [],
+            })
+
+
+def donguyu_olc(mgr, cycle):
+    from bot import trace
+    from bot.scheduler import gorev
+
+    drafts = len(mgr.watch_list)
+    wall_started, cpu_started = time.perf_counter(), time.process_time()
+    gorev(mgr)
+    wall, cpu = time.perf_counter() - wall_started, time.process_time() - cpu_started
+
+    recent = trace.son_donguler(mgr.email)
+    records = recent[0].records if recent else []
+    steps = recent[0].ozet() if recent else {}
+    return {
+        "cycle": cycle,
+        "drafts": drafts,
+        "wall_s": round(wall, 2),
+        "requests": len(records),
+        "requests_per_draft": round(len(records) / drafts, 1) if drafts else 0,
+        "kb_per_draft": round(sum(r["bytes"] for r in records) / 1024 / drafts, 1) if drafts else 0,
+        "cpu_ms_per_draft": round(cpu * 1000 / drafts, 1) if drafts else 0,
+        "steps": {step: totals["requests"] for step, totals in steps.items()},
+    }
+
+
+def raporla(results):
+    header = f"{'cycle':>5} {'drafts':>6} {'wall s':>8} {'req':>6} {'req/draft':>9} {'KB/draft':>9} {'CPU ms/draft':>12}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['cycle']:>5} {r['drafts']:>6} {r['wall_s']:>8.2f} {r['requests']:>6} "
+              f"{r['requests_per_draft']:>9.1f} {r['kb_per_draft']:>9.1f} {r['cpu_ms_per_draft']:>12.1f}")
+    steps = {}
+    for r in results:
+        for step, count in r["steps"].items():
+            steps[step] = steps.get(step, 0) + count
+    print("\nRequests per step: " + ", ".join(f"{k}={v}" for k, v in sorted(steps.items(), key=lambda kv: -kv[1])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the scheduler cycle")
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--drafts", type=int, default=5, help="watched drafts per account")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4, help="max_parallel_drafts")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--plan-seconds", type=float, default=4.0)
+    parser.add_argument("--near-rate", type=float, default=0.2)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--viewstate-bytes", type=int, default=4000)
+    parser.add_argument("--stagger", type=float, default=0,
+                        help="max per-account start delay in a cycle (0 keeps wall times comparable)")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    # bot.constants reads the base URL at import time, and the bot's database
+    # lives under ./data; both must be set up before the bot is imported.
+    os.environ["TWODW_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(tempfile.mkdtemp(prefix="2dw-bench-"))
+
+    server = sunucuyu_baslat(args)
+    try:
+        from bot import scheduler
+        from bot.manager import GlobalManager
+
+        scheduler.ACCOUNT_STAGGER_SECONDS = args.stagger
+
+        mgr = GlobalManager(BENCH_EMAIL, "bench")
+        mgr.max_parallel_drafts = args.workers
+        takip_listesini_kur(mgr, args.drafts)
+        mgr.is_running = True
+
+        results = [donguyu_olc(mgr, c + 1) for c in range(args.cycles)]
+    finally:
+        server.terminate()
+        server.wait()
+
+    raporla(results)
+    if args.json:
+        with open(os.path.join(REPO_ROOT, args.json) if not os.path.isabs(args.json) else args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
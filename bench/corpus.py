@@ -0,0 +1,189 @@
+"""
+Fixture corpus for the parser benchmark (bench/parsers.py).
+
+The responses are shaped like the ones 2DWorkflow sends (PrimeFaces tables,
+<partial-response> updates), with made-up names, addresses and ids. They are
+generated deterministically and checked in under bench/fixtures/:
+
+    python -m bench.corpus          # rewrite the fixture files
+"""
+import os
+import random
+from html import escape
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+VIEWSTATE_ID = "j_id1:javax.faces.ViewState:0"
+STORE_TABLE_ID = "__my_store_form__:__my_stor_table__"
+WAREHOUSE_CODES = ["AVP1", "TEB3", "MEM1", "SBD1", "ONT8", "IND9", "SAV3", "DFW6", "PHX7", "ABE8", "LGB8", "MDW2"]
+CITIES = ["Edison, NJ", "Carson, CA", "Dallas, TX", "Elk Grove, IL", "Doral, FL", "Kent, WA"]
+
+
+def _page(body, title="Draft Shipments"):
+    return (
+        f'<!DOCTYPE html><html xmlns="http://www.w3.org/1999/xhtml"><head><title>{title}</title>'
+        '<script type="text/javascript">if(window.PrimeFaces){PrimeFaces.settings.locale="en_US";}</script>'
+        '</head><body class="main-body">'
+        '<div id="ccFlag" class="topbar-flag"><img src="/img/us.png"/><span> Acme Home Goods</span></div>'
+        '<form id="formLogo" name="formLogo" method="post">'
+        '<a id="formLogo:j_idt31" href="#" class="ui-commandlink" '
+        'onclick="PrimeFaces.ab({s:&quot;formLogo:j_idt31&quot;,u:&quot;__my_store__&quot;});return false;">'
+        '<i class="fa fa-amazon"></i></a></form>'
+        f'{body}</body></html>'
+    )
+
+def _draft_form(rows, viewstate="-4481736621843419321:2203955471094818830"):
+    return (
+        '<form id="mainForm" name="mainForm" method="post" enctype="application/x-www-form-urlencoded">'
+        '<input type="hidden" name="mainForm" value="mainForm"/>'
+        '<div id="mainForm:drafts" class="ui-datatable ui-widget"><div class="ui-datatable-tablewrapper"><table role="grid">'
+        '<thead><tr role="row"><th>Sel</th><th>Open</th><th>Name</th><th>From</th><th>Type</th><th>Marketplace</th>'
+        '<th>Copy</th><th>Status</th><th>SKUs</th><th>Units</th><th>Created</th></tr></thead>'
+        f'<tbody id="mainForm:drafts_data" class="ui-datatable-data ui-widget-content">{"".join(rows)}</tbody>'
+        '</table></div></div>'
+        f'<input type="hidden" name="javax.faces.ViewState" id="{VIEWSTATE_ID}" value="{viewstate}" autocomplete="off"/>'
+        '</form>'
+    )
+
+def _draft_row(i, rng, name=None, open_link=None, copy_link=None, name_input=None, from_cell=None):
+    created = f"{rng.randint(1, 12):02d}.{rng.randint(1, 28):02d}.2026 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+    name = name if name is not None else f"PO-{rng.randint(10000, 99999)} {rng.choice(['Towels', 'Mugs', 'Lamps', 'Rugs'])}"
+    if open_link is None:
+        open_link = (f'<a id="mainForm:drafts:{i}:j_idt88" href="#" title="Open Draft Shipment" class="ui-commandlink">'
+                     '<i class="pi pi-folder-open"></i></a>')
+    if copy_link is None:
+        copy_link = (f'<a id="mainForm:drafts:{i}:j_idt97" href="#" title="Duplicate Draft" class="ui-commandlink">'
+                     '<span class="pi pi-copy"></span></a>')
+    if name_input is None:
+        name_input = (f'<input id="mainForm:drafts:{i}:draft_name" name="mainForm:drafts:{i}:draft_name" '
+                      f'type="text" value="{escape(name)}" class="ui-inputfield"/>')
+    if from_cell is None:
+        from_cell = f' {rng.choice(CITIES)} '
+    return (
+        f'<tr data-ri="{i}" data-rk="{100000 + i}" class="ui-widget-content ui-datatable-{"even" if i % 2 else "odd"}" role="row">'
+        f'<td role="gridcell"><div class="ui-chkbox"><input type="checkbox" name="mainForm:drafts_checkbox"/></div></td>'
+        f'<td role="gridcell">{open_link}</td>'
+        f'<td role="gridcell">{name_input}</td>'
+        f'<td role="gridcell">{from_cell}</td>'
+        '<td role="gridcell">SPD</td><td role="gridcell">US</td>'
+        f'<td role="gridcell">{copy_link}</td>'
+        '<td role="gridcell"><span class="status-badge">Draft</span></td>'
+        f'<td role="gridcell">{rng.randint(1, 40)}</td>'
+        f'<td role="gridcell"> {rng.randint(1, 9)},{rng.randint(0, 999):03d} </td>'
+        f'<td role="gridcell">{created}</td>'
+        '</tr>'
+    )
+
+def draft_list(n, seed):
+    rng = random.Random(seed)
+    return _page(_draft_form([_draft_row(i, rng) for i in range(n)]))
+
+def draft_list_pathological(n, seed):
+    """Rows that hit every fallback and skip path of the draft list parser."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        kind = i % 9
+        if kind == 1:    # copy button only recognisable by its icon
+            rows.append(_draft_row(i, rng, copy_link=f'<a id="mainForm:drafts:{i}:cl" href="#"><span class="fa fa-clone"></span></a>'))
+        elif kind == 2:  # no copy button at all
+            rows.append(_draft_row(i, rng, copy_link=""))
+        elif kind == 3:  # no name input -> row skipped
+            rows.append(_draft_row(i, rng, name_input="<span>locked</span>"))
+        elif kind == 4:  # open link without title, entities, comments and markup inside cells
+            rows.append(_draft_row(
+                i, rng, name=f'Q&A "Bundle" <{i}> — Ürün çeşit',
+                open_link=f'<a id="mainForm:drafts:{i}:o2" href="#">open</a>',
+                from_cell=' <b>Warehouse</b> <!-- hidden --> &amp; <i>Dock 4</i>\n\t NJ ',
+            ))
+        elif kind == 5:  # nested table inside a cell
+            rows.append(_draft_row(i, rng, from_cell='<table><tr role="row"><td>x</td></tr></table> Kent, WA'))
+        elif kind == 6:  # short row (too few cells)
+            rows.append(f'<tr role="row" data-ri="{i}"><td>group</td><td colspan="10">Archived</td></tr>')
+        elif kind == 7:  # very long name
+            rows.append(_draft_row(i, rng, name="X" * 2000))
+        else:
+            rows.append(_draft_row(i, rng))
+    # Rows outside the role="row" convention and an unclosed tag at the end
+    rows.append('<tr><td>footer</td></tr><tr role="presentation"><td>' + "<td>y</td>" * 12 + "</tr>")
+    return _page(_draft_form(rows)) + "<div"
+
+def _partial(updates):
+    body = "".join(f'<update id="{uid}"><![CDATA[{html}]]></update>' for uid, html in updates)
+    return (
+        "<?xml version='1.0' encoding='UTF-8'?>\n"
+        f'<partial-response id="j_id1"><changes>{body}'
+        f'<update id="{VIEWSTATE_ID}"><![CDATA[-8803348171306148117:-3215633373766405742]]></update>'
+        '</changes></partial-response>'
+    )
+
+def plans(groups, per_group, seed, progress="100%"):
+    rng = random.Random(seed)
+    rows = []
+    for g in range(groups):
+        label = "Amazon Optimized Splits" if g == 0 else f"Option {g}: {rng.randint(1, 4)} shipments"
+        rows.append(f'<tr class="ui-widget-header ui-rowgroup-header" role="row"><td colspan="6">{label}</td></tr>')
+        for k in range(per_group):
+            code = rng.choice(WAREHOUSE_CODES)
+            miles = rng.choice([rng.randint(20, 299), rng.randint(300, 2800)])
+            rows.append(
+                f'<tr data-ri="{k}" class="ui-widget-content" role="row"><td>{k + 1}</td><td>SPD</td>'
+                f'<td>{code}: {rng.choice(CITIES)}</td><td>{miles:,} mi</td>'
+                f'<td>${rng.randint(10, 900)}.{rng.randint(0, 99):02d}</td><td>{rng.randint(1, 30)} boxes</td></tr>'
+            )
+    panel = (
+        '<div id="mainForm:shipmentPlansPanel" class="ui-outputpanel"><div class="ui-datatable"><table role="grid">'
+        f'<tbody id="mainForm:plans_data" class="ui-datatable-data">{"".join(rows)}</tbody></table></div></div>'
+    )
+    return _partial([
+        ("mainForm:shipmentPlansPanel", panel),
+        ("mainForm:progressBarPlaning", f'<div class="ui-progressbar-label">{progress}</div>'),
+        ("mainForm:a2dw_boxContentPanel", '<div>' + "<span>box</span>" * 50 + '</div>'),
+    ])
+
+def plans_in_progress():
+    return _partial([
+        ("mainForm:shipmentPlansPanel", '<div id="mainForm:shipmentPlansPanel" class="ui-outputpanel"></div>'),
+        ("mainForm:progressBarPlaning", '<div class="ui-progressbar-label">42%</div>'),
+    ])
+
+def account_menu(n, seed):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        name = "Acme Home Goods" if i == n // 2 else f"{rng.choice(['Nova', 'Lumen', 'Babil', 'Çınar'])} {rng.choice(['Design', 'Trade', 'Supply'])} {i}"
+        rows.append(
+            f'<tr data-ri="{i}" data-rk="{7000 + i}" class="ui-widget-content" role="row">'
+            f'<td role="gridcell"><input id="{STORE_TABLE_ID}:{i}:store_name" name="{STORE_TABLE_ID}:{i}:store_name" '
+            f'type="text" value="{escape(name)}" readonly="readonly"/></td>'
+            f'<td role="gridcell"><img src="/img/us.png"/></td></tr>'
+        )
+    table = f'<div id="{STORE_TABLE_ID}" class="ui-datatable"><table><tbody>{"".join(rows)}</tbody></table></div>'
+    return _partial([(STORE_TABLE_ID, table)])
+
+
+CORPUS = {
+    "draft_list_small.html": lambda: draft_list(25, seed=1),
+    "draft_list_large.html": lambda: draft_list(600, seed=2),
+    "draft_list_pathological.html": lambda: draft_list_pathological(300, seed=3),
+    "plans_small.xml": lambda: plans(3, 3, seed=4),
+    "plans_many_groups.xml": lambda: plans(80, 6, seed=5),
+    "plans_in_progress.xml": plans_in_progress,
+    "account_page.html": lambda: draft_list(10, seed=6),
+    "account_menu.xml": lambda: account_menu(40, seed=7),
+}
+
+def load(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+def main():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for name, make in CORPUS.items():
+        with open(os.path.join(FIXTURES_DIR, name), "w", encoding="utf-8") as f:
+            f.write(make())
+        print(f"wrote {name}")
+
+
+if __name__ == "__main__":
+    main()
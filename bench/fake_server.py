@@ -0,0 +1,380 @@
+"""
+Local stand-in for app.2dworkflow.com, used by the offline benchmark.
+
+Serves just enough of login.jsf, draft.jsf and draftplan.jsf (full pages and
+PrimeFaces partial responses) for a whole bot cycle: login, account menu and
+switch, draft list, open draft, create plan with progress polling, copy
+(confirm + redirect) and rename.
+
+    python -m bench.fake_server --accounts 3 --drafts 10 --latency-ms 80
+
+Point the bot at it with TWODW_BASE_URL=http://127.0.0.1:8765.
+"""
+import argparse
+import asyncio
+import random
+import secrets
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from html import escape
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+
+JSF_VIEWSTATE = "javax.faces.ViewState"
+VIEWSTATE_ID = "j_id1:javax.faces.ViewState:0"
+SESSION_COOKIE = "JSESSIONID"
+MENU_BUTTON_ID = "formLogo:storeMenu"
+STORE_TABLE_ID = "__my_store_form__:__my_stor_table__"
+CONFIRM_BUTTON_ID = "clone_draft_confirm:yes"
+CREATED_FORMAT = "%m.%d.%Y %H:%M"
+
+WAREHOUSES = [
+    "AVP1: Hazleton, PA", "MEM1: Memphis, TN", "ONT8: Moreno Valley, CA",
+    "IND9: Greenwood, IN", "SAV3: Savannah, GA", "DFW6: Coppell, TX",
+    "PHX7: Phoenix, AZ", "ABE8: Robbinsville, NJ", "SCK4: Stockton, CA",
+    "LGB8: Rialto, CA", "MDW2: Joliet, IL", "TPA2: Lakeland, FL",
+]
+ORIGINS = ["Los Angeles, CA", "Newark, NJ", "Dallas, TX", "Chicago, IL"]
+
+
+class FakeSite:
+    """In-memory state of the stand-in site: accounts, drafts and HTTP sessions."""
+
+    def __init__(self, accounts=2, drafts=5, plan_seconds=4.0, near_rate=0.2,
+                 latency_ms=50, jitter_ms=20, viewstate_bytes=4000, seed=1):
+        self.plan_seconds = plan_seconds
+        self.near_rate = near_rate
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.viewstate_bytes = viewstate_bytes
+        self.random = random.Random(seed)
+        self.clock = datetime(2026, 1, 5, 9, 0)
+        self.next_draft_id = 1
+        self.drafts = {}      # draft id -> draft
+        self.accounts = []    # [{id, name, drafts: [draft id, newest first]}]
+        self.sessions = {}    # session id -> {account, plans, pending_copy}
+        self.plan_runs = Counter()
+        self.requests = Counter()
+
+        for a in range(accounts):
+            account = {"id": f"rk{1000 + a}", "name": f"Bench Store {a + 1}", "drafts": []}
+            self.accounts.append(account)
+            for d in range(drafts):
+                self.new_draft(account, f"Draft {a + 1}-{d + 1}", ORIGINS[(a + d) % len(ORIGINS)])
+
+    # --- STATE ---
+    def new_draft(self, account, name, origin):
+        draft = {
+            "id": self.next_draft_id,
+            "name": name,
+            "from": origin,
+            "created": self.clock.strftime(CREATED_FORMAT),
+            "skus": self.random.randint(1, 12),
+            "units": self.random.randint(10, 900),
+            "account": account["id"],
+        }
+        self.next_draft_id += 1
+        self.clock += timedelta(minutes=1)  # Created is the bot's task key, keep it unique
+        self.drafts[draft["id"]] = draft
+        account["drafts"].insert(0, draft["id"])
+        return draft
+
+    def account(self, account_id):
+        return next((a for a in self.accounts if a["id"] == account_id), self.accounts[0])
+
+    def session(self, request):
+        sid = request.cookies.get(SESSION_COOKIE)
+        return sid, self.sessions.get(sid)
+
+    def viewstate(self, view):
+        # The view is encoded in the ViewState, the way JSF ties a POST to its page
+        filler = secrets.token_urlsafe(self.viewstate_bytes)[:self.viewstate_bytes]
+        return f"{view}~{filler}"
+
+    def listed_drafts(self, sess):
+        return [self.drafts[i] for i in self.account(sess["account"])["drafts"]]
+
+    def plan_rows(self, draft_id):
+        """Deterministic plan options for a draft's nth planning run."""
+        self.plan_runs[draft_id] += 1
+        rng = random.Random(f"{draft_id}-{self.plan_runs[draft_id]}")
+        options = []
+        for n in range(rng.randint(2, 4)):
+            rows = [(rng.choice(WAREHOUSES), rng.randint(320, 2600)) for _ in range(rng.randint(1, 3))]
+            options.append((f"Option {n + 1}", rows))
+        if rng.random() < self.near_rate:
+            options[0][1][0] = (rng.choice(WAREHOUSES), rng.randint(40, 299))
+        options.append(("Amazon Optimized Splits", [(rng.choice(WAREHOUSES), rng.randint(10, 200))]))
+        return options
+
+    # --- MARKUP ---
+    def draft_rows_html(self, drafts):
+        rows = []
+        for i, d in enumerate(drafts):
+            rows.append(
+                f'<tr role="row" data-ri="{i}" class="ui-widget-content">'
+                f'<td><div class="ui-chkbox"></div></td>'
+                f'<td><a id="mainForm:drafts:{i}:openBtn" title="Open Draft Shipment" href="#">Open</a></td>'
+                f'<td><input id="mainForm:drafts:{i}:draft_name" name="mainForm:drafts:{i}:draft_name" '
+                f'type="text" value="{escape(d["name"])}"/></td>'
+                f'<td>{escape(d["from"])}</td><td>SPD</td><td>-</td><td>-</td><td>-</td>'
+                f'<td>{d["skus"]}</td><td>{d["units"]}</td><td>{d["created"]}</td>'
+                f'<td><a id="mainForm:drafts:{i}:copyBtn" title="Duplicate Draft" href="#">'
+                f'<span class="fa fa-copy"></span></a></td>'
+                f'</tr>'
+            )
+        return (
+            '<div id="mainForm:drafts" class="ui-datatable"><table><tbody id="mainForm:drafts_data">'
+            + "".join(rows) + '</tbody></table></div>'
+        )
+
+    def draft_page_html(self, sess):
+        account = self.account(sess["account"])
+        return (
+            '<html><head><title>Drafts</title></head><body>'
+            f'<div id="ccFlag"><span> {escape(account["name"])}</span></div>'
+            f'<form id="formLogo" name="formLogo"><a id="{MENU_BUTTON_ID}" href="#" '
+            f'onclick="PrimeFaces.ab({{s:&quot;{MENU_BUTTON_ID}&quot;,u:&quot;__my_store__&quot;}});">'
+            '<i class="fa fa-amazon"></i></a></form>'
+            '<form id="mainForm" name="mainForm" method="post">'
+            '<input type="hidden" name="mainForm" value="mainForm"/>'
+            + self.draft_rows_html(self.listed_drafts(sess)) +
+            f'<input type="hidden" name="{JSF_VIEWSTATE}" id="{VIEWSTATE_ID}" value="{self.viewstate("list")}"/>'
+            '</form></body></html>'
+        )
+
+    def detail_page_html(self, draft):
+        viewstate = self.viewstate(f"plan{draft['id']}")
+        return (
+            '<html><head><title>Draft Plan</title></head><body>'
+            '<form id="mainForm" name="mainForm" method="post">'
+            '<input type="hidden" name="mainForm" value="mainForm"/>'
+            f'<input type="text" name="mainForm:draftInfo:0:draft_name" value="{escape(draft["name"])}"/>'
+            f'<span id="mainForm:draftInfo:0:ship_from_address">{escape(draft["from"])}</span>'
+            '<button id="mainForm:create_plan" name="mainForm:create_plan" type="submit">Create Plan</button>'
+            f'<input type="hidden" name="{JSF_VIEWSTATE}" id="{VIEWSTATE_ID}" value="{viewstate}"/>'
+            '</form></body></html>'
+        )
+
+    def plans_html(self, options):
+        rows = []
+        for option, plan_rows in options:
+            rows.append(f'<tr class="ui-widget-header ui-rowgroup-header"><td colspan="5">{escape(option)}</td></tr>')
+            for n, (dest, miles) in enumerate(plan_rows):
+                rows.append(
+                    f'<tr role="row"><td>{n + 1}</td><td>SPD</td><td>{escape(dest)}</td>'
+                    f'<td>{miles:,} mi</td><td>$0.00</td></tr>'
+                )
+        return (
+            '<div id="mainForm:shipmentPlansPanel"><table><tbody id="mainForm:plans_data">'
+            + "".join(rows) + '</tbody></table></div>'
+        )
+
+
+def partial_response(updates=(), redirect=None, viewstate=None):
+    parts = ['<?xml version="1.0" encoding="UTF-8"?><partial-response id="j_id1">']
+    if redirect:
+        parts.append(f'<redirect url="{escape(redirect)}"></redirect>')
+    else:
+        parts.append("<changes>")
+        for update_id, html in updates:
+            parts.append(f'<update id="{update_id}"><![CDATA[{html}]]></update>')
+        if viewstate:
+            parts.append(f'<update id="{VIEWSTATE_ID}"><![CDATA[{viewstate}]]></update>')
+        parts.append("</changes>")
+    parts.append("</partial-response>")
+    return Response("".join(parts), media_type="text/xml;charset=UTF-8")
+
+
+def create_app(site):
+    app = FastAPI(title="2DWorkflow stand-in")
+    app.state.site = site
+
+    @app.middleware("http")
+    async def latency(request, call_next):
+        site.requests[f"{request.method} {request.url.path}"] += 1
+        delay = site.latency_ms + site.random.uniform(-site.jitter_ms, site.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        return await call_next(request)
+
+    def login_redirect():
+        return RedirectResponse("/login.jsf", status_code=302)
+
+    # --- LOGIN ---
+    @app.get("/login.jsf")
+    async def login_page(request: Request):
+        sid, _ = site.session(request)
+        html = (
+            '<html><body><form id="mainForm" name="mainForm" method="post">'
+            '<input type="text" name="mainForm:email"/><input type="password" name="mainForm:password"/>'
+            '<button id="mainForm:j_idt21" name="mainForm:j_idt21" type="submit">Login</button>'
+            f'<input type="hidden" name="{JSF_VIEWSTATE}" value="{site.viewstate("login")}"/>'
+            '</form></body></html>'
+        )
+        res = HTMLResponse(html)
+        if not sid:
+            res.set_cookie(SESSION_COOKIE, secrets.token_hex(16))
+        return res
+
+    @app.post("/login.jsf")
+    async def login_submit(request: Request):
+        sid, _ = site.session(request)
+        form = await request.form()
+        if not sid or not form.get("mainForm:email"):
+            return HTMLResponse('<div class="ui-messages-error">Login failed</div>')
+        site.sessions[sid] = {"account": site.accounts[0]["id"], "pending_copy": None, "plans": {}}
+        return RedirectResponse("/draft.jsf", status_code=302)
+
+    # --- DRAFT LIST ---
+    @app.get("/draft.jsf")
+    async def draft_page(request: Request):
+        _, sess = site.session(request)
+        if sess is None: return login_redirect()
+        return HTMLResponse(site.draft_page_html(sess))
+
+    @app.post("/draft.jsf")
+    async def draft_action(request: Request):
+        _, sess = site.session(request)
+        if sess is None: return login_redirect()
+        form = await request.form()
+        source = form.get("javax.faces.source", "")
+        drafts = site.listed_drafts(sess)
+
+        def row_draft(suffix):
+            try:
+                return drafts[int(source.split(":")[2])] if source.endswith(suffix) else None
+            except (IndexError, ValueError):
+                return None
+
+        if source == MENU_BUTTON_ID:
+            rows = "".join(
+                f'<tr data-rk="{a["id"]}"><td><input id="{STORE_TABLE_ID}:{i}:store_name" '
+                f'value="{escape(a["name"])}"/></td></tr>'
+                for i, a in enumerate(site.accounts)
+            )
+            return partial_response([(STORE_TABLE_ID, f"<table><tbody>{rows}</tbody></table>")], viewstate=site.viewstate("list"))
+
+        if source == STORE_TABLE_ID:
+            sess["account"] = site.account(form.get(f"{STORE_TABLE_ID}_instantSelectedRowKey"))["id"]
+            return partial_response(
+                [("ccFlag", f'<span> {escape(site.account(sess["account"])["name"])}</span>'),
+                 ("mainForm", site.draft_rows_html(site.listed_drafts(sess)))],
+                viewstate=site.viewstate("list"),
+            )
+
+        draft = row_draft(":openBtn")
+        if draft is not None:
+            return partial_response(redirect=f"/draftplan.jsf?id={draft['id']}")
+
+        draft = row_draft(":copyBtn")
+        if draft is not None:
+            sess["pending_copy"] = draft["id"]
+            dialog = (
+                '<div id="clone_draft_confirm" class="ui-confirm-dialog">Copy this draft?'
+                f'<button id="{CONFIRM_BUTTON_ID}" name="{CONFIRM_BUTTON_ID}" type="button" '
+                'class="ui-button ui-confirmdialog-yes">Yes</button></div>'
+            )
+            return partial_response([("clone_draft_confirm", dialog)], viewstate=site.viewstate("list"))
+
+        if source == CONFIRM_BUTTON_ID and sess["pending_copy"]:
+            original = site.drafts[sess["pending_copy"]]
+            sess["pending_copy"] = None
+            copy = site.new_draft(site.account(original["account"]), f"{original['name']} - Copy", original["from"])
+            return partial_response(redirect=f"/draftplan.jsf?id={copy['id']}")
+
+        if source == "mainForm:drafts":
+            # Full table submit (rename request 1): every name input is sent back
+            for i, d in enumerate(drafts):
+                name = form.get(f"mainForm:drafts:{i}:draft_name")
+                if name: d["name"] = name
+            return partial_response([("mainForm:drafts", site.draft_rows_html(drafts))], viewstate=site.viewstate("list"))
+
+        draft = row_draft(":draft_name")
+        if draft is not None:
+            draft["name"] = form.get(source) or draft["name"]
+            return partial_response(viewstate=site.viewstate("list"))
+
+        return partial_response(viewstate=site.viewstate("list"))
+
+    # --- DRAFT PLAN ---
+    @app.get("/draftplan.jsf")
+    async def plan_page(request: Request, id: int = 0):
+        _, sess = site.session(request)
+        if sess is None: return login_redirect()
+        draft = site.drafts.get(id)
+        if draft is None: return HTMLResponse("Not found", status_code=404)
+        return HTMLResponse(site.detail_page_html(draft))
+
+    @app.post("/draftplan.jsf")
+    async def plan_action(request: Request):
+        _, sess = site.session(request)
+        if sess is None: return login_redirect()
+        form = await request.form()
+        source = form.get("javax.faces.source", "")
+        view = form.get(JSF_VIEWSTATE, "").split("~")[0]
+        draft_id = int(view[4:]) if view.startswith("plan") and view[4:].isdigit() else None
+        if draft_id not in site.drafts:
+            return partial_response(viewstate=site.viewstate("plan0"))
+        viewstate = site.viewstate(view)
+
+        if source == "mainForm:create_plan":
+            sess["plans"][draft_id] = time.monotonic()
+            return partial_response([("mainForm", '<div id="mainForm:planingStatusDialog">Planning...</div>')], viewstate=viewstate)
+
+        if source == "mainForm:planingStatusDialogPoll":
+            started = sess["plans"].get(draft_id)
+            if started is None:
+                return partial_response([("mainForm:shipmentPlansPanel", '<div id="mainForm:shipmentPlansPanel"></div>')], viewstate=viewstate)
+            percent = min(100, int((time.monotonic() - started) / site.plan_seconds * 100))
+            if percent < 100:
+                return partial_response(
+                    [("mainForm:shipmentPlansPanel", '<div id="mainForm:shipmentPlansPanel"></div>'),
+                     ("mainForm:progressBarPlaning", f'<div class="ui-progressbar-label">{percent}%</div>')],
+                    viewstate=viewstate,
+                )
+            del sess["plans"][draft_id]
+            return partial_response(
+                [("mainForm:shipmentPlansPanel", site.plans_html(site.plan_rows(draft_id))),
+                 ("mainForm:progressBarPlaning", '<div class="ui-progressbar-label">100%</div>')],
+                viewstate=viewstate,
+            )
+
+        return partial_response(viewstate=viewstate)
+
+    # --- BENCHMARK HELPERS ---
+    @app.get("/__stats")
+    async def stats():
+        return JSONResponse({"requests": dict(site.requests), "drafts": len(site.drafts)})
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local stand-in 2DWorkflow JSF server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--drafts", type=int, default=5, help="drafts per account")
+    parser.add_argument("--plan-seconds", type=float, default=4.0, help="time until a plan reaches 100%%")
+    parser.add_argument("--near-rate", type=float, default=0.2, help="share of plans with a destination under 300 mi")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--viewstate-bytes", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    site = FakeSite(
+        accounts=args.accounts, drafts=args.drafts, plan_seconds=args.plan_seconds,
+        near_rate=args.near_rate, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        viewstate_bytes=args.viewstate_bytes, seed=args.seed,
+    )
+    uvicorn.run(create_app(site), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Parser micro-benchmark over the fixture corpus (bench/corpus.py).
+
+    python -m bench.parsers                   # time, peak memory, blocks per call
+    python -m bench.parsers --check           # compare outputs with the golden files
+    python -m bench.parsers --update-golden   # accept the current outputs
+    python -m bench.parsers --baseline        # compare with the pre-lxml BeautifulSoup parsers
+
+Per case it reports the median time per call, the tracemalloc peak of one
+call and the memory blocks still held afterwards (the size of the result).
+--check exits with 1 if any parser's output differs from
+bench/fixtures/golden/<case>.json, so a parser can be rewritten safely.
+
+The golden files were written by the current parsers, so they only guard
+against changes from here on. --baseline runs the original BeautifulSoup
+implementations (bench/baseline.py) over the same fixtures and exits with 1
+if the current ones give a different result. The one intended difference is
+how a missing value is spelled: pandas may hand back NaN where the extractors
+return None, so NaN is read as None on both sides before comparing.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from bench.baseline import eski_analizi_yap, eski_html_tabloyu_parse_et
+from bench.corpus import FIXTURES_DIR, load
+from bot.analysis import analizi_yap
+from bot.auth import aktif_hesap_ve_menu, hesap_listesi
+from bot.constants import DRAFT_PAGE_URL
+from bot.drafts import html_tabloyu_parse_et, TaslakSayfasi
+from bot.extract import taslak_satirlari, plan_satirlari
+from bot.jsf import PartialResponse, JsfSayfa
+
+GOLDEN_DIR = os.path.join(FIXTURES_DIR, "golden")
+
+
+class ParserMgr:
+    """The few manager attributes the parsers read; logs are collected, nothing is sent."""
+
+    def __init__(self, watch_list=None):
+        self.email = "bench@example.com"
+        self.mile_threshold = 300
+        self.teams_webhook_url = None
+        self.watch_list = watch_list or {}
+        self.logs = []
+
+    def add_log(self, message, type="info"):
+        self.logs.append((type, message))
+
+
+def _analiz(fixture, draft_item):
+    xml = load(fixture)
+    def run():
+        mgr = ParserMgr()
+        with contextlib.redirect_stdout(io.StringIO()):  # analizi_yap prints skipped warehouses
+            result = analizi_yap(mgr, xml, dict(draft_item))
+        return {"result": result, "logs": mgr.logs}
+    return run
+
+def _tablo(fixture):
+    html = load(fixture)
+    # A few watched dates so the "Seç" column has both values
+    watched = {row["Created"]: {} for row in taslak_satirlari(html)[::4]}
+    mgr = ParserMgr(watched)
+    return lambda: html_tabloyu_parse_et(mgr, html).to_dict("records")
+
+def _hesaplar():
+    page, menu = load("account_page.html"), load("account_menu.xml")
+    def run():
+        active, menu_btn_id = aktif_hesap_ve_menu(page)
+        table = PartialResponse(menu).update("__my_store_form__:__my_stor_table__")
+        return {"active": active, "menu_btn_id": menu_btn_id, "accounts": hesap_listesi(table, active)}
+    return run
+
+def cases():
+    """name -> zero-argument callable returning a JSON-serializable result."""
+    result = {}
+    for fixture in ("draft_list_small.html", "draft_list_large.html", "draft_list_pathological.html"):
+        stem = fixture.rsplit(".", 1)[0]
+        html = load(fixture)
+        result[f"taslak_satirlari.{stem}"] = lambda html=html: taslak_satirlari(html)
+        result[f"html_tabloyu_parse_et.{stem}"] = _tablo(fixture)
+        result[f"TaslakSayfasi.{stem}"] = lambda html=html: (lambda p: {"rows": len(p.rows), "form": p.form_data})(TaslakSayfasi(JsfSayfa(DRAFT_PAGE_URL, html)))
+
+    for fixture in ("plans_small.xml", "plans_many_groups.xml", "plans_in_progress.xml"):
+        stem = fixture.rsplit(".", 1)[0]
+        xml = load(fixture)
+        result[f"PartialResponse.{stem}"] = lambda xml=xml: (lambda pr: {"updates": sorted(pr.updates), "viewstate": pr.viewstate})(PartialResponse(xml))
+        result[f"plan_satirlari.{stem}"] = lambda xml=xml: plan_satirlari(PartialResponse(xml).update("mainForm:shipmentPlansPanel"))
+        result[f"analizi_yap.{stem}"] = _analiz(fixture, {"name": "Bench Draft", "max_mile": 300, "targets": "", "found_warehouses": ["AVP1"]})
+    result["analizi_yap.plans_many_groups.target"] = _analiz("plans_many_groups.xml", {"name": "Bench Draft", "max_mile": 300, "targets": "MDW2, SAV3", "found_warehouses": []})
+
+    result["fetch_accounts_backend.account_menu"] = _hesaplar()
+    return result
+
+
+def olc(fn, min_time=0.2, repeats=5):
+    """(median seconds per call, peak KB of one call, blocks held by the result)."""
+    fn()  # warm-up (imports, lazy properties, caches)
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number): fn()
+        if time.perf_counter() - started >= min_time / repeats or number >= 1 << 16: break
+        number *= 2
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(number): fn()
+        timings.append((time.perf_counter() - started) / number)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del result
+    return statistics.median(timings), peak / 1024, blocks
+
+
+def eski_ile_karsilastir():
+    """
+    (name, old output, new output) for every draft list and plan fixture:
+    the baseline BeautifulSoup parsers against the current lxml-based ones.
+    """
+    draft_items = [
+        {"name": "Bench Draft", "max_mile": 300, "targets": "", "found_warehouses": ["AVP1"]},
+        {"name": "Bench Draft", "max_mile": 300, "targets": "MDW2, SAV3", "found_warehouses": []},
+    ]
+    pairs = []
+    for fixture in ("draft_list_small.html", "draft_list_large.html", "draft_list_pathological.html"):
+        html = load(fixture)
+        mgr = ParserMgr({row["Created"]: {} for row in taslak_satirlari(html)[::4]})
+        with contextlib.redirect_stdout(io.StringIO()):  # the old parser prints skipped rows
+            old = eski_html_tabloyu_parse_et(mgr, html).to_dict("records")
+        new = html_tabloyu_parse_et(mgr, html).to_dict("records")
+        pairs.append((f"html_tabloyu_parse_et.{fixture}", old, new))
+
+    for fixture in ("plans_small.xml", "plans_many_groups.xml", "plans_in_progress.xml"):
+        xml = load(fixture)
+        for n, draft_item in enumerate(draft_items):
+            outputs = []
+            for fn in (eski_analizi_yap, analizi_yap):
+                mgr = ParserMgr()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = fn(mgr, xml, dict(draft_item))
+                outputs.append({"result": result, "logs": mgr.logs})
+            pairs.append((f"analizi_yap.{fixture}.{n}", *outputs))
+    return pairs
+
+def _nan_to_none(value):
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, dict):
+        return {k: _nan_to_none(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_nan_to_none(v) for v in value]
+    return value
+
+def baseline_kontrol():
+    failed = []
+    pairs = eski_ile_karsilastir()
+    for name, old, new in pairs:
+        if _normalize(_nan_to_none(old)) != _normalize(_nan_to_none(new)):
+            failed.append(name)
+    for name in failed: print(f"FAIL {name}: differs from the BeautifulSoup parser")
+    print(f"{len(pairs) - len(failed)}/{len(pairs)} cases match the BeautifulSoup parsers")
+    return not failed
+
+def _normalize(value):
+    # Tuples, numpy scalars etc. the way they look after a JSON round trip
+    return json.loads(json.dumps(value, default=str, ensure_ascii=False))
+
+def golden_path(name):
+    return os.path.join(GOLDEN_DIR, f"{name}.json")
+
+def kontrol_et(all_cases, update=False):
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    failed = []
+    for name, fn in all_cases.items():
+        output = _normalize(fn())
+        path = golden_path(name)
+        if update:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(output, f, ensure_ascii=False, indent=1)
+            continue
+        if not os.path.exists(path):
+            failed.append(f"{name}: no golden file")
+            continue
+        with open(path, encoding="utf-8") as f:
+            if json.load(f) != output:
+                failed.append(f"{name}: output differs from golden")
+    if update:
+        print(f"{len(all_cases)} golden files written to {GOLDEN_DIR}")
+        return True
+    for line in failed: print(f"FAIL {line}")
+    print(f"{len(all_cases) - len(failed)}/{len(all_cases)} cases match golden output")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser micro-benchmark")
+    parser.add_argument("--check", action="store_true", help="compare outputs with the golden files")
+    parser.add_argument("--update-golden", action="store_true", help="write the current outputs as golden")
+    parser.add_argument("--baseline", action="store_true", help="compare with the pre-lxml BeautifulSoup parsers")
+    parser.add_argument("-k", dest="filter", help="only cases whose name contains this")
+    parser.add_argument("--json", help="write the timings to this file")
+    args = parser.parse_args()
+
+    if args.baseline:
+        sys.exit(0 if baseline_kontrol() else 1)
+
+    all_cases = {k: v for k, v in cases().items() if not args.filter or args.filter in k}
+    if args.check or args.update_golden:
+        sys.exit(0 if kontrol_et(all_cases, update=args.update_golden) else 1)
+
+    results = {}
+    width = max(len(k) for k in all_cases)
+    print(f"{'case':<{width}} {'ms/call':>9} {'peak KB':>9} {'blocks':>8}")
+    for name, fn in all_cases.items():
+        seconds, peak_kb, blocks = olc(fn)
+        results[name] = {"ms_per_call": round(seconds * 1000, 3), "peak_kb": round(peak_kb, 1), "blocks": blocks}
+        print(f"{name:<{width}} {seconds * 1000:>9.3f} {peak_kb:>9.1f} {blocks:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
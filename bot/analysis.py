@@ -1,7 +1,6 @@
-from bs4 import BeautifulSoup
-import re
-
+from bot.jsf import PartialResponse
 from bot.notify import teams_bildirim_gonder
+from bot.extract import plan_satirlari
 
 def analizi_yap(mgr, xml_response, draft_item):
 
@@ -19,15 +18,12 @@ def analizi_yap(mgr, xml_response, draft_item):
     target_warehouses_str = draft_item.get('targets', "")
     known_warehouses = draft_item.get('found_warehouses', [])
 
-    html_parts = re.findall(r'<!\[CDATA\[(.*?)]]>', xml_response, re.DOTALL)
-    full_html = "".join(html_parts)
-    soup = BeautifulSoup(full_html, 'html.parser')
-    
-    plans_table = soup.find("tbody", id=lambda x: x and "plans" in x)
-    if not plans_table: return False
-
-    rows = plans_table.find_all("tr")
-    current_option = "Bilinmiyor"
+    if not isinstance(xml_response, PartialResponse):
+        xml_response = PartialResponse(xml_response)
+    # Only the plans panel is parsed; the rest of the response is not needed here
+    plans_html = xml_response.update("mainForm:shipmentPlansPanel") or xml_response.html
+    rows = plan_satirlari(plans_html)
+    if not rows: return False
 
     target_list = [t.strip().upper() for t in target_warehouses_str.split(',') if t.strip()]
     previously_found = set(k.upper() for k in known_warehouses)
@@ -36,49 +32,42 @@ def analizi_yap(mgr, xml_response, draft_item):
     firsat_sayisi = 0
     found_new = {"found_new": []}
 
-    for row in rows:
-        if "ui-rowgroup-header" in row.get("class", []):
-            current_option = row.get_text(strip=True)
-            continue
-            
-        cells = row.find_all("td")
-        if len(cells) > 3:
-            dist_text = cells[3].get_text(strip=True)
-            if "mi" in dist_text:
-                try:
-                    mil = int(dist_text.replace("mi", "").replace(",", "").strip())
-                    dest = cells[2].get_text(strip=True).upper()
-                    dest = dest.split(":")[0]
-                    
-                    if "Amazon Optimized" in current_option: continue
-                    
-                    # --- PRIORITY 1: TARGET WAREHOUSE (STOP CONDITION) ---
-                    if any(target in dest for target in target_list):
-                        mgr.add_log(f"🎯 HEDEF DEPO BULUNDU! ({dest}) - Takip Bitiyor.", "success")
-                        teams_bildirim_gonder(
-                            mgr=mgr,
-                            title="🎯 Hedef Depo Yakalandı!",
-                            message=f"**{draft_name}** için hedef depo (**{dest}**) bulundu. Takip listesinden çıkarılıyor.",
-                            status="success",
-                            facts={"Depo": dest, "Mesafe": f"{mil} Mil", "Plan": current_option}
-                        )
-                        return {"found_target": [{dest:mil}]} # Special signal to STOP
-                    
-                    # --- PRIORITY 2: MILE LIMIT (COPY CONDITION) ---
-                    elif mil < limit_mile:
-                        if dest in previously_found:
-                            print(f"Skipping {dest} (Already copied)")
-                            mgr.add_log(f"Skipping {dest} (Already copied)")
-                            found_new["found_new"].append({dest: mil})
-                            continue
-                        mgr.add_log(f"✅ MESAFE UYGUN: {mil} Mil ({dest})", "success")
-                        firsat_sayisi += 1
-                        bulunan_firsatlar[current_option] = f"{mil} Mil ➡️ {dest}"
+    for current_option, dest_text, dist_text in rows:
+        if "mi" in dist_text:
+            try:
+                mil = int(dist_text.replace("mi", "").replace(",", "").strip())
+                dest = dest_text.upper()
+                dest = dest.split(":")[0]
+                
+                if "Amazon Optimized" in current_option: continue
+                
+                # --- PRIORITY 1: TARGET WAREHOUSE (STOP CONDITION) ---
+                if any(target in dest for target in target_list):
+                    mgr.add_log(f"🎯 HEDEF DEPO BULUNDU! ({dest}) - Takip Bitiyor.", "success")
+                    teams_bildirim_gonder(
+                        mgr=mgr,
+                        title="🎯 Hedef Depo Yakalandı!",
+                        message=f"**{draft_name}** için hedef depo (**{dest}**) bulundu. Takip listesinden çıkarılıyor.",
+                        status="success",
+                        facts={"Depo": dest, "Mesafe": f"{mil} Mil", "Plan": current_option}
+                    )
+                    return {"found_target": [{dest:mil}]} # Special signal to STOP
+                
+                # --- PRIORITY 2: MILE LIMIT (COPY CONDITION) ---
+                elif mil < limit_mile:
+                    if dest in previously_found:
+                        print(f"Skipping {dest} (Already copied)")
+                        mgr.add_log(f"Skipping {dest} (Already copied)")
                         found_new["found_new"].append({dest: mil})
+                        continue
+                    mgr.add_log(f"✅ MESAFE UYGUN: {mil} Mil ({dest})", "success")
+                    firsat_sayisi += 1
+                    bulunan_firsatlar[current_option] = f"{mil} Mil ➡️ {dest}"
+                    found_new["found_new"].append({dest: mil})
 
-                except Exception as e: 
-                    mgr.add_log(f"Analiz hatasi: {e}")
-                    pass
+            except Exception as e: 
+                mgr.add_log(f"Analiz hatasi: {e}")
+                pass
 
     # --- SEND SINGLE NOTIFICATION ---
     if bulunan_firsatlar:
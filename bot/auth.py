@@ -1,51 +1,118 @@
 from bs4 import BeautifulSoup
 import requests
 import re
+import threading
+import time
 
-from bot.jsf import form_verilerini_topla
+from bot.trace import adim
 from bot.constants import (
     LOGIN_URL,
     DRAFT_PAGE_URL,
+    ACCOUNT_DIR_TTL,
 )
 
-def login(mgr):
-    """Siteye giriş yapar."""
 
-    try:
-        # Önce login sayfasına gidip ViewState alalım
+class HesapDizini:
+    """
+    The store accounts of one login, shared by all its sessions.
 
-        mgr.session.cookies.clear()
+    Fetched from the account menu at most once per ACCOUNT_DIR_TTL (or after
+    gecersiz_kil()); in between, sessions resolve their active account from
+    it without asking the server. Entries carry no is_active flag: which
+    account is active differs per session.
+    """
 
-        res = mgr.session.get(LOGIN_URL)
-        soup = BeautifulSoup(res.text, 'html.parser')
-        view_state_input = soup.find("input", {"name": "javax.faces.ViewState"})
-        button_id = soup.find("button").get("id")
+    def __init__(self, ttl=ACCOUNT_DIR_TTL):
+        self.ttl = ttl
+        self._accounts = []
+        self._fetched_at = 0.0  # wall clock, so a restored list keeps its age
+        self._lock = threading.Lock()
 
-        if not view_state_input:
-            print("HATA: Login sayfasında ViewState bulunamadı.")
-            return False
-        view_state = view_state_input.get('value')
+    def hesaplar(self):
+        """The cached list, or [] if it was never fetched or has expired."""
+        with self._lock:
+            if time.time() - self._fetched_at > self.ttl:
+                return []
+            return list(self._accounts)
 
-        payload = {
-            "mainForm": "mainForm",
-            "mainForm:email": mgr.email,
-            "mainForm:password": mgr.password,
-            button_id: "",
-            "javax.faces.ViewState": view_state
-        }
+    def guncelle(self, accounts, fetched_at=None):
+        with self._lock:
+            self._accounts = [{k: v for k, v in a.items() if k != "is_active"} for a in accounts]
+            self._fetched_at = fetched_at or time.time()
+
+    @property
+    def fetched_at(self):
+        return self._fetched_at
+
+    def gecersiz_kil(self):
+        with self._lock:
+            self._fetched_at = 0.0
+
+
+def aktif_isaretle(accounts, active_id=None, active_name=None):
+    """Copies of accounts with is_active set by id, or by name if no id is given."""
+    if active_id is not None:
+        return [{**a, "is_active": a["id"] == active_id} for a in accounts]
+    active_name = (active_name or "").strip()
+    return [{**a, "is_active": a["name"].strip() == active_name} for a in accounts]
 
-        post_res = mgr.session.post(LOGIN_URL, data=payload, headers={"Referer": LOGIN_URL})
+def giris_formu_gonder(session, email, password):
+    """
+    Posts the login form on session. Returns the response of the POST, or
+    None if the form could not be read or the site rejected the credentials.
+    """
+    # Önce login sayfasına gidip ViewState alalım
+    res = session.get(LOGIN_URL)
+    soup = BeautifulSoup(res.text, 'html.parser')
+    view_state_input = soup.find("input", {"name": "javax.faces.ViewState"})
+    button_id = soup.find("button").get("id")
+
+    if not view_state_input:
+        print("HATA: Login sayfasında ViewState bulunamadı.")
+        return None
+    view_state = view_state_input.get('value')
+
+    payload = {
+        "mainForm": "mainForm",
+        "mainForm:email": email,
+        "mainForm:password": password,
+        button_id: "",
+        "javax.faces.ViewState": view_state
+    }
+
+    post_res = session.post(LOGIN_URL, data=payload, headers={"Referer": LOGIN_URL})
+
+    # Başarılı login kontrolü:
+    # JSF genelde hata verirse aynı sayfada kalır, başarırsa redirect eder.
+    # URL hala login.jsf ise veya içerikte hata mesajı varsa başarısızdır.
+    if "login.jsf" in post_res.url and "ui-messages-error" in post_res.text:
+        print("Login Başarısız: Hata mesajı algılandı.")
+        return None
+    return post_res
+
+@adim("login")
+def login(mgr):
+    """Siteye giriş yapar."""
+
+    try:
+        mgr.session.cookies.clear()
+        mgr.jsf.temizle()
 
-        # Başarılı login kontrolü:
-        # JSF genelde hata verirse aynı sayfada kalır, başarırsa redirect eder.
-        # URL hala login.jsf ise veya içerikte hata mesajı varsa başarısızdır.
-        if "login.jsf" in post_res.url and "ui-messages-error" in post_res.text:
-            print("Login Başarısız: Hata mesajı algılandı.")
+        post_res = giris_formu_gonder(mgr.session, mgr.email, mgr.password)
+        if post_res is None:
             return False
         print(f"Login isteği sonucu: {post_res.status_code}, URL: {post_res.url}")
+        # The redirect after login usually is the draft page; the account fetch reuses it
+        mgr.jsf.kaydet(post_res)
 
         fetch_accounts_backend(mgr, DRAFT_PAGE_URL)
 
+        # Pooled sessions are pinned to one store account; select it again after (re)login
+        pinned_id = getattr(mgr, "pinned_account_id", None)
+        if pinned_id and pinned_id != mgr.current_account_id:
+            if switch_account_backend(mgr, pinned_id):
+                mgr.current_account_id = pinned_id
+
         return True
 
     except Exception as e:
@@ -53,51 +120,95 @@ def login(mgr):
 
         return False
 
-def fetch_accounts_backend(mgr, current_url=DRAFT_PAGE_URL):
+def aktif_hesap_ve_menu(page_html):
     """
-    1. Gets the current page to find out who we are logged in as (ccFlag).
-    2. Opens the menu to get the list of available accounts.
+    Reads a full page: the active account name (ccFlag) and the id of the
+    account menu button. Either is None if not found.
+    """
+    soup_page = BeautifulSoup(page_html, 'html.parser')
+
+    active_account_name = None
+    cc_flag_div = soup_page.find("div", id="ccFlag")
+    if cc_flag_div:
+        # Span içindeki texti al (örn: " Babil Design")
+        active_account_name = cc_flag_div.get_text(strip=True) or None
+
+    menu_btn_id = None
+    # Strategy B: Fallback to onclick content if A fails
+    link = soup_page.find("a", onclick=re.compile(r"__my_store__"))
+    if link: menu_btn_id = link.get("id")
+
+    # Strategy A: Look for Amazon Icon
+    icon = soup_page.find("i", class_="fa-amazon")
+    if icon:
+        parent = icon.find_parent("a")
+        if parent: menu_btn_id = parent.get("id")
+
+    return active_account_name, menu_btn_id
+
+def hesap_listesi(table_html, active_account_name):
+    """Rows of the store menu table as [{id, name, flag, is_active}]."""
+    inner_soup = BeautifulSoup(table_html, 'html.parser')
+    rows = inner_soup.find_all("tr", attrs={"data-rk": True})
+    
+    accounts = []
+    for row in rows:
+        rk_id = row['data-rk']
+        
+        # İsmi input değerinden al
+        name_input = row.find("input", id=lambda x: x and "store_name" in x)
+        name = name_input['value'] if name_input else row.get_text(strip=True)
+        
+        # --- AKTİFLİK KONTROLÜ ---
+        # Tablodaki isim ile sayfadaki aktif isim aynı mı?
+        accounts.append({
+            "id": rk_id,
+            "name": name,
+            "flag": "🇺🇸", 
+            "is_active": name.strip() == active_account_name.strip()
+        })
+    return accounts
+
+@adim("accounts")
+def fetch_accounts_backend(mgr, current_url=DRAFT_PAGE_URL, force=False):
+    """
+    1. Reads the current page to find out who we are logged in as (ccFlag);
+       a page the JSF client already holds is reused instead of a new GET.
+    2. Takes the account list from the login's HesapDizini, or opens the
+       menu to fetch it if the directory is empty/expired, force is set or
+       the active account is not in it.
     """
     try:
-        # --- ADIM 1: MEVCUT HESABI BUL (GET İSTEĞİ) ---
-        res_page = mgr.session.get(current_url)
+        # --- ADIM 1: MEVCUT HESABI BUL ---
+        sayfa = mgr.jsf.sayfa_al(current_url)
         # Login ekranına attıysa dur
-        if "login.jsf" in res_page.url: 
+        if sayfa is None: 
             print("Login gerekli.")
             return False
 
-        soup_page = BeautifulSoup(res_page.text, 'html.parser')
-        
-        # Sayfanın tepesindeki bayrak/isim alanını bul (id="ccFlag")
-        active_account_name = "Bilinmiyor"
-        cc_flag_div = soup_page.find("div", id="ccFlag")
-        
-        if cc_flag_div:
-            # Span içindeki texti al (örn: " Babil Design")
-            span_text = cc_flag_div.get_text(strip=True)
-            if span_text:
-                active_account_name = span_text
-                mgr.current_account_name = active_account_name
-                print(f"✅ Aktif Hesap Tespit Edildi: {active_account_name}")
+        # Sayfanın tepesindeki bayrak/isim alanı (id="ccFlag") ve hesap menüsü butonu
+        active_account_name, menu_btn_id = aktif_hesap_ve_menu(sayfa.html)
+        if "ccFlag" in sayfa.updates:
+            # Re-rendered since the page was loaded (account switch)
+            active_account_name = BeautifulSoup(sayfa.updates["ccFlag"], 'html.parser').get_text(strip=True) or active_account_name
+        if active_account_name:
+            mgr.current_account_name = active_account_name
+            print(f"✅ Aktif Hesap Tespit Edildi: {active_account_name}")
         else:
+            active_account_name = "Bilinmiyor"
             print("⚠️ ccFlag bulunamadı, aktif hesap adı çekilemedi.")
 
-        # --- ADIM 2: HESAP LİSTESİNİ ÇEK (POST İSTEĞİ) ---
-        # Menu butonuna basıp listeyi alıyoruz
-        form_data = form_verilerini_topla(res_page.text)
-        menu_btn_id = None
-        
-        # Strategy B: Fallback to onclick content if A fails
-        if not menu_btn_id:
-            link = soup_page.find("a", onclick=re.compile(r"__my_store__"))
-            if link: menu_btn_id = link.get("id")
-
-        # Strategy A: Look for Amazon Icon
-        icon = soup_page.find("i", class_="fa-amazon")
-        if icon:
-            parent = icon.find_parent("a")
-            if parent: menu_btn_id = parent.get("id")
-            
+        # --- ADIM 2: HESAP LİSTESİ (önce önbellek) ---
+        known = [] if force else mgr.hesap_dizini.hesaplar()
+        accounts = aktif_isaretle(known, active_name=active_account_name)
+        active = next((a for a in accounts if a["is_active"]), None)
+        if active is not None:
+            mgr.current_account_id = active["id"]
+            mgr.available_accounts = accounts
+            return True
+
+        # --- HESAP LİSTESİNİ ÇEK (POST İSTEĞİ) ---
+        # Menu butonuna basıp listeyi alıyoruz (ViewState JSF istemcisinden)
         if not menu_btn_id:
             print("❌ Could not find the Account Menu button ID.")
             return False
@@ -109,52 +220,29 @@ def fetch_accounts_backend(mgr, current_url=DRAFT_PAGE_URL):
             "javax.faces.partial.render": "__my_store_form__:__my_stor_table__",
             menu_btn_id: menu_btn_id,
             "formLogo": "formLogo",
-            "javax.faces.ViewState": form_data.get("javax.faces.ViewState", "")
         }
         
-        res_menu = mgr.session.post(current_url, data=payload)
-        
-        # XML Parse
-        outer_soup = BeautifulSoup(res_menu.text, 'xml')
-        update_tag = outer_soup.find('update', {'id': '__my_store_form__:__my_stor_table__'})
+        pr_menu = mgr.jsf.ajax(current_url, payload)
+        inner_html = pr_menu.update('__my_store_form__:__my_stor_table__', None) if pr_menu else None
         
-        if not update_tag:
+        if inner_html is None:
             print("Hesap tablosu XML içinde bulunamadı.")
             return False
 
-        inner_html = update_tag.text
-        inner_soup = BeautifulSoup(inner_html, 'html.parser')
-        rows = inner_soup.find_all("tr", attrs={"data-rk": True})
-        
-        new_accounts_list = []
-        
-        for row in rows:
-            rk_id = row['data-rk']
-            
-            # İsmi input değerinden al
-            name_input = row.find("input", id=lambda x: x and "store_name" in x)
-            name = name_input['value'] if name_input else row.get_text(strip=True)
-            
-            # --- AKTİFLİK KONTROLÜ ---
-            # Tablodaki isim ile yukarıda bulduğumuz aktif isim aynı mı?
-            # (Küçük/büyük harf duyarlılığını kaldırmak için .strip() kullanıyoruz)
-            is_active = (name.strip() == active_account_name.strip())
-            if is_active:
-                mgr.current_account_id = rk_id
-            new_accounts_list.append({
-                "id": rk_id,
-                "name": name,
-                "flag": "🇺🇸", 
-                "is_active": is_active
-            })
-            
+        new_accounts_list = hesap_listesi(inner_html, active_account_name)
+        for account in new_accounts_list:
+            if account["is_active"]:
+                mgr.current_account_id = account["id"]
+
         mgr.available_accounts = new_accounts_list
+        mgr.hesap_dizini.guncelle(new_accounts_list)
         return True
 
     except Exception as e:
         print(f"Hesap çekme hatası: {e}")
         return False
 
+@adim("switch_account")
 def switch_account_backend(mgr, account_rk, current_url=DRAFT_PAGE_URL):
     """
     Switches the account using the row key (data-rk).
@@ -165,10 +253,8 @@ def switch_account_backend(mgr, account_rk, current_url=DRAFT_PAGE_URL):
         # We need the current ViewState and also the form data from the account list 
         # (because JSF often requires the values of the inputs in the table to be sent back)
         
-        # 1. Trigger fetch again to ensure we have the latest table state/ViewState to submit
-        # Or simply use the page we are on. Let's assume we are on DRAFT_PAGE_URL.
-        res_page = mgr.session.get(current_url)
-        form_data = form_verilerini_topla(res_page.text)
+        # 1. The ViewState of the page we are on comes from the JSF client
+        #    (kept current by the account menu request); it only GETs the page if it has none.
         
         # We need to construct the specific payload for row selection
         # Note: We need to recreate the inputs for the table rows (store_name) 
@@ -189,19 +275,23 @@ def switch_account_backend(mgr, account_rk, current_url=DRAFT_PAGE_URL):
             "__my_store_form__:__my_stor_table__:j_idt26:filter": "",
             "__my_store_form__:__my_stor_table___selection": account_rk,
             "__my_store_form__:__my_stor_table___scrollState": "0,0",
-            "javax.faces.ViewState": form_data.get("javax.faces.ViewState", "")
         }
         
         # Sending request
-        res = mgr.session.post(current_url, data=payload)
+        pr = mgr.jsf.ajax(current_url, payload)
         
         # Check for success (Look for ccFlag update which shows the new name)
-        if "update id=\"ccFlag\"" in res.text:
-            # Refresh accounts list to update 'active' status in our UI
-            fetch_accounts_backend(mgr) 
+        if pr is not None and "ccFlag" in pr.updates:
+            # Confirmed by the server: flip the active flag locally, no refetch
+            mgr.current_account_id = account_rk
+            mgr.available_accounts = aktif_isaretle(mgr.available_accounts or mgr.hesap_dizini.hesaplar(), active_id=account_rk)
+            new_name = BeautifulSoup(pr.updates["ccFlag"], 'html.parser').get_text(strip=True)
+            if new_name: mgr.current_account_name = new_name
             mgr.add_log("✅ Hesap başarıyla değiştirildi.", "success")
             return True
         else:
+            # The account may be gone; the next fetch reads the menu again
+            mgr.hesap_dizini.gecersiz_kil()
             mgr.add_log("❌ Hesap değiştirme başarısız oldu.", "error")
             return False
             
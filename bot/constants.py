@@ -1,5 +1,7 @@
+import os
 
-BASE_URL = "https://app.2dworkflow.com"
+# Overridable so the bot can run against a local stand-in server (see bench/)
+BASE_URL = os.environ.get("TWODW_BASE_URL", "https://app.2dworkflow.com").rstrip("/")
 
 LOGIN_URL = f"{BASE_URL}/login.jsf"
 DRAFT_PAGE_URL = f"{BASE_URL}/draft.jsf"
@@ -16,4 +18,23 @@ JSF_VIEWSTATE = "javax.faces.ViewState"
 JSF_PARTIAL = "javax.faces.partial.ajax"
 JSF_SOURCE = "javax.faces.source"
 JSF_EXECUTE = "javax.faces.partial.execute"
-JSF_RENDER = "javax.faces.partial.render"
\ No newline at end of file
+JSF_RENDER = "javax.faces.partial.render"
+
+# Plan polling (seconds)
+POLL_MIN_INTERVAL = 1.0
+POLL_MAX_INTERVAL = 8.0
+POLL_DEADLINE = 300
+# A plans table equal to the one before create_plan is taken as the result once it
+# was seen unchanged (and without a progress bar) this many polls in a row, this long after the start
+POLL_STABLE_POLLS = 3
+POLL_STABLE_MIN_SECONDS = 20
+
+# Cached draft lists are fetched again after this many seconds
+DRAFT_PAGE_MAX_AGE = 120
+
+# The store account list of a login is fetched again after this many seconds
+ACCOUNT_DIR_TTL = 24 * 3600
+
+# Waiting for a copied draft to appear in the list (seconds)
+COPY_READY_MIN_DELAY = 0.5
+COPY_READY_TIMEOUT = 8
@@ -1,72 +1,280 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
+import threading
+import queue
+import atexit
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
 
 DB_NAME = os.path.join("data", "bot_data.db")
 
+# Connection settings
+BUSY_TIMEOUT_MS = 5000
+WRITE_BATCH_MAX = 200  # max queued writes committed in one transaction
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+def _connect():
+    conn = sqlite3.connect(
+        DB_NAME,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=256,  # prepared statements are reused per connection
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
 def get_connection():
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
+    """Returns this thread's persistent read connection."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
+    return conn
+
+
+class _Writer(threading.Thread):
+    """
+    The only thread that writes to the database.
+
+    Writes are queued as callables taking the writer's connection; everything
+    queued at the same moment is committed in a single transaction, so
+    concurrent schedulers and UI threads never fight over the write lock.
+    """
+
+    def __init__(self):
+        super().__init__(name="db-writer", daemon=True)
+        self.queue = queue.Queue()
+        self.conn = None
+
+    def submit(self, fn):
+        future = Future()
+        self.queue.put((fn, future))
+        return future
+
+    def run(self):
+        self.conn = _connect()
+        while True:
+            item = self.queue.get()
+            if item is None: break
+            batch = [item]
+            stop = False
+            while len(batch) < WRITE_BATCH_MAX:
+                try:
+                    nxt = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._commit(batch)
+            if stop: break
+        self.conn.close()
+
+    def _commit(self, batch):
+        results = []
+        for fn, future in batch:
+            try:
+                results.append((future, fn(self.conn), None))
+            except Exception as e:
+                results.append((future, None, e))
+        try:
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            results = [(future, None, e) for future, _, _ in results]
+        for future, result, error in results:
+            if error: future.set_exception(error)
+            else: future.set_result(result)
+
+    def stop(self):
+        """Flushes everything queued so far and stops the thread."""
+        self.queue.put(None)
+        self.join(timeout=10)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = _Writer()
+            _writer.start()
+        return _writer
+
+def write(fn, wait=True):
+    """
+    Runs fn(conn) on the writer thread inside its batched transaction.
+    wait=True blocks until committed and returns fn's result.
+    """
+    future = _get_writer().submit(fn)
+    return future.result() if wait else future
+
+def close_db():
+    global _writer
+    _log_buffer.flush()
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None and writer.is_alive():
+        writer.stop()
+
+atexit.register(close_db)
 
 def init_db():
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Takip Listesi Tablosu
-    c.execute('''CREATE TABLE IF NOT EXISTS tasks (
-        date_key TEXT PRIMARY KEY,
-        owner_email TEXT,
-        account_id TEXT,
-        account_name TEXT,
-        draft_name TEXT,
-        loc TEXT,
-        max_mile INTEGER,
-        targets TEXT,
-        found_warehouses TEXT
-    )''')
-
-    # Log Tablosu
-    c.execute('''CREATE TABLE IF NOT EXISTS logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp TEXT,
-        message TEXT,
-        type TEXT
-    )''')
-    
-    conn.commit()
-    conn.close()
+    global _initialized
+    with _init_lock:
+        if _initialized: return
+        os.makedirs(os.path.dirname(DB_NAME), exist_ok=True)
+        conn = _connect()
+        c = conn.cursor()
+
+        # Takip Listesi Tablosu
+        c.execute('''CREATE TABLE IF NOT EXISTS tasks (
+            date_key TEXT PRIMARY KEY,
+            owner_email TEXT,
+            account_id TEXT,
+            account_name TEXT,
+            draft_name TEXT,
+            loc TEXT,
+            max_mile INTEGER,
+            targets TEXT,
+            found_warehouses TEXT
+        )''')
+        # Per-task scheduling (NULL interval = the user's regular cycle)
+        task_columns = {row[1] for row in c.execute("PRAGMA table_info(tasks)")}
+        for column, ddl in (("interval_min", "INTEGER"), ("priority", "INTEGER DEFAULT 0"), ("last_checked", "TEXT")):
+            if column not in task_columns:
+                c.execute(f"ALTER TABLE tasks ADD COLUMN {column} {ddl}")
+
+        # Log Tablosu
+        c.execute('''CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            message TEXT,
+            type TEXT
+        )''')
+        # Structured columns (added to existing databases as well)
+        log_columns = {row[1] for row in c.execute("PRAGMA table_info(logs)")}
+        for column in ("created_at", "owner_email", "account", "draft_key"):
+            if column not in log_columns:
+                c.execute(f"ALTER TABLE logs ADD COLUMN {column} TEXT")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_logs_owner_id ON logs (owner_email, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_logs_created_at ON logs (created_at)")
+
+        # HTTP İstek İzleri (bot.trace)
+        c.execute('''CREATE TABLE IF NOT EXISTS http_trace (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cycle_id TEXT,
+            ts TEXT,
+            owner_email TEXT,
+            account TEXT,
+            draft_key TEXT,
+            step TEXT,
+            method TEXT,
+            path TEXT,
+            status INTEGER,
+            elapsed_ms REAL,
+            bytes INTEGER,
+            viewstate_bytes INTEGER
+        )''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_trace_owner_cycle ON http_trace (owner_email, cycle_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_trace_ts ON http_trace (ts)")
+
+        # Şifreli oturum çerezleri (bot.session_store); slot '' = ana oturum, yoksa hesap id
+        c.execute('''CREATE TABLE IF NOT EXISTS saved_sessions (
+            owner_email TEXT,
+            slot TEXT,
+            salt BLOB,
+            payload BLOB,
+            updated_at TEXT,
+            PRIMARY KEY (owner_email, slot)
+        )''')
 
-# --- GÖREV İŞLEMLERİ ---
-def add_task(owner_email, data):
-    conn = get_connection()
-    try:
-        # Listeleri JSON string'e çeviriyoruz çünkü SQLite array tutamaz
-        found_wh_str = json.dumps(data.get('found_warehouses', []))
-        
-        conn.execute('''INSERT OR REPLACE INTO tasks 
-                        (date_key, owner_email, account_id, account_name, draft_name, loc, max_mile, targets, found_warehouses)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', 
-                        (data['date'], owner_email, data.get('account_id'), data.get('account_name'), 
-                         data['name'], data['loc'], data['max_mile'], 
-                         data['targets'], found_wh_str))
         conn.commit()
-    finally:
         conn.close()
+        _initialized = True
+    prune_logs()
+
+# --- GÖREV İŞLEMLERİ ---
+SQL_UPSERT_TASK = '''INSERT OR REPLACE INTO tasks
+                     (date_key, owner_email, account_id, account_name, draft_name, loc, max_mile, targets, found_warehouses,
+                      interval_min, priority, last_checked)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+def _task_params(owner_email, data):
+    # Listeleri JSON string'e çeviriyoruz çünkü SQLite array tutamaz
+    found_wh_str = json.dumps(data.get('found_warehouses', []))
+    return (data['date'], owner_email, data.get('account_id'), data.get('account_name'),
+            data['name'], data['loc'], data['max_mile'],
+            data['targets'], found_wh_str,
+            data.get('interval_min'), data.get('priority') or 0, data.get('last_checked'))
+
+def add_task(owner_email, data):
+    params = _task_params(owner_email, data)
+    write(lambda conn: conn.execute(SQL_UPSERT_TASK, params))
+
+def mark_tasks_checked(owner_email, date_keys, checked_at):
+    """Sets last_checked of the given tasks (one transaction, not awaited)."""
+    rows = [(checked_at, key, owner_email) for key in date_keys]
+    write(lambda conn: conn.executemany("UPDATE tasks SET last_checked = ? WHERE date_key = ? AND owner_email = ?", rows), wait=False)
 
 def remove_task(owner_email, date_key):
-    conn = get_connection()
-    conn.execute("DELETE FROM tasks WHERE date_key = ? AND owner_email = ?", (date_key, owner_email))
-    conn.commit()
-    conn.close()
+    write(lambda conn: conn.execute("DELETE FROM tasks WHERE date_key = ? AND owner_email = ?", (date_key, owner_email)))
+
+# Task dict field -> tasks column, for partial updates
+TASK_COLUMNS = {
+    'account_id': 'account_id',
+    'account_name': 'account_name',
+    'name': 'draft_name',
+    'loc': 'loc',
+    'max_mile': 'max_mile',
+    'targets': 'targets',
+    'found_warehouses': 'found_warehouses',
+    'interval_min': 'interval_min',
+    'priority': 'priority',
+}
+
+def sync_tasks(owner_email, inserts=(), updates=(), deletes=()):
+    """
+    Applies a watch list diff in one transaction (all or nothing).
+    inserts: task dicts, updates: (date_key, {field: new value}) with only the
+    changed fields, deletes: date keys.
+    """
+    def _sync(conn):
+        conn.execute("SAVEPOINT sync_tasks")
+        try:
+            for data in inserts:
+                conn.execute(SQL_UPSERT_TASK, _task_params(owner_email, data))
+            for date_key, fields in updates:
+                values = {TASK_COLUMNS[f]: json.dumps(v) if f == 'found_warehouses' else v for f, v in fields.items()}
+                assignments = ", ".join(f"{column} = ?" for column in values)
+                conn.execute(f"UPDATE tasks SET {assignments} WHERE date_key = ? AND owner_email = ?",
+                             (*values.values(), date_key, owner_email))
+            conn.executemany("DELETE FROM tasks WHERE date_key = ? AND owner_email = ?",
+                             [(date_key, owner_email) for date_key in deletes])
+        except Exception:
+            conn.execute("ROLLBACK TO sync_tasks")
+            raise
+        finally:
+            conn.execute("RELEASE sync_tasks")
+    write(_sync)
 
 def get_all_tasks(owner_email):
     conn = get_connection()
-    conn.row_factory = sqlite3.Row
     # SADECE KENDİ TASLAKLARINI ÇEK
     cursor = conn.execute("SELECT * FROM tasks WHERE owner_email = ?", (owner_email,))
     rows = cursor.fetchall()
-    conn.close()
-    
+
     tasks = {}
     for row in rows:
         d = dict(row)
@@ -76,17 +284,182 @@ def get_all_tasks(owner_email):
         tasks[row['date_key']] = d
     return tasks
 
+def task_record(owner_email, data):
+    """Builds the dict get_all_tasks would return for `data` after add_task."""
+    return {
+        'date_key': data['date'],
+        'owner_email': owner_email,
+        'account_id': data.get('account_id'),
+        'account_name': data.get('account_name'),
+        'draft_name': data['name'],
+        'loc': data['loc'],
+        'max_mile': data['max_mile'],
+        'targets': data['targets'],
+        'found_warehouses': list(data.get('found_warehouses', [])),
+        'interval_min': data.get('interval_min'),
+        'priority': data.get('priority') or 0,
+        'last_checked': data.get('last_checked'),
+        'name': data['name'],
+        'date': data['date'],
+    }
+
 # --- LOG İŞLEMLERİ ---
-def add_log_db(message, log_type):
-    conn = get_connection()
-    ts = datetime.now().strftime("%H:%M:%S")
-    conn.execute("INSERT INTO logs (timestamp, message, type) VALUES (?, ?, ?)", (ts, message, log_type))
-    conn.commit()
-    conn.close()
+LOG_FLUSH_INTERVAL = 2.0  # seconds between background flushes
+LOG_BATCH_SIZE = 100      # flush immediately once this many lines are buffered
+
+# Retention: rows older than LOG_RETENTION_DAYS or beyond the newest LOG_RETENTION_ROWS are deleted
+LOG_RETENTION_DAYS = 14
+LOG_RETENTION_ROWS = 200_000
+# HTTP trace rows (one per request) get their own cap, under the same age limit
+TRACE_RETENTION_ROWS = 500_000
+LOG_PRUNE_INTERVAL = 3600  # seconds
+
+SQL_INSERT_LOG = """INSERT INTO logs (timestamp, message, type, created_at, owner_email, account, draft_key)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+class _LogBuffer:
+    """
+    Collects log rows in memory and hands them to the writer in batches,
+    every LOG_FLUSH_INTERVAL seconds or as soon as LOG_BATCH_SIZE rows are waiting.
+    The same background thread applies the retention policy every LOG_PRUNE_INTERVAL.
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, row):
+        with self.lock:
+            self.rows.append(row)
+            full = len(self.rows) >= LOG_BATCH_SIZE
+            if self.timer is None or not self.timer.is_alive():
+                self.timer = threading.Thread(target=self._run, name="db-log-flush", daemon=True)
+                self.timer.start()
+        if full: self.flush()
+
+    def flush(self, wait=False):
+        with self.lock:
+            rows, self.rows = self.rows, []
+        if rows:
+            write(lambda conn: conn.executemany(SQL_INSERT_LOG, rows), wait=wait)
+
+    def _run(self):
+        last_prune = time.monotonic()
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            self.flush()
+            if time.monotonic() - last_prune > LOG_PRUNE_INTERVAL:
+                last_prune = time.monotonic()
+                try: prune_logs()
+                except Exception as e: print(f"Log temizleme hatası: {e}")
+
+_log_buffer = _LogBuffer()
+
+def add_log_db(message, log_type, owner_email=None, account=None, draft_key=None):
+    now = datetime.now()
+    row = (now.strftime("%H:%M:%S"), message, log_type, now.isoformat(timespec="seconds"),
+           owner_email, account, draft_key)
+    # Log satırları beklenmez, tampon toplu olarak yazar
+    _log_buffer.add(row)
 
-def get_logs_db(limit=50):
+def flush_logs():
+    """Writes all buffered log lines and waits for the commit."""
+    _log_buffer.flush(wait=True)
+
+def prune_logs(max_age_days=LOG_RETENTION_DAYS, max_rows=LOG_RETENTION_ROWS, max_trace_rows=TRACE_RETENTION_ROWS):
+    """
+    Deletes log rows older than max_age_days and all but the newest max_rows,
+    and HTTP trace rows older than max_age_days and all but the newest max_trace_rows.
+    Freed pages are reused by SQLite, so the file stops growing.
+    """
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+
+    def _prune(conn):
+        conn.execute("DELETE FROM http_trace WHERE ts < ?", (cutoff,))
+        conn.execute(
+            "DELETE FROM http_trace WHERE id <= (SELECT id FROM http_trace ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (max_trace_rows,)
+        )
+        deleted = conn.execute("DELETE FROM logs WHERE created_at < ?", (cutoff,)).rowcount
+        deleted += conn.execute(
+            "DELETE FROM logs WHERE id <= (SELECT id FROM logs ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (max_rows,)
+        ).rowcount
+        return deleted
+
+    return write(_prune)
+
+def get_logs_db(limit=50, owner_email=None):
     conn = get_connection()
-    cursor = conn.execute("SELECT * FROM logs ORDER BY id DESC LIMIT ?", (limit,))
+    if owner_email:
+        cursor = conn.execute("SELECT * FROM logs WHERE owner_email = ? ORDER BY id DESC LIMIT ?", (owner_email, limit))
+    else:
+        cursor = conn.execute("SELECT * FROM logs ORDER BY id DESC LIMIT ?", (limit,))
     rows = cursor.fetchall()
-    conn.close()
-    return [f"{r[1]} {r[2]}" for r in rows] # "14:00 Mesaj" formatı
\ No newline at end of file
+    return [f"{r['timestamp']} {r['message']}" for r in rows] # "14:00 Mesaj" formatı
+
+def get_logs_page(owner_email, before_id=None, limit=50):
+    """
+    Keyset pagination over one user's logs, newest first.
+    Pass the smallest id of the previous page as before_id to get the next (older) page.
+    """
+    conn = get_connection()
+    cursor = conn.execute(
+        """SELECT id, created_at, type, account, draft_key, message FROM logs
+           WHERE owner_email = ? AND id < ?
+           ORDER BY id DESC LIMIT ?""",
+        (owner_email, before_id if before_id is not None else 2**63 - 1, limit)
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+# --- KAYITLI OTURUMLAR ---
+def save_session_blob(owner_email, slot, salt, payload):
+    params = (owner_email, slot, salt, payload, datetime.now().isoformat(timespec="seconds"))
+    write(lambda conn: conn.execute(
+        "INSERT OR REPLACE INTO saved_sessions (owner_email, slot, salt, payload, updated_at) VALUES (?, ?, ?, ?, ?)",
+        params), wait=False)
+
+def load_session_blob(owner_email, slot):
+    """(salt, payload) of a saved session, or None."""
+    row = get_connection().execute(
+        "SELECT salt, payload FROM saved_sessions WHERE owner_email = ? AND slot = ?", (owner_email, slot)
+    ).fetchone()
+    return (row['salt'], row['payload']) if row else None
+
+def delete_session_blob(owner_email, slot):
+    write(lambda conn: conn.execute("DELETE FROM saved_sessions WHERE owner_email = ? AND slot = ?", (owner_email, slot)), wait=False)
+
+# --- HTTP İZLERİ ---
+SQL_INSERT_TRACE = """INSERT INTO http_trace
+    (cycle_id, ts, owner_email, account, draft_key, step, method, path, status, elapsed_ms, bytes, viewstate_bytes)
+    VALUES (:cycle_id, :ts, :owner_email, :account, :draft_key, :step, :method, :path, :status, :elapsed_ms, :bytes, :viewstate_bytes)"""
+
+def save_trace_records(records):
+    write(lambda conn: conn.executemany(SQL_INSERT_TRACE, records), wait=False)
+
+def get_trace_cycles(owner_email, limit=20):
+    """The owner's most recent traced cycles with their totals."""
+    conn = get_connection()
+    cursor = conn.execute(
+        """SELECT cycle_id, MIN(ts) AS started, COUNT(*) AS requests,
+                  SUM(elapsed_ms) AS total_ms, SUM(bytes) AS bytes
+           FROM http_trace WHERE owner_email = ?
+           GROUP BY cycle_id ORDER BY cycle_id DESC LIMIT ?""",
+        (owner_email, limit)
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+def get_trace_summary(owner_email, cycle_id, group_by="step"):
+    """Per-step (or per-account/draft_key) totals of one cycle, slowest first."""
+    if group_by not in ("step", "account", "draft_key"):
+        raise ValueError(f"Unknown group_by: {group_by}")
+    conn = get_connection()
+    cursor = conn.execute(
+        f"""SELECT {group_by} AS grp, COUNT(*) AS requests, SUM(elapsed_ms) AS total_ms,
+                   MAX(elapsed_ms) AS max_ms, SUM(bytes) AS bytes, AVG(viewstate_bytes) AS avg_viewstate
+            FROM http_trace WHERE owner_email = ? AND cycle_id = ?
+            GROUP BY {group_by} ORDER BY total_ms DESC""",
+        (owner_email, cycle_id)
+    )
+    return [dict(row) for row in cursor.fetchall()]
@@ -1,8 +1,8 @@
 from bs4 import BeautifulSoup
-import urllib.parse
 from datetime import datetime
 import time
 import re
+import threading
 import pandas as pd
 
 from bot.constants import (
@@ -11,70 +11,100 @@ from bot.constants import (
     DRAFT_PAGE_URL,
     PLAN_URL,
     USER_AGENT,
+    POLL_MIN_INTERVAL,
+    POLL_MAX_INTERVAL,
+    POLL_DEADLINE,
+    POLL_STABLE_POLLS,
+    POLL_STABLE_MIN_SECONDS,
+    DRAFT_PAGE_MAX_AGE,
+    COPY_READY_MIN_DELAY,
+    COPY_READY_TIMEOUT,
 )
 from bot.auth import login
-from bot.jsf import form_verilerini_topla, extract_viewstate, jsf_ajax_payload
+from bot.jsf import form_verilerini_topla, jsf_ajax_payload, PartialResponse, JsfSayfa
 from bot.analysis import analizi_yap
+from bot.extract import taslak_satirlari, plan_satirlari, form_alanlari
+from bot.trace import adim
+from bot import trace
+
+# Marker returned by drafti_ac when the draft is not in the list
+TASLAK_YOK = object()
 
 def html_tabloyu_parse_et(mgr, html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    rows = soup.find_all("tr", role="row")
-    if not rows: return pd.DataFrame()
+    veri_listesi = taslak_satirlari(html_content)
+    if not veri_listesi: return pd.DataFrame()
 
+    # --- AUTO SELECT MANTIĞI ---
+    # Takip listesindeki tarihler seçili gelir
     takip_edilen_tarihler = set(mgr.watch_list.keys())
-    
-    veri_listesi = []
-    for row in rows:
-        cells = row.find_all("td")
-        if not cells or len(cells) < 11: continue
-        try:
-            name_input = cells[2].find("input")
-            draft_name = name_input['value'] if name_input else cells[2].get_text(strip=True)
-            name_input_id = name_input["id"]
-            open_link = row.find("a", title="Open Draft Shipment")
-            if not open_link: open_link = cells[1].find("a") 
-            row_action_id = open_link.get("id") if open_link else None
-            
-            # Copy butonu bulma
-            copy_link = row.find("a", title=lambda x: x and ("duplicate" in x.lower() or "copy" in x.lower()))
-            if not copy_link:
-                copy_icon = row.find("span", class_=lambda x: x and ("copy" in x or "clone" in x))
-                if copy_icon: copy_link = copy_icon.find_parent("a")
-            copy_action_id = copy_link.get("id") if copy_link else None
-
-            from_loc = cells[3].get_text(strip=True)
-            created_date = cells[10].get_text(strip=True)
-            units = cells[9].get_text(strip=True)
-            skus = cells[8].get_text(strip=True)
-            
-            # --- AUTO SELECT MANTIĞI ---
-            # Eğer bu draft ismi, oluşturduğumuz kopyalar listesindeyse TRUE yap
-            
+    for satir in veri_listesi:
+        satir["Seç"] = satir["Created"] in takip_edilen_tarihler
 
-            secili_mi = created_date in takip_edilen_tarihler
-            veri_listesi.append({
-                "Seç": secili_mi, # Dinamik seçim
-                "Draft Name": draft_name,
-                "From": from_loc,
-                "SKUs": skus,
-                "Units": units,
-                "Created": created_date,
-                "Action ID": row_action_id,
-                "Copy ID": copy_action_id,
-                "Name Input ID": name_input_id
-            })
-            
-        except Exception as e: 
-            print(e)
-            continue
-    return pd.DataFrame(veri_listesi)
+    columns = ["Seç", "Draft Name", "From", "SKUs", "Units", "Created", "Action ID", "Copy ID", "Name Input ID"]
+    return pd.DataFrame(veri_listesi, columns=columns)
+
+class TaslakSayfasi:
+    """The rows of a draft.jsf list page (a JsfSayfa), parsed once."""
+
+    def __init__(self, sayfa):
+        self.sayfa = sayfa
+        self.html = sayfa.html
+        self.rows = taslak_satirlari(sayfa.html)
+        self.by_date = {}
+        for row in self.rows:
+            self.by_date.setdefault(row["Created"], row)
+        self.cached = False  # True once the page has been served from the cache
 
+    @property
+    def form_data(self):
+        return self.sayfa.form_data
+
+
+class TaslakSayfasiCache:
+    """
+    The parsed draft list of one session, shared by all drafts of a cycle.
+
+    The page itself is the one mgr.jsf holds for DRAFT_PAGE_URL, so its
+    ViewState follows every AJAX response and it expires with the client's
+    DRAFT_PAGE_MAX_AGE; only the parsed rows are kept here.
+    Invalidated at the start of every cycle and after a copy/rename (row
+    indices in the action ids shift).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.page = None
+
+    def get(self, mgr, force=False):
+        with self.lock:
+            page = self.page
+            if page is not None and not force:
+                sayfa = mgr.jsf.sayfa(DRAFT_PAGE_URL)
+                if sayfa is page.sayfa:
+                    page.cached = True
+                    return page
+                if sayfa is not None:
+                    # Fetched again through the client meanwhile (e.g. a session probe)
+                    self.page = TaslakSayfasi(sayfa)
+                    return self.page
+            with adim("draft_list"):
+                res = mgr.jsf.get(DRAFT_PAGE_URL)
+                if "login.jsf" in res.url: login(mgr); res = mgr.jsf.get(DRAFT_PAGE_URL)
+            self.page = TaslakSayfasi(mgr.jsf.sayfa(res.url) or JsfSayfa(res.url, res.text))
+            return self.page
+
+    def invalidate(self):
+        with self.lock:
+            self.page = None
+
+
+@adim("draft_list")
 def veriyi_dataframe_yap(mgr):
     if not mgr.session.cookies:
         if not login(mgr): return None, "Giriş Yapılamadı"
     try:
-        response = mgr.session.get(DRAFT_PAGE_URL)
-        if "login.jsf" in response.url: login(mgr); response = mgr.session.get(DRAFT_PAGE_URL, headers={"Referer": DRAFT_PAGE_URL})
+        response = mgr.jsf.get(DRAFT_PAGE_URL)
+        if "login.jsf" in response.url: login(mgr); response = mgr.jsf.get(DRAFT_PAGE_URL, headers={"Referer": DRAFT_PAGE_URL})
         df = html_tabloyu_parse_et(mgr, response.text)
         
         if not df.empty:
@@ -89,64 +119,133 @@ def veriyi_dataframe_yap(mgr):
             return (None, "Tablo boş.")
     except Exception as e: return None, str(e)
 
-def poll_results_until_complete(session, base_payload, referer_url):
-    max_retries = 60
+def _plan_durumu(pr):
+    """Returns (progress percent or None, plans table rendered?) of a poll response."""
+    progress_html = pr.update("mainForm:progressBarPlaning") or pr.html
+    match_percent = re.search(r'>\s*(\d+)\s*%\s*<', progress_html)
+    percent = int(match_percent.group(1)) if match_percent else None
+    plans_ready = 'id="mainForm:plans' in (pr.update("mainForm:shipmentPlansPanel") or pr.html)
+    return percent, plans_ready
+
+@adim("poll")
+def poll_results_until_complete(jsf, sayfa, referer_url, deadline=POLL_DEADLINE, onceki_satirlar=()):
+    """
+    Polls the planning progress of the plan page sayfa (a JsfSayfa of the
+    client jsf) until the plans table is rendered.
+
+    Polls fast at first, then spaces the polls out according to the observed
+    progress rate (aiming at the estimated finish time). Gives up after
+    `deadline` seconds and returns None; otherwise the final PartialResponse.
+
+    onceki_satirlar are the plan rows already on the page before create_plan
+    (see plan_satirlari): a table without any progress seen counts as the
+    result once it differs from them, so a previous run's plans are not
+    returned as this run's. An equal table (a run that finished between two
+    polls with the same plans) is accepted after POLL_STABLE_POLLS polls in a
+    row and POLL_STABLE_MIN_SECONDS from the start.
+    """
+    poll_params = {
+        "javax.faces.partial.ajax": "true",
+        "javax.faces.source": "mainForm:planingStatusDialogPoll",
+        "javax.faces.partial.execute": "@all",
+        "javax.faces.partial.render": "mainForm:shipmentPlansPanel mainForm:a2dw_boxContentPanel mainForm:progressBarPlaning",
+        "mainForm:planingStatusDialogPoll": "mainForm:planingStatusDialogPoll",
+        "mainForm": "mainForm"
+    }
+    started = time.monotonic()
+    give_up_at = started + deadline
+    interval = POLL_MIN_INTERVAL
     last_percent = 0
+    first_progress = None  # (time, percent) of the first non-zero progress
+    onceki_satirlar = list(onceki_satirlar)
+    stable_polls = 0       # polls in a row with the previous table and no progress bar
 
-    for i in range(max_retries):
+    while time.monotonic() < give_up_at:
         try:
-            poll_params = {
-                "javax.faces.partial.ajax": "true",
-                "javax.faces.source": "mainForm:planingStatusDialogPoll",
-                "javax.faces.partial.execute": "@all",
-                "javax.faces.partial.render": "mainForm:shipmentPlansPanel mainForm:a2dw_boxContentPanel mainForm:progressBarPlaning",
-                "mainForm:planingStatusDialogPoll": "mainForm:planingStatusDialogPoll",
-                "mainForm": "mainForm"
-            }
-            res = session.post(PLAN_URL, data={**base_payload, **poll_params}, headers={"Referer": referer_url})
-            
-            if "javax.faces.ViewState" in res.text:
-                try:
-                    match = re.search(r'id=".*?javax\.faces\.ViewState.*?"><!\[CDATA\[(.*?)]]>', res.text)
-                    if match: base_payload["javax.faces.ViewState"] = match.group(1)
-                except: pass
-
-            #if "mainForm:plans" in res.text or "Amazon Optimized Splits" in res.text:
-                #return res.text
-            
-            match_percent = re.search(r'>\s*(\d+)\s*%\s*<', res.text)
-            current_percent = int(match_percent.group(1)) if match_percent else 0
+            pr = jsf.gonder(sayfa, poll_params, with_form=True, url=PLAN_URL, headers={"Referer": referer_url})
+
+            percent, plans_ready = _plan_durumu(pr)
+            now = time.monotonic()
+            in_progress = percent is not None and 0 < percent < 100
+
+            # --- COMPLETION ---
+            if plans_ready and not in_progress:
+                # Table right after a run we watched, at 100%, or a table other than the one before create_plan
+                if last_percent > 0 or percent == 100:
+                    return pr
+                if plan_satirlari(pr.update("mainForm:shipmentPlansPanel") or pr.html) != onceki_satirlar:
+                    return pr
+                stable_polls += 1
+                if stable_polls >= POLL_STABLE_POLLS and now - started >= POLL_STABLE_MIN_SECONDS:
+                    return pr
+            else:
+                stable_polls = 0
+            if percent == 0 and last_percent > 50: return pr
+
+            # --- NEXT INTERVAL ---
+            if percent and percent > last_percent:
+                if first_progress is None:
+                    first_progress = (now, percent)
+                elif percent > first_progress[1]:
+                    rate = (percent - first_progress[1]) / (now - first_progress[0])
+                    remaining = (100 - percent) / rate
+                    interval = remaining / 2
+                last_percent = percent
+            else:
+                interval *= 1.5
+        except Exception:
+            interval *= 1.5
 
-            if current_percent == 0 and last_percent > 50: return res.text
-            if current_percent > last_percent: last_percent = current_percent
-            time.sleep(5)
-        except: time.sleep(5)
+        interval = min(max(interval, POLL_MIN_INTERVAL), POLL_MAX_INTERVAL)
+        time.sleep(max(0, min(interval, give_up_at - time.monotonic())))
     return None
 
+def yeni_satiri_bekle(mgr, draft_name):
+    """
+    Fetches the draft list until the row named draft_name shows up
+    (readiness check instead of a fixed sleep). Returns (page, row) or (page, None).
+    """
+    waited = 0.0
+    delay = COPY_READY_MIN_DELAY
+    while True:
+        page = mgr.draft_page.get(mgr, force=True)
+        row = next((r for r in page.rows if r["Draft Name"] == draft_name), None)
+        if row is not None or waited >= COPY_READY_TIMEOUT:
+            return page, row
+        time.sleep(delay)
+        waited += delay
+        delay *= 2
+
 def drafti_kopyala(mgr, target_date):
     """
     Kopyalama yapar ve YENİ OLUŞAN DRAFT'IN ADINI döndürür.
     """
     mgr.add_log("Kopyalama işlemi başlatılıyor...", "info")
-    
-    # 1. Target'dan draftı bul
-    res = mgr.session.get(DRAFT_PAGE_URL)
-    if "login.jsf" in res.url: login(mgr); res = mgr.session.get(DRAFT_PAGE_URL)
-    
-    df = html_tabloyu_parse_et(mgr, res.text)
-    if df.empty: return None
-
-    ilgili_satir = df[df["Created"] == target_date]
-    if ilgili_satir.empty: 
+    started = time.monotonic()
+    # Counted from this draft's records in the cycle trace (other drafts run in parallel on the session)
+    with trace.sayac(mgr.email) as stats:
+        sonuc = _kopyala(mgr, target_date)
+    if sonuc:
+        mgr.add_log(f"⏱️ Kopyalama: {stats['requests']} istek, {stats['bytes'] // 1024} KB, {time.monotonic() - started:.1f} sn")
+    return sonuc
+
+@adim("copy")
+def _kopyala(mgr, target_date):
+    # 1. Target'dan draftı bul (döngünün listesi, gerekirse bir kez yenilenir)
+    page = mgr.draft_page.get(mgr)
+    ilgili_satir = page.by_date.get(target_date)
+    if ilgili_satir is None and page.cached:
+        page = mgr.draft_page.get(mgr, force=True)
+        ilgili_satir = page.by_date.get(target_date)
+    if ilgili_satir is None: 
         mgr.add_log("Kopyalanacak satır tarihle bulunamadı.", "error")
         return None
     
-    copy_id = ilgili_satir.iloc[0]["Copy ID"]
-    base_loc = str(ilgili_satir.iloc[0]["From"])
+    copy_id = ilgili_satir["Copy ID"]
+    base_loc = str(ilgili_satir["From"])
     if not copy_id: return None
         
     # 2. Copy Butonuna Bas
-    form_data = form_verilerini_topla(res.text)
     copy_payload = {
         "javax.faces.partial.ajax": "true",
         "javax.faces.source": copy_id,
@@ -155,117 +254,118 @@ def drafti_kopyala(mgr, target_date):
         copy_id: copy_id,
         "mainForm": "mainForm"
     }
-    res_confirm = mgr.session.post(DRAFT_PAGE_URL, data={**form_data, **copy_payload})
+    pr_confirm = mgr.jsf.gonder(page.sayfa, copy_payload, with_form=True)
     
     # 3. Confirm (Yes) Butonuna Bas
     confirm_btn_id = None
-    try:
-        match = re.search(r'button id="([^"]+)"[^>]*class="[^"]*ui-confirmdialog-yes', res_confirm.text)
-        if match: confirm_btn_id = match.group(1)
-    except: pass
+    confirm_html = pr_confirm.update("clone_draft_confirm") or pr_confirm.html
+    match = re.search(r'button id="([^"]+)"[^>]*class="[^"]*ui-confirmdialog-yes', confirm_html)
+    if match: confirm_btn_id = match.group(1)
     
     if not confirm_btn_id: return None
-        
-    current_vs = form_data.get("javax.faces.ViewState")
-    try:
-        match_vs = re.search(r'id=".*?javax\.faces\.ViewState.*?"><!\[CDATA\[(.*?)]]>', res_confirm.text)
-        if match_vs: current_vs = match_vs.group(1)
-    except: pass
 
+    # ViewState of the confirm dialog's response (the client keeps the page's current one)
     confirm_payload = {
         "javax.faces.partial.ajax": "true",
         "javax.faces.source": confirm_btn_id,
         "javax.faces.partial.execute": "@all",
         confirm_btn_id: confirm_btn_id,
         "mainForm": "mainForm",
-        "javax.faces.ViewState": current_vs
     }
     
-    res_final = mgr.session.post(DRAFT_PAGE_URL, data=confirm_payload)
+    pr_final = mgr.jsf.gonder(page.sayfa, confirm_payload)
+    # Row indices (and so the action ids) of the cached list are stale from here on
+    mgr.draft_page.invalidate()
+    full_redirect_url = pr_final.redirect_url()
+    if not full_redirect_url: return None
 
     # 4. Redirect ve Yeni İsim Alma
-    if "<redirect" in res_final.text:
-        try:
-            redirect_part = res_final.text.split('url="')[1].split('"')[0].replace("&amp;", "&")
-            full_redirect_url = urllib.parse.urljoin(BASE_URL, redirect_part)
-            
-            # Yeni sayfaya git
-            new_page_res = mgr.session.get(full_redirect_url)    
-            soup_new = BeautifulSoup(new_page_res.text, 'html.parser')
+    try:
+        # Yeni sayfaya git (isim ve adres buradan okunur)
+        new_page_res = mgr.jsf.get(full_redirect_url)
+        soup_new = BeautifulSoup(new_page_res.text, 'html.parser')
 
-            name_input = soup_new.find("input", {"name": lambda x: x and "draft_name" in x})
-            new_draft_name = name_input.get("value") if name_input else "Bilinmeyen Kopya"
+        name_input = soup_new.find("input", {"name": lambda x: x and "draft_name" in x})
+        new_draft_name = name_input.get("value") if name_input else "Bilinmeyen Kopya"
 
-            loc_span = soup_new.find("span", {"id": "mainForm:draftInfo:0:ship_from_address"})
-            new_location = loc_span.get_text(strip=True) if loc_span else ""
+        loc_span = soup_new.find("span", {"id": "mainForm:draftInfo:0:ship_from_address"})
+        new_location = loc_span.get_text(strip=True) if loc_span else ""
 
-            mgr.add_log(f"✅ Kopyalandı: {new_draft_name}")
-            
-            if base_loc.lower() not in new_location.lower():
-                mgr.add_log(f"📍 Adres düzeltiliyor: {new_location} -> {base_loc}", "warning")
-                address_request_handler(mgr, full_redirect_url, target_date, new_page_res)
-            
-            time.sleep(2) # Sistemin oturması için
-            res_check = mgr.session.get(DRAFT_PAGE_URL)
-            soup_list = BeautifulSoup(res_check.text, 'html.parser')
-            df_check = html_tabloyu_parse_et(mgr, res_check.text)
-            yeni_satir = df_check[df_check["Draft Name"] == new_draft_name]
-
-            if not yeni_satir.empty:
-                yeni_tarih = yeni_satir.iloc[0]["Created"]
-                loc = yeni_satir.iloc[0]["From"]
-                new_input_id = yeni_satir.iloc[0]["Name Input ID"]
-                clean_base = re.sub(r'(\s*-\s*copy|\s*copy|\s*-\s*clone)+', '', new_draft_name, flags=re.IGNORECASE).strip()
-                # Eski tarihleri temizle
-                clean_base = re.sub(r'\s\d{2}[/.-]\d{2}\s\d{2}:\d{2}:\d{2}$', '', clean_base)
-                
-                # Yeni Tarih Ekle (Gün/Ay Saat:Dk:Sn)
-                unique_ts = datetime.now().strftime("%d/%m %H:%M:%S")
-                if len(clean_base) > 30: clean_base = clean_base[:30]
-                new_clean_name = f"{clean_base} {unique_ts}"
-                
-                # ViewState'i formdan al
-                vs_input = soup_list.find("input", {"name": "javax.faces.ViewState"})
-                current_vs = vs_input.get("value")
-                
-                # --- RENAME SEQUENCE ÇAĞIR ---
-                if rename_draft_sequence(mgr, new_input_id, new_clean_name, soup_list, current_vs):
-                    final_draft_name = new_clean_name
-                    mgr.add_log(f"✏️ İsim düzeltildi: {new_clean_name}")
-                else:
-                    final_draft_name = new_draft_name
-                
-                # SUCCESS NOTIFICATION
-                # teams_bildirim_gonder(
-                #     mgr=mgr,
-                #     title="Kopyalama Başarılı",
-                #     message="Yeni taslak oluşturuldu ve takip listesine eklendi.",
-                #     status="info",
-                #     facts={
-                #         "Eski Taslak": str(target_date), # Or original name if you pass it
-                #         "Yeni Taslak": new_draft_name,
-                #         "Lokasyon": loc,
-                #         "Tarih": yeni_tarih
-                #     }
-                # )
-                time.sleep(2) # Sistemin oturması için
-                res_final_check = mgr.session.get(DRAFT_PAGE_URL)
-                df_check = html_tabloyu_parse_et(mgr, res_final_check.text)
-                yeni_satir = df_check[df_check["Draft Name"] == final_draft_name]
-
-                if not yeni_satir.empty:
-                    yeni_tarih = yeni_satir.iloc[0]["Created"]
-                    loc = yeni_satir.iloc[0]["From"]
-                return {"name": final_draft_name, "date": yeni_tarih, "loc": loc}
-            else:
-                mgr.add_log("⚠️ Kopyalanan satır listede bulunamadı (Rename atlandı).", "warning")
-            return None
-            
-        except Exception as e: 
-            print(f"Kopya isim hatası: {e}")
+        mgr.add_log(f"✅ Kopyalandı: {new_draft_name}")
+        
+        if base_loc.lower() not in new_location.lower():
+            mgr.add_log(f"📍 Adres düzeltiliyor: {new_location} -> {base_loc}", "warning")
+            yeni_sayfa = mgr.jsf.sayfa(new_page_res.url) or JsfSayfa(new_page_res.url, new_page_res.text)
+            address_request_handler(mgr, target_date, yeni_sayfa)
+
+        # 5. Yeni satır listede görünene kadar bekle (Created tarihi ve input id için)
+        page, yeni_satir = yeni_satiri_bekle(mgr, new_draft_name)
+        if yeni_satir is None:
+            mgr.add_log("⚠️ Kopyalanan satır listede bulunamadı (Rename atlandı).", "warning")
             return None
-            
-    return None
+
+        yeni_tarih = yeni_satir["Created"]
+        loc = yeni_satir["From"]
+        new_input_id = yeni_satir["Name Input ID"]
+        clean_base = re.sub(r'(\s*-\s*copy|\s*copy|\s*-\s*clone)+', '', new_draft_name, flags=re.IGNORECASE).strip()
+        # Eski tarihleri temizle
+        clean_base = re.sub(r'\s\d{2}[/.-]\d{2}\s\d{2}:\d{2}:\d{2}$', '', clean_base)
+        
+        # Yeni Tarih Ekle (Gün/Ay Saat:Dk:Sn)
+        unique_ts = datetime.now().strftime("%d/%m %H:%M:%S")
+        if len(clean_base) > 30: clean_base = clean_base[:30]
+        new_clean_name = f"{clean_base} {unique_ts}"
+        
+        # --- RENAME SEQUENCE ÇAĞIR ---
+        pr_rename = rename_draft_sequence(mgr, new_input_id, new_clean_name, page.sayfa)
+        mgr.draft_page.invalidate()
+        if pr_rename:
+            final_draft_name = new_clean_name
+            mgr.add_log(f"✏️ İsim düzeltildi: {new_clean_name}")
+            # The rename re-renders mainForm:drafts; take the row from there if it is in it
+            renamed = next((r for r in taslak_satirlari(pr_rename.update("mainForm:drafts"))
+                            if r["Name Input ID"] == new_input_id), None)
+            if renamed is not None:
+                yeni_tarih = renamed["Created"]
+                loc = renamed["From"]
+        else:
+            final_draft_name = new_draft_name
+
+        return {"name": final_draft_name, "date": yeni_tarih, "loc": loc}
+        
+    except Exception as e: 
+        print(f"Kopya isim hatası: {e}")
+        return None
+
+@adim("open_draft")
+def drafti_ac(mgr, target_date):
+    """
+    Presses "Open Draft Shipment" for the draft created at target_date.
+
+    The action id and ViewState come from the cycle's cached draft list;
+    if the row is missing or the open fails (e.g. the cached view expired),
+    the list is fetched again once. Returns the redirect URL, TASLAK_YOK if
+    the draft is not in the list, or None.
+    """
+    page = mgr.draft_page.get(mgr)
+    for attempt in range(2):
+        row = page.by_date.get(target_date)
+        if row is not None:
+            action_id = row["Action ID"]
+            action_payload = {
+                "javax.faces.partial.ajax": "true",
+                "javax.faces.source": action_id,
+                "javax.faces.partial.execute": "@all",
+                action_id: action_id,
+                "mainForm": "mainForm"
+            }
+            redirect_url = mgr.jsf.gonder(page.sayfa, action_payload, with_form=True).redirect_url()
+            if redirect_url: return redirect_url
+        if attempt == 0 and page.cached:
+            page = mgr.draft_page.get(mgr, force=True)
+        else:
+            break
+    return TASLAK_YOK if row is None else None
 
 def drafti_planla_backend(mgr, draft_item):
 
@@ -274,45 +374,22 @@ def drafti_planla_backend(mgr, draft_item):
     try:
         # 1. Draft Aç
         mgr.add_log(f"İşlem başladı: {draft_name}", "info")
-        main_res = mgr.session.get(DRAFT_PAGE_URL)
-        if "login.jsf" in main_res.url: login(mgr); main_res = mgr.session.get(DRAFT_PAGE_URL)
-
-        df = html_tabloyu_parse_et(mgr, main_res.text)
-        target_row = df[df["Created"] == target_date]
-
-        if target_row.empty:
+        redirect_url = drafti_ac(mgr, target_date)
+        if redirect_url is TASLAK_YOK:
             mgr.add_log(f"⚠️ {draft_name} listede bulunamadı! (Tarih eşleşmedi)", "warning")
             return None
-        current_action_id = target_row.iloc[0]["Action ID"]
-
-        form_data = form_verilerini_topla(main_res.text)
-        action_payload = {
-            "javax.faces.partial.ajax": "true",
-            "javax.faces.source": current_action_id,
-            "javax.faces.partial.execute": "@all",
-            current_action_id: current_action_id, 
-            "mainForm": "mainForm"
-        }
-        res_open = mgr.session.post(DRAFT_PAGE_URL, data={**form_data, **action_payload})
-        
-        # Redirect Check
-        redirect_url = None
-        if "<redirect" in res_open.text:
-            try:
-                redirect_part = res_open.text.split('url="')[1].split('"')[0].replace("&amp;", "&")
-                redirect_url = urllib.parse.urljoin(BASE_URL, redirect_part)
-            except: pass
-        
         if not redirect_url:
             mgr.add_log(f"{draft_name} açılamadı.", "error")
             return None # Return None = Kopyalama olmadı
 
-        mgr.session.get(redirect_url) # Detay sayfası
-        
-        # 2. Planlama
+        # 2. Planlama (detay sayfası bir kez alınır; ViewState ve form ondan)
         mgr.add_log("🚀 Planlama başlatılıyor...")
-        detay_res = mgr.session.get(redirect_url)
-        detay_form_data = form_verilerini_topla(detay_res.text)
+        with adim("draft_detail"):
+            detay_res = mgr.jsf.get(redirect_url)
+        detay = mgr.jsf.sayfa(detay_res.url)
+        if detay is None:
+            mgr.add_log(f"{draft_name} detay sayfası açılamadı.", "error")
+            return None
         create_plan_params = {
             "javax.faces.partial.ajax": "true",
             "javax.faces.source": "mainForm:create_plan",
@@ -321,23 +398,24 @@ def drafti_planla_backend(mgr, draft_item):
             "mainForm:create_plan": "mainForm:create_plan",
             "mainForm": "mainForm"
         }
-        res_plan = mgr.session.post(PLAN_URL, data={**detay_form_data, **create_plan_params}, headers={"Referer": redirect_url})
+        with adim("create_plan"):
+            pr_plan = mgr.jsf.gonder(detay, create_plan_params, with_form=True, url=PLAN_URL, headers={"Referer": redirect_url})
         
-        if "ui-messages-error" in res_plan.text:
+        if pr_plan.has_ui_errors:
              mgr.add_log("Planlama hatası.", "error")
              return None
 
-        # 3. Polling
-        if "javax.faces.ViewState" in res_plan.text:
-            try:
-                 match = re.search(r'id=".*?javax\.faces\.ViewState.*?"><!\[CDATA\[(.*?)]]>', res_plan.text)
-                 if match: detay_form_data["javax.faces.ViewState"] = match.group(1)
-            except: pass
+        # 3. Polling (the client carries the ViewState of create_plan's response on)
+        # Plans of an earlier run may still be on the page; they are not this run's result.
+        # create_plan re-renders mainForm: once the run has started the panel comes back
+        # without them, so the baseline is empty and any table seen later is this run's
+        onceki_satirlar = plan_satirlari(pr_plan.update("mainForm", None) or detay.html)
 
-        final_xml = final_xml = poll_results_until_complete(
-            mgr.session, 
-            detay_form_data, 
+        final_xml = poll_results_until_complete(
+            mgr.jsf, 
+            detay, 
             redirect_url, 
+            onceki_satirlar=onceki_satirlar,
         )
         
         if final_xml:
@@ -370,7 +448,9 @@ def drafti_planla_backend(mgr, draft_item):
         mgr.add_log(f"Hata ({draft_name}): {str(e)}", "error")
         return None
 
-def address_request_handler(mgr, draft_url, target_date, res_draft):
+@adim("address")
+def address_request_handler(mgr, target_date, sayfa):
+    """Sets the ship-from address of the draft page sayfa (a JsfSayfa) back to the watched draft's."""
 
     # Get location:
     draft_data = mgr.watch_list.get(target_date)
@@ -382,12 +462,8 @@ def address_request_handler(mgr, draft_url, target_date, res_draft):
     location_value = draft_data["loc"]
     print(f"📍 Target Location: {location_value}")
     
-    # Request the draft page:
-
-    # res_draft = manager.session.get(draft_url)
-    form_data = form_verilerini_topla(res_draft.text)
-    current_viewstate = form_data.get("javax.faces.ViewState")
-    draft_soup = BeautifulSoup(res_draft.text, "html.parser")
+    # The draft page was just fetched by the copy; its ViewState is kept by the JSF client
+    draft_soup = BeautifulSoup(sayfa.html, "html.parser")
 
     # find the id of secret button
     # STRICT SEARCH: Find the script tag containing the specific function name
@@ -424,20 +500,14 @@ def address_request_handler(mgr, draft_url, target_date, res_draft):
         "javax.faces.partial.render": "addressDialog:addressForm:addressTable", 
         edit_btn_id: edit_btn_id,
         "mainForm": "mainForm",
-        **form_data 
     }
     data_rk = ""
     select_btn_id = ""
-    xml_data = mgr.session.post(PLAN_URL, data=payload_open)
-    vs = extract_viewstate(xml_data.text)
-    if vs: current_viewstate = vs
-
-    outer_soup = BeautifulSoup(xml_data.text, 'xml')
+    pr_open = mgr.jsf.gonder(sayfa, payload_open, with_form=True, url=PLAN_URL)
 
-    update_tag = outer_soup.find('update', {'id': 'addressDialog:addressForm:addressTable'})
+    inner_html_content = pr_open.update('addressDialog:addressForm:addressTable', None)
 
-    if update_tag:
-        inner_html_content = update_tag.text
+    if inner_html_content is not None:
         inner_soup = BeautifulSoup(inner_html_content, 'html.parser')
 
         # Find select button
@@ -471,14 +541,10 @@ def address_request_handler(mgr, draft_url, target_date, res_draft):
                     "addressDialog:addressForm": "addressDialog:addressForm", 
                     "addressDialog:addressForm:addressTable_radio": "on", 
                     "addressDialog:addressForm:addressTable_selection": data_rk,
-                    "javax.faces.ViewState": current_viewstate,
                     **modal_inputs 
                 }
-                res_select = mgr.session.post(PLAN_URL, data=payload_select)
-                if res_select.status_code == 200:
-                    vs_2 = extract_viewstate(res_select.text)
-                    if vs_2: current_viewstate = vs_2
-
+                pr_select = mgr.jsf.gonder(sayfa, payload_select, url=PLAN_URL)
+                if pr_select.is_partial:
                     modal_form_data = form_verilerini_topla(inner_html_content)
 
                     payload_refresh = {
@@ -488,10 +554,9 @@ def address_request_handler(mgr, draft_url, target_date, res_draft):
                         "javax.faces.partial.render": "mainForm:draftInfo",
                         secret_btn_id: secret_btn_id,
                         "mainForm": "mainForm",
-                        "javax.faces.ViewState": current_viewstate,
                         **modal_form_data
                     }
-                    mgr.session.post(PLAN_URL, data=payload_refresh)
+                    mgr.jsf.gonder(sayfa, payload_refresh, url=PLAN_URL)
 
 
             else:
@@ -502,27 +567,22 @@ def address_request_handler(mgr, draft_url, target_date, res_draft):
     else:
         print("Could not find the update tag with the table ID.")
 
-def rename_draft_sequence(mgr, target_input_id, new_name, soup_page, current_vs):
+@adim("rename")
+def rename_draft_sequence(mgr, target_input_id, new_name, sayfa):
     """
-    Executes the 2-step rename sequence:
+    Executes the 2-step rename sequence on the draft list page sayfa (a JsfSayfa):
     1. Full Table Update (Request 1)
     2. Specific Change Event (Request 2)
+    Returns the PartialResponse of request 1 (it re-renders the table) on success, else None.
     """
     print(f"🔄 Renaming sequence started for: {new_name}")
 
     # --- STEP 1: PREPARE PAYLOAD FOR REQUEST #1 (FULL TABLE) ---
-    form = soup_page.find("form", id="mainForm")
-    if not form: return False
-
     # Scrape ALL inputs to mimic the browser's full table submission
-    payload_req1 = {}
-    for tag in form.find_all(["input", "select", "textarea"]):
-        name = tag.get("name")
-        value = tag.get("value", "")
-        if not name: continue
-        if tag.get("type") in ["checkbox", "radio"] and not tag.has_attr("checked"):
-            continue
-        payload_req1[name] = value
+    payload_req1 = form_alanlari(sayfa.html)
+    if payload_req1 is None: return None
+    # The page's hidden ViewState may be outdated; the JSF client sends the current one
+    payload_req1.pop("javax.faces.ViewState", None)
 
     # Overwrite the specific target input with the NEW name
     payload_req1[target_input_id] = new_name
@@ -535,7 +595,6 @@ def rename_draft_sequence(mgr, target_input_id, new_name, soup_page, current_vs)
         "javax.faces.partial.render": "mainForm:drafts",
         "mainForm:drafts": "mainForm:drafts",
         "mainForm:drafts_encodeFeature": "true",
-        "javax.faces.ViewState": current_vs
     })
 
     headers = {
@@ -548,16 +607,12 @@ def rename_draft_sequence(mgr, target_input_id, new_name, soup_page, current_vs)
 
     try:
         # --- SEND REQUEST #1 ---
-        res1 = mgr.session.post(DRAFT_PAGE_URL, data=payload_req1, headers=headers)
+        # JSF updates the state after every AJAX request; the client carries it on to Request 2
+        pr1 = mgr.jsf.gonder(sayfa, payload_req1, headers=headers)
         
-        if res1.status_code != 200:
-            print(f"❌ Request 1 Failed: {res1.status_code}")
-            return False
-
-        # IMPORTANT: Capture the NEW ViewState from Request 1 to use in Request 2
-        # JSF updates the state after every AJAX request.
-        vs = extract_viewstate(res1.text)
-        next_viewstate = vs if vs else current_vs
+        if not pr1.is_partial:
+            print("❌ Request 1 Failed")
+            return None
         
         # --- STEP 2: PREPARE PAYLOAD FOR REQUEST #2 (CHANGE EVENT) ---
         payload_req2 = {
@@ -569,20 +624,19 @@ def rename_draft_sequence(mgr, target_input_id, new_name, soup_page, current_vs)
             "javax.faces.partial.render": "@none", # Assuming we don't need re-render
             target_input_id: new_name, # The Key must be the Input ID
             "mainForm": "mainForm",
-            "javax.faces.ViewState": next_viewstate # Use the FRESH ViewState
         }
 
         # --- SEND REQUEST #2 ---
-        res2 = mgr.session.post(DRAFT_PAGE_URL, data=payload_req2, headers=headers)
+        pr2 = mgr.jsf.gonder(sayfa, payload_req2, headers=headers)
         
-        if res2.status_code == 200:
+        if pr2.is_partial:
             print(f"✅ Rename Sequence Complete: {new_name}")
-            return True
+            return pr1
         else:
-            print(f"❌ Request 2 Failed: {res2.status_code}")
-            return False
+            print("❌ Request 2 Failed")
+            return None
 
     except Exception as e:
         print(f"❌ Rename Sequence Error: {e}")
-        return False
+        return None
 
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import deque, defaultdict
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+# Threads of the process-wide pool that runs the drafts of all users
+POOL_MAX_WORKERS = 16
+
+
+class AdilHavuz:
+    """
+    Bounded thread pool shared by all users.
+
+    Work is queued per owner and the owners are served round-robin, so a
+    user with many drafts cannot starve the others. Threads are started on
+    demand up to max_workers and then reused; they never exit.
+    """
+
+    def __init__(self, max_workers=POOL_MAX_WORKERS, name="bot-worker"):
+        self.max_workers = max_workers
+        self.name = name
+        self._queues = {}       # owner -> deque of (future, fn, args)
+        self._order = deque()   # owners with queued work, in serving order
+        self._cond = threading.Condition()
+        self._threads = []
+        self._idle = 0
+
+    def submit(self, owner, fn, *args):
+        future = Future()
+        with self._cond:
+            queue = self._queues.get(owner)
+            if queue is None:
+                queue = self._queues[owner] = deque()
+                self._order.append(owner)
+            queue.append((future, fn, args))
+            if self._idle == 0 and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            else:
+                self._cond.notify()
+        return future
+
+    def _next(self):
+        # Caller holds self._cond
+        owner = self._order.popleft()
+        queue = self._queues[owner]
+        job = queue.popleft()
+        if queue:
+            self._order.append(owner)
+        else:
+            del self._queues[owner]
+        return job
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._order:
+                    self._idle += 1
+                    self._cond.wait()
+                    self._idle -= 1
+                future, fn, args = self._next()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def stats(self):
+        with self._cond:
+            return {"threads": len(self._threads), "idle": self._idle,
+                    "queued": sum(len(q) for q in self._queues.values()), "owners": len(self._queues)}
+
+
+_ortak_havuz = None
+_ortak_havuz_lock = threading.Lock()
+
+def ortak_havuz():
+    """The process-wide AdilHavuz (created on first use)."""
+    global _ortak_havuz
+    with _ortak_havuz_lock:
+        if _ortak_havuz is None:
+            _ortak_havuz = AdilHavuz()
+        return _ortak_havuz
+
+
+def paralel_calistir(items, key, worker, on_result, max_workers=4, max_per_key=1, owner=None, havuz=None, gecikme=None):
+    """
+    Runs worker(item) for every item on the shared pool (see AdilHavuz).
+
+    - At most `max_workers` items of this call are in flight and at most
+      `max_per_key` items share the same key(item) (e.g. the same account).
+      The pool itself is shared with other owners and served fairly.
+    - Items are only submitted when their key has a free slot, so no pool
+      thread is ever blocked waiting for another item of the same key.
+    - on_result(item, result, error) is called in the caller's thread, in
+      completion order; error is the exception raised by worker, if any.
+    - gecikme(key), if given, is how many seconds after the call the items
+      of that key may start. They are held back until then (the caller's
+      thread waits, not a pool thread).
+    """
+    max_workers = max(1, int(max_workers))
+    max_per_key = max(1, int(max_per_key))
+
+    # Per-key FIFO queues, served round-robin so one key cannot starve the others
+    queues = defaultdict(deque)
+    for item in items:
+        queues[key(item)].append(item)
+    order = deque(queues.keys())
+    running_per_key = defaultdict(int)
+
+    pool = havuz or ortak_havuz()
+    in_flight = {}
+    started = time.monotonic()
+    ready_at = {k: started + gecikme(k) for k in queues} if gecikme else {}
+
+    def submit_ready():
+        now = time.monotonic()
+        skipped = 0
+        while order and len(in_flight) < max_workers and skipped < len(order):
+            k = order[0]
+            order.rotate(-1)
+            if running_per_key[k] >= max_per_key or ready_at.get(k, 0) > now:
+                skipped += 1
+                continue
+            item = queues[k].popleft()
+            if not queues[k]:
+                order.remove(k)
+            running_per_key[k] += 1
+            in_flight[pool.submit(owner, worker, item)] = (k, item)
+            skipped = 0
+
+    def next_start():
+        # Seconds until the next held-back key may start, None if none is waiting
+        now = time.monotonic()
+        waiting = [ready_at[k] for k in order if ready_at.get(k, 0) > now]
+        return max(0.0, min(waiting) - now) if waiting else None
+
+    submit_ready()
+    while in_flight or order:
+        timeout = next_start()
+        if not in_flight:
+            # Only held-back keys are left
+            time.sleep(timeout or 0)
+            done = ()
+        else:
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        for fut in done:
+            k, item = in_flight.pop(fut)
+            running_per_key[k] -= 1
+            error = fut.exception()
+            on_result(item, None if error else fut.result(), error)
+        submit_ready()
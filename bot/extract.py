@@ -0,0 +1,115 @@
+from lxml import html as lxml_html
+from lxml import etree
+
+# Fast lxml-based extraction for the large tables (draft list, shipment plans).
+# Returns the same values as the previous BeautifulSoup/html.parser walks.
+
+
+def _parse(html_content):
+    if not html_content or not html_content.strip():
+        return None
+    try:
+        return lxml_html.fromstring(html_content)
+    except (etree.ParserError, ValueError):
+        return None
+
+def _text(el):
+    """Equivalent of BeautifulSoup's get_text(strip=True)."""
+    return "".join(t.strip() for t in el.xpath(".//text()"))
+
+def _classes(el):
+    return (el.get("class") or "").split()
+
+def taslak_satirlari(html_content):
+    """
+    Extracts the draft list rows of draft.jsf.
+
+    Returns a list of dicts with the keys:
+    Draft Name, From, SKUs, Units, Created, Action ID, Copy ID, Name Input ID
+    """
+    doc = _parse(html_content)
+    if doc is None: return []
+
+    veri_listesi = []
+    for row in doc.iter("tr"):
+        if row.get("role") != "row": continue
+        cells = list(row.iter("td"))
+        if len(cells) < 11: continue
+
+        name_input = next(cells[2].iter("input"), None)
+        if name_input is None or name_input.get("value") is None or name_input.get("id") is None:
+            continue
+
+        open_link = next((a for a in row.iter("a") if a.get("title") == "Open Draft Shipment"), None)
+        if open_link is None: open_link = next(cells[1].iter("a"), None)
+        row_action_id = open_link.get("id") if open_link is not None else None
+
+        # Copy butonu bulma
+        copy_link = None
+        for a in row.iter("a"):
+            title = (a.get("title") or "").lower()
+            if "duplicate" in title or "copy" in title:
+                copy_link = a
+                break
+        if copy_link is None:
+            for span in row.iter("span"):
+                span_class = span.get("class") or ""
+                if "copy" in span_class or "clone" in span_class:
+                    copy_link = next(span.iterancestors("a"), None)
+                    break
+        copy_action_id = copy_link.get("id") if copy_link is not None else None
+
+        veri_listesi.append({
+            "Draft Name": name_input.get("value"),
+            "From": _text(cells[3]),
+            "SKUs": _text(cells[8]),
+            "Units": _text(cells[9]),
+            "Created": _text(cells[10]),
+            "Action ID": row_action_id,
+            "Copy ID": copy_action_id,
+            "Name Input ID": name_input.get("id"),
+        })
+    return veri_listesi
+
+def plan_satirlari(html_content):
+    """
+    Extracts the rows of the shipment plans table (first tbody whose id contains "plans").
+
+    Returns a list of (plan option, destination text, distance text) tuples,
+    one per data row with more than 3 cells. Row group headers only set the option.
+    """
+    doc = _parse(html_content)
+    if doc is None: return []
+
+    plans_table = next((t for t in doc.iter("tbody") if "plans" in (t.get("id") or "")), None)
+    if plans_table is None: return []
+
+    satirlar = []
+    current_option = "Bilinmiyor"
+    for row in plans_table.iter("tr"):
+        if "ui-rowgroup-header" in _classes(row):
+            current_option = _text(row)
+            continue
+        cells = list(row.iter("td"))
+        if len(cells) > 3:
+            satirlar.append((current_option, _text(cells[2]), _text(cells[3])))
+    return satirlar
+
+def form_alanlari(html_content, form_id="mainForm"):
+    """
+    All named input/select/textarea fields of a form with their value attribute,
+    unchecked checkboxes/radios left out (what a full table submit sends).
+    """
+    doc = _parse(html_content)
+    if doc is None: return None
+    form = next((f for f in doc.iter("form") if f.get("id") == form_id), None)
+    if form is None: return None
+
+    fields = {}
+    for tag in form.iter("input", "select", "textarea"):
+        name = tag.get("name")
+        if not name: continue
+        if tag.get("type") in ["checkbox", "radio"] and tag.get("checked") is None:
+            continue
+        fields[name] = tag.get("value", "")
+    return fields
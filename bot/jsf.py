@@ -1,14 +1,89 @@
 from bs4 import BeautifulSoup
-import re
+from collections import OrderedDict
+from lxml import etree
+import threading
+import time
+import urllib.parse
+
+from bot.constants import BASE_URL, JSF_VIEWSTATE, DRAFT_PAGE_MAX_AGE
+
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=True)
+
+
+class PartialResponse:
+    """
+    A JSF <partial-response> parsed once.
+
+    - updates:   {update_id: html} for every <update> except the ViewState
+    - viewstate: the new javax.faces.ViewState, if the response carried one
+    - redirect:  the <redirect url="..."> target (relative, as sent)
+    - errors:    error messages from <error> elements
+    Non-XML bodies (e.g. a full page after a login redirect) give an empty
+    object with is_partial = False; `text` always holds the raw body.
+    """
+
+    def __init__(self, content):
+        if isinstance(content, bytes):
+            raw = content
+            self.text = content.decode("utf-8", errors="replace")
+        else:
+            raw = content.encode("utf-8")
+            self.text = content
+        self.updates = {}
+        self.viewstate = None
+        self.redirect = None
+        self.errors = []
+        self.is_partial = False
+        self._html = None
+        if b"<partial-response" in raw[:512]:
+            self._parse(raw)
+
+    @classmethod
+    def from_response(cls, res):
+        return cls(res.content)
+
+    def _parse(self, raw):
+        try:
+            root = etree.fromstring(raw, _XML_PARSER)
+        except etree.XMLSyntaxError:
+            return
+        self.is_partial = True
+        for el in root.iter("update", "redirect", "error"):
+            if el.tag == "update":
+                update_id = el.get("id", "")
+                if JSF_VIEWSTATE in update_id:
+                    self.viewstate = el.text or ""
+                else:
+                    self.updates[update_id] = el.text or ""
+            elif el.tag == "redirect":
+                self.redirect = el.get("url")
+            else:
+                message = el.findtext("error-message") or el.findtext("error-name") or ""
+                self.errors.append(message.strip())
+
+    def update(self, update_id, default=""):
+        return self.updates.get(update_id, default)
+
+    @property
+    def html(self):
+        """All updates joined, for callers that need to search the whole response."""
+        if self._html is None:
+            self._html = "".join(self.updates.values())
+        return self._html
+
+    @property
+    def has_ui_errors(self):
+        body = self.html if self.is_partial else self.text
+        return bool(self.errors) or "ui-messages-error" in body
+
+    def redirect_url(self, base=BASE_URL):
+        if not self.redirect: return None
+        return urllib.parse.urljoin(base, self.redirect)
 
 
 def extract_viewstate(html, fallback=None):
     if "javax.faces.ViewState" in html:
-        match = re.search(
-            r'id=".*?javax\.faces\.ViewState.*?"><!\[CDATA\[(.*?)]]>',
-            html
-        )
-        return match.group(1) if match else fallback
+        return PartialResponse(html).viewstate or fallback
     else: return fallback
 
 def form_verilerini_topla(html_content):
@@ -42,3 +117,129 @@ def jsf_ajax_payload(source, execute="@all", render=None, viewstate=None):
     if viewstate:
         payload["javax.faces.ViewState"] = viewstate
     return payload
+
+
+class JsfSayfa:
+    """
+    One JSF view as the client last saw it: the full page (html, form fields)
+    plus the current ViewState and the latest partial updates by id, both
+    kept up to date from every AJAX response of the view.
+    """
+
+    def __init__(self, url, html):
+        self.url = url
+        self.html = html
+        self.fetched_at = time.monotonic()
+        self.updates = {}
+        self._viewstate = None
+        self._form_data = None
+
+    @property
+    def form_data(self):
+        if self._form_data is None:
+            self._form_data = form_verilerini_topla(self.html)
+        return self._form_data
+
+    @property
+    def viewstate(self):
+        return self._viewstate or self.form_data.get(JSF_VIEWSTATE, "")
+
+    @property
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+    def guncelle(self, pr):
+        if pr.viewstate: self._viewstate = pr.viewstate
+        self.updates.update(pr.updates)
+
+
+class JsfClient:
+    """
+    Carries JSF view state across requests of one session.
+
+    Full pages are remembered per URL (the last MAX_PAGES), so a follow-up
+    AJAX call reuses the page's ViewState and form fields instead of
+    downloading the page again. Call temizle() when the session is reset.
+    """
+
+    MAX_PAGES = 8
+
+    def __init__(self, session):
+        self.session = session
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def kaydet(self, res):
+        """Remembers a full-page response under its final URL (not the login page)."""
+        if "login.jsf" in res.url:
+            self.temizle()
+            return None
+        sayfa = JsfSayfa(res.url, res.text)
+        with self._lock:
+            self._pages[res.url] = sayfa
+            self._pages.move_to_end(res.url)
+            while len(self._pages) > self.MAX_PAGES:
+                self._pages.popitem(last=False)
+        return sayfa
+
+    def get(self, url, **kwargs):
+        res = self.session.get(url, **kwargs)
+        self.kaydet(res)
+        return res
+
+    def sayfa(self, url, max_age=DRAFT_PAGE_MAX_AGE):
+        """The remembered page of url, or None if there is none or it is older than max_age."""
+        with self._lock:
+            sayfa = self._pages.get(url)
+        if sayfa is None or sayfa.age > max_age:
+            return None
+        return sayfa
+
+    def sayfa_al(self, url, max_age=DRAFT_PAGE_MAX_AGE, **kwargs):
+        """The remembered page of url, fetched first if needed; None on a login redirect."""
+        sayfa = self.sayfa(url, max_age)
+        if sayfa is None:
+            res = self.get(url, **kwargs)
+            sayfa = self.sayfa(res.url)
+        return sayfa
+
+    def gonder(self, sayfa, payload, with_form=False, url=None, **kwargs):
+        """
+        POSTs payload to the view of sayfa (to url if given, else the page's
+        URL) with the view's current ViewState, plus all its form fields if
+        with_form; a ViewState in payload itself wins. The page is updated
+        from the response. Returns the PartialResponse.
+        """
+        data = {**sayfa.form_data, **payload} if with_form else dict(payload)
+        if JSF_VIEWSTATE not in payload:
+            # form_data still holds the page's original ViewState; responses may have replaced it
+            data[JSF_VIEWSTATE] = sayfa.viewstate
+        pr = PartialResponse.from_response(self.session.post(url or sayfa.url, data=data, **kwargs))
+        if pr.is_partial:
+            sayfa.guncelle(pr)
+        return pr
+
+    def ajax(self, url, payload, with_form=False, **kwargs):
+        """
+        gonder() to the remembered page of url, fetching it first if needed.
+        If the server no longer knows the view, the page is fetched once more
+        and the request repeated. Returns None if no page could be loaded.
+        """
+        for attempt in range(2):
+            sayfa = self.sayfa_al(url)
+            if sayfa is None:
+                return None
+            pr = self.gonder(sayfa, payload, with_form, **kwargs)
+            expired = not pr.is_partial or any("ViewExpired" in e for e in pr.errors)
+            if not expired:
+                return pr
+            self.unut(url)
+        return pr
+
+    def unut(self, url):
+        with self._lock:
+            self._pages.pop(url, None)
+
+    def temizle(self):
+        with self._lock:
+            self._pages.clear()
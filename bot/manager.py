@@ -1,12 +1,28 @@
 from collections import deque
-from datetime import datetime
-import requests
-from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import datetime, timedelta
+import hmac
+import threading
+import time
 import pandas as pd
+import pyarrow as pa
 
-from bot.constants import USER_AGENT
-from bot.scheduler import gorev
-from bot.database import init_db, add_task, remove_task, get_all_tasks, add_log_db, get_logs_db
+from bot.scheduler import (
+    sirala, DonguSirasi, paylasilan_zamanlayici, kullanici_ofseti, kaydirilmis_cron,
+    PREWARM_LEAD, TASK_TICK_SECONDS, CYCLE_JITTER_SECONDS, KAPSAM_DUZENLI, KAPSAM_VADELI, KAPSAM_HEPSI, ISITMA,
+)
+from bot.sessions import new_session, SessionPool
+from bot.jsf import JsfClient
+from bot.drafts import TaslakSayfasiCache, veriyi_dataframe_yap
+from bot.auth import login, giris_formu_gonder, fetch_accounts_backend, switch_account_backend, HesapDizini
+from bot import session_store
+from bot.database import init_db, add_task, remove_task, sync_tasks, mark_tasks_checked, TASK_COLUMNS, get_all_tasks, task_record, add_log_db, get_logs_db, get_logs_page, get_trace_cycles, get_trace_summary
+from bot import trace
+
+# Live log lines kept in memory per user (older ones are in the database)
+LOG_FEED_SIZE = 50
+
+# Reload the task cache after this long anyway, to pick up changes made by other processes
+TASKS_CACHE_TTL = 60
 
 class GlobalManager:
     def __init__(self, email, password, teams_webhook_url=None):
@@ -18,104 +34,364 @@ class GlobalManager:
         # 2. User-Specific Data
         # Structure: { "01.30.2026 14:00": { 'name':..., 'loc':... } }
         init_db()
-        self.logs = deque(maxlen=50)
+        # (seq, line) oldest first; seq grows by one per line, see logs_since
+        self.log_feed = deque(maxlen=LOG_FEED_SIZE)
+        self.log_seq = 0
+        self._log_lock = threading.Lock()
+        # Per-thread account/draft the current log lines belong to (set by the scheduler)
+        self.log_context = threading.local()
+
+        # Write-through cache of this user's tasks (see watch_list)
+        self._tasks = None
+        self._tasks_loaded_at = 0.0
+        self._tasks_lock = threading.Lock()
+        self.tasks_version = 0
+
         self.history = deque(maxlen=50)
+        self.history_version = 0
+        self._history_lock = threading.Lock()
+
+        # (version, pyarrow.Table) of the last snapshot, see tasks_snapshot/history_snapshot
+        self._tasks_snapshot = (None, None)
+        self._history_snapshot = (None, None)
         self.mile_threshold = 300
 
         # Scheduling settings
         self.mins_threshold = 30
         self.scheduler_mode = "interval"
+        # Seconds after the cron marks this user's cycles run (see kullanici_ofseti)
+        self.schedule_offset = 0
         self.is_running = False 
+
+        # Drafts of a cycle in flight at once (one per account, see paralel_calistir in _dongu)
+        self.max_parallel_drafts = 4
         
         # 3. Isolated Session
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": USER_AGENT,
-        })
+        self.session = new_session(email)
+        # ViewState/form state of the pages this session has open (bot.jsf)
+        self.jsf = JsfClient(self.session)
         self.available_accounts = [] 
+        # Store accounts of this login, shared with the pooled sessions
+        self.hesap_dizini = HesapDizini()
         self.current_account_name = "Bilinmiyor"
         self.current_account_id = None
 
-        # 4. User-Specific Scheduler
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
+        # One pinned session per store account, used by the scheduler
+        self.session_pool = SessionPool(self)
+        # Draft list of self.session, shared by the drafts of a cycle
+        self.draft_page = TaslakSayfasiCache()
+
+        # 4. Jobs of this user on the process-wide scheduler
+        self.scheduler = paylasilan_zamanlayici()
+        self.job_id = f"user_task:{email}"
+        self.cycle_lock = threading.Lock()
+        # The jobs above only queue here; the cycles run on the queue's own thread
+        self.dongu_sirasi = DonguSirasi(self)
 
     def add_log(self, message, type="info"):
         timestamp = datetime.now().strftime("%H:%M:%S")
         icon_map = {"success": "✅", "error": "❌", "warning": "⚠️", "info": "ℹ️"}
         icon = icon_map.get(type, "ℹ️")
-        add_log_db(f"{timestamp} {icon} {message}", type)
-        self.logs.appendleft(f"{timestamp} {icon} {message}")
+        # RAM first so the UI sees it at once; the database write is buffered
+        with self._log_lock:
+            self.log_seq += 1
+            self.log_feed.append((self.log_seq, f"{timestamp} {icon} {message}"))
+        add_log_db(
+            f"{icon} {message}", type,
+            owner_email=self.email,
+            account=getattr(self.log_context, "account", None),
+            draft_key=getattr(self.log_context, "draft_key", None),
+        )
+
+    @property
+    def logs(self):
+        """Live log lines, newest first."""
+        return [line for _, line in reversed(self.log_feed)]
+
+    def logs_since(self, after_seq=0):
+        """
+        Live log lines added after after_seq, oldest first:
+        {"seq": last seq, "lines": [...], "reset": bool}.
+        reset is True when the caller's cursor is no longer usable (lines were
+        dropped from the feed or the process restarted); lines then holds the
+        whole feed and the caller should replace what it shows.
+        """
+        with self._log_lock:
+            seq, feed = self.log_seq, list(self.log_feed)
+        first = feed[0][0] if feed else seq + 1
+        reset = after_seq > seq or after_seq < first - 1
+        lines = [line for s, line in feed if reset or s > after_seq]
+        return {"seq": seq, "lines": lines, "reset": reset}
+
+    def get_log_page(self, before_id=None, limit=50):
+        """One page of this user's stored logs, newest first (see get_logs_page)."""
+        return get_logs_page(self.email, before_id=before_id, limit=limit)
+
+    def get_trace_cycles(self, limit=20):
+        """Stored HTTP traces of this user's recent cycles (see bot.trace)."""
+        return get_trace_cycles(self.email, limit=limit)
+
+    def get_trace_summary(self, cycle_id=None, group_by="step"):
+        """
+        Per-step (or per-account/draft_key) totals of a stored cycle trace.
+        Without cycle_id, the per-step totals of the last cycle still in memory.
+        """
+        if cycle_id is not None:
+            return get_trace_summary(self.email, cycle_id, group_by=group_by)
+        recent = trace.son_donguler(self.email)
+        if not recent: return []
+        return [{"grp": step, **totals} for step, totals in recent[0].ozet().items()]
+
+    def set_mile_threshold(self, value):
+        self.mile_threshold = int(value)
+
+    # --- ACCOUNT / DRAFT ACTIONS (used by the UI, locally or through bot.worker) ---
+    def giris_yap(self):
+        """Restores the saved session if it is still valid, otherwise logs in."""
+        if session_store.geri_yukle(self):
+            return True
+        if not login(self):
+            return False
+        session_store.kaydet(self)
+        return True
+
+    def sifre_dogrula(self, password):
+        """
+        True if password may take over this running manager: the one in use,
+        or one 2DWorkflow accepts for this e-mail (checked by posting the login
+        form on a throwaway session, so this manager's session is not touched).
+        """
+        if hmac.compare_digest(password.encode(), (self.password or "").encode()):
+            return True
+        deneme = new_session(self.email)
+        try:
+            return giris_formu_gonder(deneme, self.email, password) is not None
+        except Exception as e:
+            print(f"Şifre doğrulama hatası: {e}")
+            return False
+        finally:
+            deneme.close()
+
+    def hesaplari_getir(self, yenile=False):
+        """
+        Fills available_accounts. Served from the account directory while it
+        is fresh; yenile=True reads the account menu again.
+        """
+        if not yenile and self.available_accounts and self.hesap_dizini.hesaplar():
+            return True
+        if yenile:
+            self.hesap_dizini.gecersiz_kil()
+        if not self.session.cookies:
+            login(self)
+        ok = fetch_accounts_backend(self)
+        if ok: session_store.kaydet(self)
+        return ok
+
+    def hesap_degistir(self, account_id):
+        ok = switch_account_backend(self, account_id)
+        if ok: session_store.kaydet(self)
+        return ok
+
+    def taslaklari_getir(self):
+        """(DataFrame of the current account's drafts, error message) — see veriyi_dataframe_yap."""
+        return veriyi_dataframe_yap(self)
+
+    def durum(self):
+        """JSON-friendly snapshot of the settings and state the UI shows."""
+        next_run = self.next_run_time()
+        return {
+            "email": self.email,
+            "is_running": self.is_running,
+            "scheduler_mode": self.scheduler_mode,
+            "mins_threshold": self.mins_threshold,
+            "mile_threshold": self.mile_threshold,
+            "max_parallel_drafts": self.max_parallel_drafts,
+            "current_account_name": self.current_account_name,
+            "current_account_id": self.current_account_id,
+            "available_accounts": self.available_accounts,
+            "next_run_time": next_run.isoformat() if next_run else None,
+            "schedule_offset": self.schedule_offset,
+            "tasks_version": self.tasks_version,
+            "history_version": self.history_version,
+        }
 
     def start_bot_process(self):
         """Starts or Reschedules the job based on the selected mode"""
         
         # 1. Determine Trigger Type
+        # Cron modes are shifted by a stable per-user offset so users do not all hit the site at :00
+        self.schedule_offset = 0
         if self.scheduler_mode == "half_hourly":
-            # Run at :00 and :30
-            trigger_args = {'trigger': 'cron', 'minute': '0,30'}
+            # Run at :00 and :30 (+ offset)
+            self.schedule_offset = kullanici_ofseti(self.email, 30)
+            trigger_args = {'trigger': 'cron', **kaydirilmis_cron([0, 30], self.schedule_offset)}
             log_msg = "Mod: Saat Başı ve Buçuk (xx:00, xx:30)"
             
         elif self.scheduler_mode == "quarterly":
-            # Run at :00, :15, :30, :45
-            trigger_args = {'trigger': 'cron', 'minute': '0,15,30,45'}
+            # Run at :00, :15, :30, :45 (+ offset)
+            self.schedule_offset = kullanici_ofseti(self.email, 15)
+            trigger_args = {'trigger': 'cron', **kaydirilmis_cron([0, 15, 30, 45], self.schedule_offset)}
             log_msg = "Mod: Çeyrek Saatler (xx:00, xx:15...)"
             
         else:
             # Default: Interval
             trigger_args = {'trigger': 'interval', 'minutes': self.mins_threshold}
             log_msg = f"Mod: Her {self.mins_threshold} dakikada bir"
+        if CYCLE_JITTER_SECONDS:
+            trigger_args['jitter'] = CYCLE_JITTER_SECONDS
 
         # 2. Add or Reschedule
-        if not self.scheduler.get_job('user_task'):
+        if not self.scheduler.get_job(self.job_id):
             self.scheduler.add_job(
-                gorev, 
-                id='user_task', 
-                args=[self], 
+                sirala, 
+                id=self.job_id, 
+                args=[self, KAPSAM_DUZENLI], 
                 max_instances=1,
                 **trigger_args
             )
         else:
-            self.scheduler.reschedule_job('user_task', **trigger_args)
+            self.scheduler.reschedule_job(self.job_id, **trigger_args)
+
+        # Tasks with their own interval are picked up by a short tick in between
+        self.scheduler.add_job(
+            sirala, 'interval', seconds=TASK_TICK_SECONDS, args=[self, KAPSAM_VADELI],
+            id=f"{self.job_id}:tick", replace_existing=True,
+        )
             
         # Optional: Log the change internally if needed (mostly for debugging)
         print(f"Scheduler updated: {log_msg}")
+        self.isinmayi_planla()
 
     def stop_bot_process(self):
-        if self.scheduler.get_job('user_task'):
-            self.scheduler.remove_job('user_task')
+        for job_id in (self.job_id, f"{self.job_id}:tick", f"{self.job_id}:warm"):
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+
+    def isinmayi_planla(self):
+        """Schedules the session pre-warm PREWARM_LEAD seconds before the next cycle."""
+        next_run = self.next_run_time()
+        if next_run is None: return
+        warm_at = next_run - timedelta(seconds=PREWARM_LEAD)
+        if warm_at <= datetime.now(next_run.tzinfo): return
+        self.scheduler.add_job(
+            sirala, 'date', run_date=warm_at, args=[self, ISITMA],
+            id=f"{self.job_id}:warm", replace_existing=True,
+        )
+
+    def run_now(self):
+        """Queues one cycle over all tasks right away (after the cycle of this user that is running, if any)."""
+        self.dongu_sirasi.ekle(KAPSAM_HEPSI)
+
+    def next_run_time(self):
+        """Next scheduled cycle of this user, or None if the bot is not scheduled."""
+        job = self.scheduler.get_job(self.job_id)
+        return job.next_run_time if job else None
             
     def update_watch_list_from_df(self, df_records):
-        current_db_tasks = self.watch_list 
-        incoming_keys = set()
-
+        """
+        Syncs the watch list with the edited table: only new, changed and
+        removed rows are written, in one transaction.
+        """
+        current = self.watch_list
+        incoming = {}
         for item in df_records:
-            key = item['date']
-            incoming_keys.add(key)
-            final_item = item.copy()
-            if key in current_db_tasks:
-                existing = current_db_tasks[key]
+            # Empty cells come back as NaN from the editor; the database holds NULL
+            final_item = {k: None if isinstance(v, float) and v != v else v for k, v in item.items()}
+            key = final_item['date']
+            if key in current:
+                existing = current[key]
                 final_item['found_warehouses'] = existing.get('found_warehouses', [])
                 final_item['account_id'] = existing.get('account_id')
                 final_item['account_name'] = existing.get('account_name')
+                final_item['last_checked'] = existing.get('last_checked')
+                # Columns the table did not include keep their stored values
+                for field in ('interval_min', 'priority'):
+                    final_item.setdefault(field, existing.get(field))
             else:
                 if 'found_warehouses' not in final_item:
                     final_item['found_warehouses'] = []
-            self.save_task(final_item)
-        
-        for old_key in list(current_db_tasks.keys()):
-            if old_key not in incoming_keys:
-                self.delete_task(old_key)
+            incoming[key] = task_record(self.email, final_item)
+
+        inserts, updates = [], []
+        for key, record in incoming.items():
+            if key not in current:
+                inserts.append(record)
+                continue
+            changed = {f: record[f] for f in TASK_COLUMNS if record[f] != current[key].get(f)}
+            if changed:
+                updates.append((key, changed))
+        deletes = [key for key in current if key not in incoming]
+        if not (inserts or updates or deletes):
+            return
+
+        sync_tasks(self.email, inserts, updates, deletes)
+        with self._tasks_lock:
+            if self._tasks is current:
+                tasks = dict(current)
+                for record in inserts: tasks[record['date']] = record
+                for key, _ in updates: tasks[key] = incoming[key]
+                for key in deletes: del tasks[key]
+                self._tasks = tasks
+            else:
+                # Changed meanwhile (e.g. by a cycle): reload on next read
+                self._tasks = None
+            self.tasks_version += 1
 
     @property
     def watch_list(self):
-        return get_all_tasks(self.email)
+        """
+        Cached {date_key: task} dict, kept in sync by save_task/delete_task.
+        Treat it as read-only: writes replace the whole dict (copy-on-write),
+        so a reader never sees it change while iterating.
+        """
+        tasks = self._tasks
+        if tasks is None or time.monotonic() - self._tasks_loaded_at > TASKS_CACHE_TTL:
+            with self._tasks_lock:
+                if self._tasks is tasks:
+                    fresh = get_all_tasks(self.email)
+                    if fresh != tasks:
+                        self._tasks = fresh
+                        self.tasks_version += 1
+                    self._tasks_loaded_at = time.monotonic()
+                tasks = self._tasks
+        return tasks
+
+    def invalidate_watch_list(self):
+        """Drops the cache, e.g. after the tasks table was changed outside this manager."""
+        with self._tasks_lock:
+            self._tasks = None
+            self.tasks_version += 1
 
     def save_task(self, task_data):
         add_task(self.email, task_data)
+        record = task_record(self.email, task_data)
+        with self._tasks_lock:
+            if self._tasks is not None:
+                self._tasks = {**self._tasks, record['date']: record}
+                self.tasks_version += 1
+
+    def gorevleri_isaretle(self, keys):
+        """Records that these tasks were checked now (their next deadline starts from here)."""
+        if not keys: return
+        checked_at = datetime.now().isoformat(timespec="seconds")
+        mark_tasks_checked(self.email, keys, checked_at)
+        with self._tasks_lock:
+            if self._tasks is not None:
+                tasks = dict(self._tasks)
+                for key in keys:
+                    if key in tasks:
+                        tasks[key] = {**tasks[key], 'last_checked': checked_at}
+                self._tasks = tasks
+                self.tasks_version += 1
 
     def delete_task(self, key):
         remove_task(self.email, key)
+        with self._tasks_lock:
+            if self._tasks is not None and key in self._tasks:
+                tasks = dict(self._tasks)
+                del tasks[key]
+                self._tasks = tasks
+                self.tasks_version += 1
 
     def get_watch_list_df(self):
         """
@@ -125,7 +401,40 @@ class GlobalManager:
         if not data:
             return pd.DataFrame()
         return pd.DataFrame(list(data.values()))
-    
+
+    def tasks_snapshot(self):
+        """
+        The watch list as an immutable pyarrow Table, rebuilt only when
+        tasks_version changes; every rerun and browser tab shares the object.
+        """
+        self.watch_list  # reloads the cache if it expired
+        with self._tasks_lock:
+            tasks, version = self._tasks or {}, self.tasks_version
+        cached_version, table = self._tasks_snapshot
+        if cached_version != version:
+            table = pa.Table.from_pylist(list(tasks.values()))
+            self._tasks_snapshot = (version, table)
+        return table
+
+    def history_entries(self):
+        """(history_version, copy of the history entries newest first), read together."""
+        with self._history_lock:
+            return self.history_version, list(self.history)
+
+    def history_snapshot(self):
+        """The history as an immutable pyarrow Table, rebuilt only when history_version changes."""
+        cached_version, table = self._history_snapshot
+        if cached_version != self.history_version:
+            version, entries = self.history_entries()
+            table = pa.Table.from_pylist(entries)
+            self._history_snapshot = (version, table)
+        return table
+
+    def clear_history(self):
+        with self._history_lock:
+            self.history.clear()
+            self.history_version += 1
+
     def add_history_entry(self, draft_name, found_data, account_name):
         """
         Records a success. Handles list of dicts: [{'AVP1': 150}, {'MEM1': 200}]
@@ -144,4 +453,6 @@ class GlobalManager:
             "found": ", ".join(formatted_list),
             "time": timestamp
         }
-        self.history.appendleft(entry)
\ No newline at end of file
+        with self._history_lock:
+            self.history.appendleft(entry)
+            self.history_version += 1
\ No newline at end of file
@@ -1,13 +1,23 @@
 import requests
+import threading
+import queue
+import time
+import atexit
+from contextlib import contextmanager
 
+# Dispatcher settings
+QUEUE_MAX = 200         # notifications beyond this are dropped (and counted in the next digest)
+DIGEST_MAX_ITEMS = 15   # cards merged into one digest; the rest is summarized as a count
+MAX_RETRIES = 4
+RETRY_BASE_DELAY = 2    # seconds, doubled on every retry
+POST_TIMEOUT = 10
 
-def teams_bildirim_gonder(mgr, title, message, facts=None, status="info"):
+
+def kart_govdesi(title, message, facts=None, status="info"):
     """
-    Sends a high-contrast Adaptive Card with dividers between items.
+    Builds the body of a high-contrast Adaptive Card with dividers between items.
     """
     # 1. Color and Icon Logic
-    if not mgr.teams_webhook_url:
-        return False
     status_map = {
         "success": ("good", "✅"), 
         "error": ("attention", "❌"), 
@@ -103,8 +113,11 @@ def teams_bildirim_gonder(mgr, title, message, facts=None, status="info"):
             "items": [list_container]
         })
 
-    # 4. Final Payload
-    payload = {
+    return card_body
+
+def kart_paketi(card_body):
+    """Wraps a card body into the webhook message payload."""
+    return {
         "type": "message",
         "attachments": [
             {
@@ -121,10 +134,156 @@ def teams_bildirim_gonder(mgr, title, message, facts=None, status="info"):
         ]
     }
 
-    try:
-        response = mgr.session.post(mgr.teams_webhook_url, json=payload, timeout=10)
-        if response.status_code not in [200, 202]:
-            print(f"❌ Teams Hatası: {response.status_code}")
-    except Exception as e:
-        print(f"❌ Teams Bağlantı Hatası: {e}")
+def ozet_govdesi(items, dropped=0):
+    """Merges several notifications into one digest card body."""
+    shown = items[:DIGEST_MAX_ITEMS]
+    hidden = len(items) - len(shown) + dropped
+    card_body = kart_govdesi(
+        title=f"{len(items) + dropped} Bildirim",
+        message="Son kontrol döngüsünde oluşan bildirimler:",
+        status="success" if any(i["status"] == "success" for i in items) else "info"
+    )
+    for item in shown:
+        section = kart_govdesi(item["title"], item["message"], item.get("facts"), item["status"])
+        section[0]["separator"] = True
+        card_body.extend(section)
+    if hidden:
+        card_body.append({
+            "type": "TextBlock",
+            "text": f"... ve {hidden} bildirim daha (yoğunluk nedeniyle özetlendi).",
+            "wrap": True,
+            "isSubtle": True
+        })
+    return card_body
+
+
+class TeamsDispatcher:
+    """
+    Sends Teams notifications from a background thread with its own HTTP session.
+
+    - Notifications of an owner are held while a cycle runs (see bildirim_ozeti)
+      and sent as one digest card when it ends.
+    - Whatever piles up while a post is in flight is merged into a digest too.
+    - 429 and 5xx responses are retried with exponential backoff (Retry-After honored).
+    """
+
+    def __init__(self, webhook_url):
+        self.webhook_url = webhook_url
+        self.session = requests.Session()
+        self.queue = queue.Queue(maxsize=QUEUE_MAX)
+        self.dropped = 0
+        self.held = {}  # owner -> notifications held for a digest
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="teams-dispatcher", daemon=True)
+        self.thread.start()
+
+    def gonder(self, item, owner=None):
+        with self.lock:
+            if owner in self.held:
+                self.held[owner].append(item)
+                return
+        self._enqueue([item])
+
+    def tut(self, owner):
+        with self.lock:
+            self.held.setdefault(owner, [])
+
+    def birak(self, owner):
+        with self.lock:
+            items = self.held.pop(owner, [])
+        if items: self._enqueue(items)
+
+    def _enqueue(self, items):
+        try:
+            self.queue.put_nowait(items)
+        except queue.Full:
+            with self.lock:
+                self.dropped += len(items)
+            print(f"⚠️ Teams kuyruğu dolu, {len(items)} bildirim atlandı.")
 
+    def _run(self):
+        while True:
+            items = list(self.queue.get())
+            # Backlog: merge everything else that is waiting into the same card
+            while True:
+                try:
+                    items.extend(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self.lock:
+                dropped, self.dropped = self.dropped, 0
+
+            if len(items) == 1 and not dropped:
+                item = items[0]
+                card_body = kart_govdesi(item["title"], item["message"], item.get("facts"), item["status"])
+            else:
+                card_body = ozet_govdesi(items, dropped)
+            self._post(kart_paketi(card_body))
+
+    def _post(self, payload):
+        for attempt in range(MAX_RETRIES + 1):
+            delay = RETRY_BASE_DELAY * (2 ** attempt)
+            try:
+                response = self.session.post(self.webhook_url, json=payload, timeout=POST_TIMEOUT)
+                if response.status_code in [200, 202]:
+                    return True
+                if response.status_code != 429 and response.status_code < 500:
+                    print(f"❌ Teams Hatası: {response.status_code}")
+                    return False
+                print(f"⚠️ Teams {response.status_code}, tekrar denenecek ({attempt + 1}/{MAX_RETRIES})")
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            except Exception as e:
+                print(f"❌ Teams Bağlantı Hatası: {e}")
+            if attempt < MAX_RETRIES:
+                time.sleep(delay)
+        return False
+
+    def bekle(self, timeout=5):
+        """Waits (up to timeout) until the queue is empty."""
+        end = time.monotonic() + timeout
+        while not self.queue.empty() and time.monotonic() < end:
+            time.sleep(0.1)
+
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+def get_dispatcher(webhook_url):
+    """One dispatcher per webhook URL, shared by all managers of the process."""
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(webhook_url)
+        if dispatcher is None:
+            dispatcher = TeamsDispatcher(webhook_url)
+            _dispatchers[webhook_url] = dispatcher
+        return dispatcher
+
+def _shutdown():
+    for dispatcher in list(_dispatchers.values()):
+        dispatcher.bekle()
+
+atexit.register(_shutdown)
+
+def teams_bildirim_gonder(mgr, title, message, facts=None, status="info"):
+    """
+    Queues a Teams card; returns at once, the dispatcher thread sends it.
+    """
+    if not mgr.teams_webhook_url:
+        return False
+    item = {"title": title, "message": message, "facts": facts, "status": status}
+    get_dispatcher(mgr.teams_webhook_url).gonder(item, owner=mgr.email)
+    return True
+
+@contextmanager
+def bildirim_ozeti(mgr):
+    """Holds mgr's notifications for the duration of the block and sends them as one digest."""
+    if not mgr.teams_webhook_url:
+        yield
+        return
+    dispatcher = get_dispatcher(mgr.teams_webhook_url)
+    dispatcher.tut(mgr.email)
+    try:
+        yield
+    finally:
+        dispatcher.birak(mgr.email)
@@ -0,0 +1,185 @@
+import time
+from datetime import datetime
+from urllib.parse import quote
+import pandas as pd
+import pyarrow as pa
+import requests
+
+# The UI reads many attributes per rerun; one /state call serves them for this long
+STATE_TTL = 1.0
+REQUEST_TIMEOUT = 120
+
+
+class RemoteManager:
+    """
+    Stand-in for GlobalManager inside the Streamlit app when the bot runs in
+    a separate worker process (bot.worker). Exposes the attributes and
+    methods app.py uses and forwards them to the worker's local API.
+    """
+
+    def __init__(self, worker_url, email, token=""):
+        self.worker_url = worker_url.rstrip("/")
+        self.email = email
+        self._http = requests.Session()
+        if token:
+            self._http.headers["X-Worker-Token"] = token
+        self._state = None
+        self._state_at = 0.0
+        self._tasks = {}
+        self._tasks_version = None
+        self._history = []
+        self._history_version = None
+        self._tasks_snapshot = (None, None)
+        self._history_snapshot = (None, None)
+
+    @classmethod
+    def connect(cls, worker_url, email, password, teams_webhook_url=None, token=""):
+        """Logs the user in on the worker; returns (RemoteManager or None, reused existing session?)."""
+        mgr = cls(worker_url, email, token)
+        data = mgr._call("POST", "/login", json={
+            "email": email, "password": password, "teams_webhook_url": teams_webhook_url,
+        }, user=False)
+        return (mgr if data["ok"] else None), data["existing"]
+
+    # --- HTTP ---
+    def _call(self, method, path, user=True, **kwargs):
+        url = f"{self.worker_url}/users/{quote(self.email, safe='')}{path}" if user else f"{self.worker_url}{path}"
+        res = self._http.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+        res.raise_for_status()
+        return res.json()
+
+    def _set_state(self, state):
+        self._state = state
+        self._state_at = time.monotonic()
+        return state
+
+    @property
+    def state(self):
+        if self._state is None or time.monotonic() - self._state_at > STATE_TTL:
+            self._set_state(self._call("GET", "/state"))
+        return self._state
+
+    def _settings(self, **changes):
+        self._set_state(self._call("POST", "/settings", json=changes))
+
+    # --- STATE (read) ---
+    is_running = property(lambda self: self.state["is_running"])
+    current_account_name = property(lambda self: self.state["current_account_name"])
+    current_account_id = property(lambda self: self.state["current_account_id"])
+    available_accounts = property(lambda self: self.state["available_accounts"])
+    schedule_offset = property(lambda self: self.state["schedule_offset"])
+
+    # --- SETTINGS (read/write) ---
+    scheduler_mode = property(lambda self: self.state["scheduler_mode"],
+                              lambda self, v: self._settings(scheduler_mode=v))
+    mins_threshold = property(lambda self: self.state["mins_threshold"],
+                              lambda self, v: self._settings(mins_threshold=int(v)))
+    mile_threshold = property(lambda self: self.state["mile_threshold"])
+    max_parallel_drafts = property(lambda self: self.state["max_parallel_drafts"],
+                                   lambda self, v: self._settings(max_parallel_drafts=int(v)) if v != self.max_parallel_drafts else None)
+
+    def set_mile_threshold(self, value):
+        self._settings(mile_threshold=int(value))
+
+    # --- BOT CONTROL ---
+    def start_bot_process(self):
+        self._set_state(self._call("POST", "/start"))
+
+    def stop_bot_process(self):
+        self._set_state(self._call("POST", "/stop"))
+
+    def run_now(self):
+        self._call("POST", "/run-now")
+
+    def next_run_time(self):
+        value = self.state["next_run_time"]
+        return datetime.fromisoformat(value) if value else None
+
+    @is_running.setter
+    def is_running(self, value):
+        # Starting/stopping is done by start_bot_process/stop_bot_process on the worker
+        self._state = None
+
+    # --- LOGS / HISTORY ---
+    def add_log(self, message, type="info"):
+        self._call("POST", "/logs", json={"message": message, "type": type})
+        self._state = None
+
+    @property
+    def logs(self):
+        return list(reversed(self.logs_since(0)["lines"]))
+
+    def logs_since(self, after_seq=0):
+        return self._call("GET", "/logs/feed", params={"after": after_seq})
+
+    def get_log_page(self, before_id=None, limit=50):
+        params = {"limit": limit}
+        if before_id is not None: params["before_id"] = before_id
+        return self._call("GET", "/logs", params=params)
+
+    def get_trace_summary(self, cycle_id=None, group_by="step"):
+        params = {"group_by": group_by}
+        if cycle_id is not None: params["cycle_id"] = cycle_id
+        return self._call("GET", "/trace", params=params)
+
+    @property
+    def history(self):
+        if self._history_version != self.state["history_version"]:
+            data = self._call("GET", "/history")
+            self._history, self._history_version = data["history"], data["version"]
+        return self._history
+
+    def history_snapshot(self):
+        history = self.history
+        if self._history_snapshot[0] != self._history_version:
+            self._history_snapshot = (self._history_version, pa.Table.from_pylist(history))
+        return self._history_snapshot[1]
+
+    def clear_history(self):
+        self._call("POST", "/history/clear")
+        self._state = None
+
+    # --- WATCH LIST ---
+    @property
+    def watch_list(self):
+        if self._tasks_version is None or self._tasks_version != self.state["tasks_version"]:
+            data = self._call("GET", "/tasks")
+            self._tasks, self._tasks_version = data["tasks"], data["version"]
+        return self._tasks
+
+    def get_watch_list_df(self):
+        data = self.watch_list
+        if not data:
+            return pd.DataFrame()
+        return pd.DataFrame(list(data.values()))
+
+    def tasks_snapshot(self):
+        tasks = self.watch_list
+        if self._tasks_snapshot[0] != self._tasks_version:
+            self._tasks_snapshot = (self._tasks_version, pa.Table.from_pylist(list(tasks.values())))
+        return self._tasks_snapshot[1]
+
+    def save_task(self, task_data):
+        self._call("POST", "/tasks", json=task_data)
+        self._state = None
+
+    def update_watch_list_from_df(self, df_records):
+        self._call("PUT", "/tasks", json=df_records)
+        self._state = None
+
+    # --- ACCOUNT / DRAFT ACTIONS ---
+    def hesaplari_getir(self, yenile=False):
+        ok = self._call("POST", "/accounts/fetch", params={"refresh": "true" if yenile else "false"})["ok"]
+        self._state = None
+        return ok
+
+    def hesap_degistir(self, account_id):
+        ok = self._call("POST", "/accounts/switch", json={"account_id": account_id})["ok"]
+        self._state = None
+        return ok
+
+    def taslaklari_getir(self):
+        data = self._call("GET", "/drafts")
+        if not data["columns"]:
+            return None, data["error"]
+        return pd.DataFrame(data["records"], columns=data["columns"]), data["error"]
@@ -1,98 +1,399 @@
+import hashlib
+import threading
 import time
+from datetime import datetime, timedelta
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor as JobExecutor
 
-from bot.auth import switch_account_backend
 from bot.drafts import drafti_planla_backend
+from bot.engine import paralel_calistir
+from bot.notify import bildirim_ozeti
+from bot import trace, session_store
 
-def safe_run(manager):
+# Marker result for drafts whose account session could not be prepared
+HESAP_YOK = object()
+
+# Drafts of one account run one at a time: they share the account's session,
+# its JSF view state and draft list, which a copy/rename changes under the others
+MAX_PARALLEL_PER_ACCOUNT = 1
+
+# Threads of the shared scheduler. Its jobs only queue work on the user's
+# DonguSirasi and return, so this does not limit how many users' cycles run
+# at once; the drafts of all cycles share the fair worker pool in bot.engine
+SCHEDULER_THREADS = 4
+
+# Sessions are probed/renewed this many seconds before each scheduled cycle
+PREWARM_LEAD = 60
+
+# How often tasks with their own interval are checked for being due
+TASK_TICK_SECONDS = 60
+
+# Load spreading: every user gets a stable offset of up to STAGGER_MAX_SECONDS
+# (at most half the window) on top of the :00/:15/:30/:45 marks, plus up to
+# CYCLE_JITTER_SECONDS of random jitter per run (0 disables it). Within a
+# cycle, each account's first draft starts up to ACCOUNT_STAGGER_SECONDS late.
+STAGGER_MAX_SECONDS = 300
+CYCLE_JITTER_SECONDS = 30
+ACCOUNT_STAGGER_SECONDS = 8
+
+# Which tasks a cycle runs (see gorev_secimi)
+KAPSAM_DUZENLI = "regular"  # the user's regular schedule
+KAPSAM_VADELI = "due"       # the per-task tick
+KAPSAM_HEPSI = "all"        # "run now"
+ISITMA = "warm"             # the session pre-warm (not a cycle, see oturumlari_isit)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def paylasilan_zamanlayici():
+    """The process-wide scheduler every user's jobs run on (started on first use)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BackgroundScheduler(
+                executors={"default": JobExecutor(SCHEDULER_THREADS)},
+                # A late job is still queued (never dropped); missed runs collapse into one
+                job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": None},
+            )
+            _scheduler.start()
+        return _scheduler
+
+def sirala(mgr, is_=KAPSAM_DUZENLI):
+    """Scheduler job: hands a cycle (or the pre-warm) to the user's DonguSirasi and returns."""
+    mgr.dongu_sirasi.ekle(is_)
+
+def safe_run(manager, kapsam=KAPSAM_DUZENLI):
     try:
-        gorev(manager)
+        if kapsam == ISITMA:
+            oturumlari_isit(manager)
+        else:
+            gorev(manager, kapsam)
     except Exception as e:
         manager.add_log(f"🔥 Scheduler crash: {e}", "error")
 
-def gorev(mgr):
+class DonguSirasi:
+    """
+    Runs the cycles of one user one after another, on a thread of its own
+    that lives while there is work queued.
+
+    The regular cycle and "run now" wait their turn (one of each is kept
+    queued); the tick and the pre-warm are dropped while the user is busy,
+    the next tick picks their tasks up.
+    """
+
+    def __init__(self, mgr):
+        self.mgr = mgr
+        self._bekleyen = []
+        self._calisiyor = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ekle(self, is_):
+        """Queues a cycle scope or ISITMA; False if it was dropped or is already queued."""
+        with self._lock:
+            if is_ in (KAPSAM_VADELI, ISITMA) and (self._calisiyor or self._bekleyen):
+                return False
+            if is_ in self._bekleyen:
+                return False
+            self._bekleyen.append(is_)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._calis, name=f"dongu:{self.mgr.email}", daemon=True
+                )
+                self._thread.start()
+            return True
+
+    def _calis(self):
+        while True:
+            with self._lock:
+                if not self._bekleyen:
+                    self._thread = None
+                    return
+                is_ = self._bekleyen.pop(0)
+                self._calisiyor = True
+            try:
+                safe_run(self.mgr, is_)
+            finally:
+                with self._lock:
+                    self._calisiyor = False
+
+def hesap_oturumu_al(mgr, account_id, account_name):
+    """
+    Returns the object the drafts of this account should run on:
+    a pooled session already on the account, or the manager itself
+    for legacy tasks without an account id. None if the account is unreachable.
+    """
+    if not account_id:
+        return mgr
+    return mgr.session_pool.get(account_id, account_name)
+
+def sabit_ofset(anahtar, pencere):
+    """A stable offset in [0, pencere) seconds for anahtar (same after every restart)."""
+    h = int.from_bytes(hashlib.sha256(anahtar.encode()).digest()[:8], "big")
+    return h % max(1, int(pencere))
+
+def kullanici_ofseti(email, pencere_dk):
+    """Seconds this user's cycles run after the marks of a pencere_dk-minute window."""
+    return sabit_ofset(email, min(STAGGER_MAX_SECONDS, pencere_dk * 60 // 2))
+
+def kaydirilmis_cron(dakikalar, ofset):
+    """Cron fields firing `ofset` seconds after each of the given minutes of the hour."""
+    return {
+        'minute': ",".join(str(m + ofset // 60) for m in dakikalar),
+        'second': str(ofset % 60),
+    }
+
+def gorev_secimi(tasks, kapsam=KAPSAM_DUZENLI, now=None):
+    """
+    The tasks a cycle should run, earliest deadline first (higher priority
+    first on equal deadlines).
+
+    A task with its own interval_min is due when that many minutes have
+    passed since last_checked; the regular cycle runs it only then, and the
+    tick runs nothing else. Tasks without one run on every regular cycle,
+    the longest unchecked first.
+    """
+    now = now or datetime.now()
+    secilen = []
+    for task in tasks:
+        last = datetime.fromisoformat(task['last_checked']) if task.get('last_checked') else datetime.min
+        interval = task.get('interval_min')
+        if interval:
+            deadline = last + timedelta(minutes=interval) if last != datetime.min else datetime.min
+            if deadline > now and kapsam != KAPSAM_HEPSI: continue
+        else:
+            if kapsam == KAPSAM_VADELI: continue
+            deadline = last
+        secilen.append((deadline, -(task.get('priority') or 0), task))
+    secilen.sort(key=lambda x: (x[0], x[1]))
+    return [task for _, _, task in secilen]
+
+def gorev(mgr, kapsam=KAPSAM_DUZENLI):
+    # The periodic job, the per-task tick and a manual "run now" must not overlap for one user.
+    # DonguSirasi already runs them one at a time; the lock also covers direct callers (bench).
+    # The tick skips a busy minute (the next one picks its tasks up); the regular
+    # cycle and "run now" wait their turn, otherwise every task without its own
+    # interval would miss a whole window.
+    if kapsam == KAPSAM_VADELI:
+        if not mgr.cycle_lock.acquire(blocking=False): return
+    else:
+        mgr.cycle_lock.acquire()
+    try:
+        _dongu(mgr, kapsam)
+    finally:
+        mgr.cycle_lock.release()
+    # The next regular cycle has its run time now; warm its sessions before it
+    if kapsam == KAPSAM_DUZENLI and mgr.is_running:
+        mgr.isinmayi_planla()
+
+def oturumlari_isit(mgr):
+    """
+    Pre-warm job: renews expired sessions of the watched accounts shortly
+    before a cycle, so it does not find out through a failed draft request.
+
+    It runs on the user's DonguSirasi, where the cycle waits for it, so it
+    stops once the cycle is due; accounts it did not reach are logged in by
+    the cycle as usual.
+    """
     if not mgr.is_running: return
-    if not mgr.watch_list: return
+    next_run = mgr.next_run_time()
+    bitis = time.monotonic() + (
+        (next_run - datetime.now(next_run.tzinfo)).total_seconds() if next_run else PREWARM_LEAD
+    )
+    if not mgr.cycle_lock.acquire(blocking=False): return
+    try:
+        accounts = {t['account_id']: t.get('account_name', 'Bilinmiyor')
+                    for t in mgr.watch_list.values() if t.get('account_id')}
+        mgr.session_pool.isit(accounts, bitis=bitis)
+    except Exception as e:
+        print(f"{mgr.email}: oturum ısıtma hatası: {e}")
+    finally:
+        mgr.cycle_lock.release()
 
-    mgr.add_log(f"⏰ Periyodik kontrol başladı. ({len(mgr.watch_list)} adet)", "info")
-    
-    tasks = list(mgr.watch_list.values())
-    sorted_tasks = sorted(tasks, key=lambda x: x.get('account_id', ''))
+def _dongu(mgr, kapsam=KAPSAM_DUZENLI):
+    if not mgr.is_running: return
+    watch_list = mgr.watch_list
+    if not watch_list: return
+
+    # Deadline order; the pool serves accounts round-robin, each in this order
+    sorted_tasks = gorev_secimi(watch_list.values(), kapsam)
+    if not sorted_tasks: return
+    account_key = lambda x: x.get('account_id') or ''
+
+    mgr.add_log(f"⏰ Periyodik kontrol başladı. ({len(sorted_tasks)}/{len(watch_list)} adet)", "info")
     
+    # Draft lists are fetched once per account per cycle
+    mgr.draft_page.invalidate()
+    mgr.session_pool.yeni_dongu()
+
     keys_to_remove = []
+    checked_keys = []
+    failed_accounts = set()
 
-    for item in sorted_tasks:
-        d_key = item['date'] 
-        d_name = item['name']
-        d_account = item['account_name']
-        
-        # --- CONTEXT SWITCHING ---
-        target_acc_id = item.get('account_id')
-        target_acc_name = item.get('account_name', 'Bilinmiyor')
-        
-        if target_acc_id and target_acc_id != mgr.current_account_id:
-            if switch_account_backend(mgr, target_acc_id):
-                mgr.current_account_id = target_acc_id
-                mgr.current_account_name = target_acc_name
-                time.sleep(2)
-            else:
-                continue
+    # Accounts do not all start at the same second (stable per account); their
+    # drafts are held back from the pool until then, see paralel_calistir
+    stagger = ACCOUNT_STAGGER_SECONDS > 0 and len({account_key(t) for t in sorted_tasks}) > 1
+    hesap_gecikmesi = (lambda k: sabit_ofset(f"{mgr.email}:{k}", ACCOUNT_STAGGER_SECONDS)) if stagger else None
 
-        # --- EXECUTE (Just pass the item!) ---
-        sonuc = drafti_planla_backend(mgr, item)
-        
-        # --- UPDATE LOGIC ---
-        if isinstance(sonuc, dict) and 'STOP' in sonuc:
-            keys_to_remove.append(d_key)
-            new_found_list = sonuc.pop("STOP")
-            mgr.add_history_entry(d_name, new_found_list, d_account)
-            
-        elif isinstance(sonuc, dict):
-            new_key = sonuc['date']
-            
-            # 1. Update Memory
-            
-            new_found_list = sonuc.pop('newly_found_warehouse', [])
-            known_wh = item.get('found_warehouses', []).copy()
+    # Accounts that failed in an earlier cycle are not logged in again before
+    # their wait is over (SessionPool.bekleme); their drafts stay due meanwhile
+    bekleyen = {}
+    for t in sorted_tasks:
+        account_id = t.get('account_id')
+        if account_id and account_id not in bekleyen:
+            bekleyen[account_id] = mgr.session_pool.bekleme(account_id)
+    bekleyen = {k: v for k, v in bekleyen.items() if v > 0}
 
-            added_new_unique = False
-            
-            # Loop through the list of dicts (e.g. [{'AVP1': 100}, {'MEM1': 200}])
-            if new_found_list:
-                for data_item in new_found_list:
-                    # Extract Key (Warehouse Name)
-                    if isinstance(data_item, dict):
-                        wh_name = next(iter(data_item)) 
-                    else:
-                        wh_name = str(data_item)
-                        
-                    # Check duplication
-                    if wh_name not in known_wh:
-                        known_wh.append(wh_name)
-                        added_new_unique = True
-            
-            # 2. Update HISTORY (Display - Full dicts)
-            # Only add to history table if we found something new
-            if added_new_unique:
-                mgr.add_history_entry(d_name, new_found_list, d_account)
-
-            # 2. Transfer Metadata
-            sonuc['found_warehouses'] = known_wh
-            sonuc['account_id'] = target_acc_id
-            sonuc['account_name'] = target_acc_name
-            sonuc['max_mile'] = item.get('max_mile')
-            sonuc['targets'] = item.get('targets')
-
-            # 3. Save to Dict
-            if new_key != d_key:
-                keys_to_remove.append(d_key)
-                mgr.save_task(sonuc)
+    def taslak_isle(item):
+        account_id = item.get('account_id')
+        if account_id in failed_accounts or account_id in bekleyen: return HESAP_YOK
+
+        # Log lines and traced requests of this thread belong to this account/draft
+        mgr.log_context.account = item.get('account_name')
+        mgr.log_context.draft_key = item['date']
+        try:
+            with trace.baglam(item.get('account_name'), item['date']):
+                # --- ACCOUNT SESSION (no switching, each account has its own) ---
+                ctx = hesap_oturumu_al(mgr, account_id, item.get('account_name', 'Bilinmiyor'))
+                if ctx is None:
+                    failed_accounts.add(account_id)
+                    return HESAP_YOK
+
+                # --- EXECUTE (Just pass the item!) ---
+                return drafti_planla_backend(ctx, item)
+        finally:
+            mgr.log_context.account = None
+            mgr.log_context.draft_key = None
+
+    skipped = {}
+    ertelenen = {}
+
+    def sonuc_geldi(item, sonuc, error):
+        if sonuc is not HESAP_YOK:
+            checked_keys.append(item['date'])
+        if error:
+            mgr.add_log(f"Hata ({item['name']}): {error}", "error")
+        elif sonuc is HESAP_YOK:
+            name = item.get('account_name', 'Bilinmiyor')
+            if item.get('account_id') in bekleyen:
+                count, kalan = ertelenen.get(name, (0, bekleyen[item['account_id']]))
+                ertelenen[name] = (count + 1, kalan)
             else:
-                mgr.save_task(sonuc)
+                skipped[name] = skipped.get(name, 0) + 1
+        else:
+            sonucu_isle(mgr, item, sonuc, keys_to_remove)
+
+    # Requests of this cycle are traced per step (bot.trace)
+    trace.dongu_baslat(mgr.email)
+    try:
+        # Cards of this cycle go out as one Teams digest when it ends
+        with bildirim_ozeti(mgr):
+            paralel_calistir(
+                sorted_tasks,
+                key=account_key,
+                worker=taslak_isle,
+                on_result=sonuc_geldi,
+                max_workers=mgr.max_parallel_drafts,
+                max_per_key=MAX_PARALLEL_PER_ACCOUNT,
+                owner=mgr.email,
+                gecikme=hesap_gecikmesi,
+            )
+    finally:
+        dongu_izi = trace.dongu_bitir(mgr.email)
+    http_ozeti_logla(mgr, dongu_izi)
+
+    for name, count in skipped.items():
+        mgr.add_log(f"❌ {name} hesabına geçilemedi, {count} taslak atlandı.", "error")
+    for name, (count, kalan) in ertelenen.items():
+        mgr.add_log(
+            f"⏸️ {name} hesabına giriş başarısız olmuştu, "
+            f"{count} taslak ~{int(kalan // 60) + 1} dk sonra tekrar denenecek.", "warning"
+        )
+
+    # Deadlines of the checked tasks move on from now
+    mgr.gorevleri_isaretle(checked_keys)
 
     # Cleanup
+    watch_list = mgr.watch_list
     for k in keys_to_remove:
-        if k in mgr.watch_list:
+        if k in watch_list:
             mgr.delete_task(k)
             
     if keys_to_remove:
-        print("Global manager listesi güncellendi.")
\ No newline at end of file
+        print("Global manager listesi güncellendi.")
+
+    # Cookies renewed during the cycle survive a restart
+    mgr.session_pool.kaydet()
+    session_store.kaydet(mgr)
+
+def http_ozeti_logla(mgr, dongu_izi):
+    """One log line with the request count, volume and slowest step of the cycle."""
+    if dongu_izi is None or not dongu_izi.records: return
+    ozet = dongu_izi.ozet()
+    toplam_istek = sum(s["requests"] for s in ozet.values())
+    toplam_kb = sum(s["bytes"] for s in ozet.values()) // 1024
+    en_yavas, s = next(iter(ozet.items()))
+    mgr.add_log(
+        f"📊 HTTP: {toplam_istek} istek, {toplam_kb} KB, "
+        f"en uzun adım: {en_yavas} ({s['requests']} istek, {s['total_ms'] / 1000:.1f} sn)"
+    )
+
+def sonucu_isle(mgr, item, sonuc, keys_to_remove):
+    """Applies the result of one draft run to the watch list and history."""
+    d_key = item['date'] 
+    d_name = item['name']
+    d_account = item['account_name']
+    target_acc_id = item.get('account_id')
+    target_acc_name = item.get('account_name', 'Bilinmiyor')
+
+    # --- UPDATE LOGIC ---
+    if isinstance(sonuc, dict) and 'STOP' in sonuc:
+        keys_to_remove.append(d_key)
+        new_found_list = sonuc.pop("STOP")
+        mgr.add_history_entry(d_name, new_found_list, d_account)
+        
+    elif isinstance(sonuc, dict):
+        new_key = sonuc['date']
+        
+        # 1. Update Memory
+        
+        new_found_list = sonuc.pop('newly_found_warehouse', [])
+        known_wh = item.get('found_warehouses', []).copy()
+
+        added_new_unique = False
+        
+        # Loop through the list of dicts (e.g. [{'AVP1': 100}, {'MEM1': 200}])
+        if new_found_list:
+            for data_item in new_found_list:
+                # Extract Key (Warehouse Name)
+                if isinstance(data_item, dict):
+                    wh_name = next(iter(data_item)) 
+                else:
+                    wh_name = str(data_item)
+                    
+                # Check duplication
+                if wh_name not in known_wh:
+                    known_wh.append(wh_name)
+                    added_new_unique = True
+        
+        # 2. Update HISTORY (Display - Full dicts)
+        # Only add to history table if we found something new
+        if added_new_unique:
+            mgr.add_history_entry(d_name, new_found_list, d_account)
+
+        # 2. Transfer Metadata
+        sonuc['found_warehouses'] = known_wh
+        sonuc['account_id'] = target_acc_id
+        sonuc['account_name'] = target_acc_name
+        sonuc['max_mile'] = item.get('max_mile')
+        sonuc['targets'] = item.get('targets')
+        sonuc['interval_min'] = item.get('interval_min')
+        sonuc['priority'] = item.get('priority')
+        sonuc['last_checked'] = datetime.now().isoformat(timespec="seconds")
+
+        # 3. Save to Dict
+        if new_key != d_key:
+            keys_to_remove.append(d_key)
+            mgr.save_task(sonuc)
+        else:
+            mgr.save_task(sonuc)
@@ -0,0 +1,135 @@
+"""
+Encrypted on-disk copy of each session's cookies and last known account list.
+
+A restarted process (or a new GlobalManager) restores the session instead of
+logging in again, after one probe request confirms it is still valid.
+The data is encrypted with a key derived from the user's 2DWorkflow password
+(PBKDF2-HMAC-SHA256), so it is only readable once the user logs in; after a
+password change it simply fails to decrypt and a normal login follows.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from bot.auth import aktif_hesap_ve_menu, aktif_isaretle
+from bot.constants import DRAFT_PAGE_URL
+from bot.database import save_session_blob, load_session_blob, delete_session_blob
+from bot.trace import adim
+
+KDF_ITERATIONS = 200_000
+
+# email -> (salt, password verifier, Fernet); deriving the key is deliberately
+# slow. The password itself is not kept, only a salted hash to match it against
+_anahtarlar = {}
+_anahtar_lock = threading.Lock()
+
+
+def _slot(ctx):
+    # '' for the manager's own session, the account id for pooled sessions
+    return getattr(ctx, "pinned_account_id", None) or ""
+
+def _dogrulayici(password, salt):
+    return hashlib.sha256(b"verify:" + salt + password.encode()).digest()
+
+def _fernet(email, password, salt=None):
+    with _anahtar_lock:
+        cached = _anahtarlar.get(email)
+    if cached and (salt is None or cached[0] == salt) \
+            and hmac.compare_digest(cached[1], _dogrulayici(password, cached[0])):
+        return cached[0], cached[2]
+    salt = salt or os.urandom(16)
+    key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, KDF_ITERATIONS)
+    fernet = Fernet(base64.urlsafe_b64encode(key))
+    with _anahtar_lock:
+        _anahtarlar[email] = (salt, _dogrulayici(password, salt), fernet)
+    return salt, fernet
+
+
+def kaydet(ctx):
+    """Saves the cookies and account state of ctx's session (written in the background)."""
+    if not ctx.session.cookies or not ctx.password:
+        return
+    cookies = [
+        {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+         "expires": c.expires, "secure": c.secure}
+        for c in ctx.session.cookies
+    ]
+    data = {
+        "cookies": cookies,
+        "accounts": ctx.available_accounts,
+        "accounts_fetched_at": ctx.hesap_dizini.fetched_at,
+        "current_account_id": ctx.current_account_id,
+        "current_account_name": ctx.current_account_name,
+    }
+    salt, fernet = _fernet(ctx.email, ctx.password)
+    save_session_blob(ctx.email, _slot(ctx), salt, fernet.encrypt(json.dumps(data).encode()))
+
+def unut(ctx):
+    delete_session_blob(ctx.email, _slot(ctx))
+
+
+@adim("probe")
+def oturum_gecerli_mi(ctx):
+    """
+    One GET of the draft page: False if it redirects to the login page.
+    Otherwise also refreshes the active account of ctx from the page header.
+    """
+    try:
+        # Through the JSF client, so the next AJAX call on the page needs no GET
+        res = ctx.jsf.get(DRAFT_PAGE_URL)
+    except Exception as e:
+        print(f"Oturum kontrol hatası: {e}")
+        return False
+    if "login.jsf" in res.url:
+        return False
+    active_name, _ = aktif_hesap_ve_menu(res.text)
+    if active_name:
+        ctx.current_account_name = active_name
+        match = next((a for a in ctx.available_accounts if a["name"].strip() == active_name.strip()), None)
+        ctx.current_account_id = match["id"] if match else None
+        if match: ctx.available_accounts = aktif_isaretle(ctx.available_accounts, active_id=match["id"])
+    return True
+
+def geri_yukle(ctx):
+    """
+    Restores ctx's saved session and probes it.
+    True if ctx now has a valid session; False leaves ctx logged out.
+    """
+    saved = load_session_blob(ctx.email, _slot(ctx))
+    if saved is None or not ctx.password:
+        return False
+    salt, payload = saved
+    try:
+        _, fernet = _fernet(ctx.email, ctx.password, salt)
+        data = json.loads(fernet.decrypt(payload))
+    except (InvalidToken, ValueError):
+        # Other password (changed, or another user's guess): not ours to read
+        return False
+
+    now = time.time()
+    ctx.session.cookies.clear()
+    for c in data["cookies"]:
+        if c["expires"] and c["expires"] < now:
+            continue
+        ctx.session.cookies.set(c["name"], c["value"], domain=c["domain"], path=c["path"],
+                                expires=c["expires"], secure=c["secure"])
+    ctx.available_accounts = data["accounts"]
+    if data["accounts"] and not ctx.hesap_dizini.hesaplar():
+        # Keeps its original age, so the TTL still applies after a restart
+        ctx.hesap_dizini.guncelle(data["accounts"], fetched_at=data.get("accounts_fetched_at"))
+    ctx.current_account_id = data["current_account_id"]
+    ctx.current_account_name = data["current_account_name"]
+
+    if oturum_gecerli_mi(ctx):
+        return True
+    ctx.session.cookies.clear()
+    ctx.jsf.temizle()
+    ctx.current_account_id = None
+    unut(ctx)
+    return False
@@ -0,0 +1,164 @@
+import threading
+import time
+
+from bot.constants import USER_AGENT
+from bot.trace import TracedSession
+from bot.jsf import JsfClient
+from bot.auth import login
+from bot.drafts import TaslakSayfasiCache
+from bot import session_store
+
+# An account whose login/switch failed is not tried again for this many
+# seconds; the wait doubles on every further failure, up to the maximum
+HESAP_BEKLEME_SECONDS = 300
+HESAP_BEKLEME_MAX_SECONDS = 3600
+
+
+def new_session(owner=None):
+    """Creates a traced requests.Session with the headers 2DWorkflow expects."""
+    session = TracedSession(owner)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+    })
+    return session
+
+
+class AccountSession:
+    """
+    A logged-in session pinned to a single store account.
+
+    Behaves like the owning GlobalManager (logs, watch list, settings are
+    delegated), but carries its own session and account state, so the
+    backend functions can be called with it in place of the manager.
+    """
+
+    def __init__(self, mgr, account_id, account_name="Bilinmiyor"):
+        self.mgr = mgr
+        self.pinned_account_id = account_id
+        self.session = new_session(mgr.email)
+        self.jsf = JsfClient(self.session)
+        self.available_accounts = []
+        self.current_account_id = None
+        self.current_account_name = account_name
+        self.draft_page = TaslakSayfasiCache()
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Only called for attributes not set on the instance
+        return getattr(self.mgr, name)
+
+    @property
+    def is_ready(self):
+        return bool(self.session.cookies) and self.current_account_id == self.pinned_account_id
+
+    def ensure_ready(self):
+        """Logs in and selects the pinned account if the session is not already on it."""
+        with self.lock:
+            if self.is_ready:
+                return True
+            # A session saved by an earlier process is tried before a full login
+            if not self.session.cookies and session_store.geri_yukle(self) and self.is_ready:
+                return True
+            # login() re-selects pinned_account_id after fetching the account list
+            if not login(self):
+                return False
+            session_store.kaydet(self)
+            return self.is_ready
+
+    def invalidate(self):
+        """Forgets the session so the next ensure_ready logs in again."""
+        with self.lock:
+            self.session.cookies.clear()
+            self.jsf.temizle()
+            self.current_account_id = None
+
+    def close(self):
+        self.session.close()
+
+
+class SessionPool:
+    """
+    One AccountSession per store account of a login.
+
+    The scheduler takes each account's session from here, so drafts of
+    different accounts never have to switch the account of a shared session.
+    """
+
+    def __init__(self, mgr):
+        self.mgr = mgr
+        self._sessions = {}
+        # account_id -> (time.monotonic() until which it is not tried, last wait)
+        self._bekleyenler = {}
+        self._lock = threading.Lock()
+
+    def get(self, account_id, account_name="Bilinmiyor"):
+        """
+        Returns a ready session for the account, or None if login/switch failed.
+        After a failure the account is skipped without a login until its wait
+        is over (see bekleme).
+        """
+        with self._lock:
+            if self._bekleme(account_id) > 0:
+                return None
+            ctx = self._sessions.get(account_id)
+            if ctx is None:
+                ctx = AccountSession(self.mgr, account_id, account_name)
+                self._sessions[account_id] = ctx
+
+        if not ctx.ensure_ready():
+            with self._lock:
+                _, son = self._bekleyenler.get(account_id, (0, 0))
+                sure = min(son * 2, HESAP_BEKLEME_MAX_SECONDS) if son else HESAP_BEKLEME_SECONDS
+                self._bekleyenler[account_id] = (time.monotonic() + sure, sure)
+            return None
+        with self._lock:
+            self._bekleyenler.pop(account_id, None)
+        return ctx
+
+    def _bekleme(self, account_id):
+        kayit = self._bekleyenler.get(account_id)
+        return max(0.0, kayit[0] - time.monotonic()) if kayit else 0.0
+
+    def bekleme(self, account_id):
+        """Seconds until a failed account is tried again (0 if it is not waiting)."""
+        with self._lock:
+            return self._bekleme(account_id)
+
+    def yeni_dongu(self):
+        """Called at the start of a cycle: cached draft lists must be fetched again."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for ctx in sessions:
+            ctx.draft_page.invalidate()
+
+    def isit(self, accounts, bitis=None):
+        """
+        Pre-warm before a cycle: probes the session of every account in
+        {account_id: account_name} and logs in again where it expired, so the
+        cycle starts on valid sessions. Missing sessions are restored or created.
+        Stops at bitis (a time.monotonic() value), leaving the rest to the cycle.
+        """
+        for account_id, account_name in accounts.items():
+            if bitis is not None and time.monotonic() >= bitis:
+                break
+            with self._lock:
+                ctx = self._sessions.get(account_id)
+            if ctx is not None and ctx.is_ready and not session_store.oturum_gecerli_mi(ctx):
+                ctx.invalidate()
+            self.get(account_id, account_name)
+
+    def kaydet(self):
+        """Saves the cookies of all pooled sessions (they may have been renewed during a cycle)."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for ctx in sessions:
+            session_store.kaydet(ctx)
+
+    def reset(self):
+        """Drops all pooled sessions (e.g. after the password changed)."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._bekleyenler.clear()
+        for ctx in sessions:
+            ctx.close()
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+import requests
+
+from bot.constants import JSF_VIEWSTATE
+from bot.database import save_trace_records
+
+# Per-request HTTP tracing: every request of a TracedSession is recorded with the
+# logical step it belongs to, grouped per scheduler cycle.
+
+RECENT_CYCLES = 20  # cycle summaries kept in memory per user
+
+_context = threading.local()
+_active = {}                                        # owner -> CycleTrace
+_recent = defaultdict(lambda: deque(maxlen=RECENT_CYCLES))
+_lock = threading.Lock()
+
+@contextmanager
+def adim(step):
+    """Labels this thread's requests inside the block (also usable as a decorator)."""
+    previous = getattr(_context, "step", None)
+    _context.step = step
+    try:
+        yield
+    finally:
+        _context.step = previous
+
+@contextmanager
+def baglam(account=None, draft_key=None):
+    """Tags this thread's requests inside the block with an account and draft key."""
+    previous = (getattr(_context, "account", None), getattr(_context, "draft_key", None))
+    _context.account, _context.draft_key = account, draft_key
+    try:
+        yield
+    finally:
+        _context.account, _context.draft_key = previous
+
+
+class CycleTrace:
+    """The requests of one scheduler cycle of one user."""
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.started = time.time()
+        self.finished = None
+        self.records = []
+        self.lock = threading.Lock()
+
+    def add(self, record):
+        with self.lock:
+            self.records.append(record)
+
+    def ozet(self):
+        """Per-step totals: {step: {requests, total_ms, max_ms, bytes}}, slowest step first."""
+        steps = {}
+        with self.lock:
+            records = list(self.records)
+        for r in records:
+            s = steps.setdefault(r["step"], {"requests": 0, "total_ms": 0.0, "max_ms": 0.0, "bytes": 0})
+            s["requests"] += 1
+            s["total_ms"] += r["elapsed_ms"]
+            s["max_ms"] = max(s["max_ms"], r["elapsed_ms"])
+            s["bytes"] += r["bytes"]
+        return dict(sorted(steps.items(), key=lambda kv: -kv[1]["total_ms"]))
+
+
+@contextmanager
+def sayac(owner):
+    """
+    Totals of the requests made inside the block under this thread's
+    account/draft key (see baglam), taken from the owner's active cycle trace.
+    Yields {"requests", "bytes"}, filled in when the block ends (left at 0
+    outside a cycle).
+    """
+    stats = {"requests": 0, "bytes": 0}
+    trace = _active.get(owner)
+    if trace is None:
+        yield stats
+        return
+    key = (getattr(_context, "account", None), getattr(_context, "draft_key", None))
+    with trace.lock:
+        start = len(trace.records)
+    try:
+        yield stats
+    finally:
+        with trace.lock:
+            records = trace.records[start:]
+        for r in records:
+            if (r["account"], r["draft_key"]) == key:
+                stats["requests"] += 1
+                stats["bytes"] += r["bytes"]
+
+
+def dongu_baslat(owner):
+    """Starts collecting the owner's requests into a new cycle trace."""
+    trace = CycleTrace(owner)
+    with _lock:
+        _active[owner] = trace
+    return trace
+
+def dongu_bitir(owner):
+    """Closes the owner's active cycle, keeps its summary and stores its records."""
+    with _lock:
+        trace = _active.pop(owner, None)
+    if trace is None: return None
+    trace.finished = time.time()
+    with _lock:
+        _recent[owner].appendleft(trace)
+    if trace.records:
+        save_trace_records(trace.records)
+    return trace
+
+def son_donguler(owner):
+    """Recent cycle traces of the owner, newest first."""
+    with _lock:
+        return list(_recent[owner])
+
+
+class TracedSession(requests.Session):
+    """requests.Session that records every request into its owner's active cycle."""
+
+    def __init__(self, owner=None):
+        super().__init__()
+        self.owner = owner
+
+    def request(self, method, url, *args, **kwargs):
+        trace = _active.get(self.owner)
+        if trace is None:
+            return super().request(method, url, *args, **kwargs)
+
+        data = kwargs.get("data")
+        sent_vs = data.get(JSF_VIEWSTATE) if isinstance(data, dict) else None
+        status, size = None, 0
+        started = time.perf_counter()
+        try:
+            res = super().request(method, url, *args, **kwargs)
+            status, size = res.status_code, len(res.content)
+            return res
+        finally:
+            trace.add({
+                "cycle_id": trace.id,
+                "ts": datetime.now().isoformat(timespec="milliseconds"),
+                "owner_email": self.owner,
+                "account": getattr(_context, "account", None),
+                "draft_key": getattr(_context, "draft_key", None),
+                "step": getattr(_context, "step", None) or "other",
+                "method": method.upper(),
+                "path": urlsplit(url).path,
+                "status": status,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                "bytes": size,
+                "viewstate_bytes": len(sent_vs) if sent_vs else 0,
+            })
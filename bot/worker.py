@@ -0,0 +1,198 @@
+"""
+Headless worker: owns the managers, sessions and the scheduler, so checks
+keep running while the Streamlit UI reruns, crashes or is redeployed.
+
+    python -m bot.worker --host 127.0.0.1 --port 8600
+
+The UI talks to it through bot.remote.RemoteManager when BOT_WORKER_URL is set.
+BOT_WORKER_TOKEN must be set; every request has to carry it in X-Worker-Token.
+"""
+import argparse
+import hmac
+import os
+import sys
+import threading
+from typing import Any, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException
+from pydantic import BaseModel
+
+from bot.manager import GlobalManager
+
+WORKER_TOKEN = os.environ.get("BOT_WORKER_TOKEN", "")
+
+# Same role as app.py's BOT_STORE: one manager per e-mail for the life of the process
+BOT_STORE = {}
+_store_lock = threading.Lock()
+
+
+class LoginIstegi(BaseModel):
+    email: str
+    password: str
+    teams_webhook_url: Optional[str] = None
+
+class AyarIstegi(BaseModel):
+    scheduler_mode: Optional[str] = None
+    mins_threshold: Optional[int] = None
+    mile_threshold: Optional[int] = None
+    max_parallel_drafts: Optional[int] = None
+
+class LogIstegi(BaseModel):
+    message: str
+    type: str = "info"
+
+class HesapIstegi(BaseModel):
+    account_id: str
+
+
+def token_kontrol(x_worker_token: str = Header(default="")):
+    # No token configured means nobody gets in (main() refuses to start without one)
+    if not WORKER_TOKEN or not hmac.compare_digest(x_worker_token.encode(), WORKER_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid worker token")
+
+def manager_al(email: str) -> GlobalManager:
+    mgr = BOT_STORE.get(email)
+    if mgr is None:
+        raise HTTPException(status_code=404, detail="No session for this user, log in first")
+    return mgr
+
+
+app = FastAPI(title="2DWorkflow Bot Worker", dependencies=[Depends(token_kontrol)])
+
+# Handlers are plain functions: FastAPI runs them on its thread pool, so a
+# slow 2DWorkflow request never blocks the other endpoints.
+
+@app.get("/health")
+def health():
+    return {"ok": True, "users": len(BOT_STORE)}
+
+@app.post("/login")
+def giris(req: LoginIstegi):
+    with _store_lock:
+        mgr = BOT_STORE.get(req.email)
+    if mgr is not None:
+        # Already running for this user: reconnect, but only with this user's password
+        if not mgr.sifre_dogrula(req.password):
+            return {"ok": False, "existing": True}
+        mgr.password = req.password
+        return {"ok": True, "existing": True}
+    mgr = GlobalManager(req.email, req.password, req.teams_webhook_url)
+    if not mgr.giris_yap():
+        return {"ok": False, "existing": False}
+    with _store_lock:
+        mgr = BOT_STORE.setdefault(req.email, mgr)
+    return {"ok": True, "existing": False}
+
+@app.get("/users/{email}/state")
+def durum(email: str):
+    return manager_al(email).durum()
+
+@app.post("/users/{email}/settings")
+def ayarlar(email: str, req: AyarIstegi):
+    mgr = manager_al(email)
+    changes = req.model_dump(exclude_none=True)
+    reschedule = any(k in changes and changes[k] != getattr(mgr, k) for k in ("scheduler_mode", "mins_threshold"))
+    if "mile_threshold" in changes:
+        mgr.set_mile_threshold(changes.pop("mile_threshold"))
+    for key, value in changes.items():
+        setattr(mgr, key, value)
+    if reschedule and mgr.is_running:
+        mgr.start_bot_process()
+    return mgr.durum()
+
+@app.post("/users/{email}/start")
+def baslat(email: str, run_now: bool = False):
+    mgr = manager_al(email)
+    mgr.is_running = True
+    mgr.start_bot_process()
+    if run_now:
+        mgr.run_now()
+    return mgr.durum()
+
+@app.post("/users/{email}/stop")
+def durdur(email: str):
+    mgr = manager_al(email)
+    mgr.is_running = False
+    mgr.stop_bot_process()
+    return mgr.durum()
+
+@app.post("/users/{email}/run-now")
+def simdi_calistir(email: str):
+    manager_al(email).run_now()
+    return {"ok": True}
+
+@app.post("/users/{email}/logs")
+def log_ekle(email: str, req: LogIstegi):
+    manager_al(email).add_log(req.message, req.type)
+    return {"ok": True}
+
+@app.get("/users/{email}/logs")
+def log_sayfasi(email: str, before_id: Optional[int] = None, limit: int = 50):
+    return manager_al(email).get_log_page(before_id=before_id, limit=limit)
+
+@app.get("/users/{email}/logs/feed")
+def log_akisi(email: str, after: int = 0):
+    return manager_al(email).logs_since(after)
+
+@app.get("/users/{email}/trace")
+def http_izi(email: str, cycle_id: Optional[str] = None, group_by: str = "step"):
+    return manager_al(email).get_trace_summary(cycle_id=cycle_id, group_by=group_by)
+
+@app.get("/users/{email}/history")
+def gecmis(email: str):
+    version, history = manager_al(email).history_entries()
+    return {"version": version, "history": history}
+
+@app.post("/users/{email}/history/clear")
+def gecmisi_temizle(email: str):
+    manager_al(email).clear_history()
+    return {"ok": True}
+
+@app.get("/users/{email}/tasks")
+def gorevler(email: str):
+    mgr = manager_al(email)
+    tasks = mgr.watch_list
+    return {"version": mgr.tasks_version, "tasks": tasks}
+
+@app.post("/users/{email}/tasks")
+def gorev_ekle(email: str, task: dict[str, Any]):
+    manager_al(email).save_task(task)
+    return {"ok": True}
+
+@app.put("/users/{email}/tasks")
+def gorevleri_guncelle(email: str, records: list[dict[str, Any]]):
+    manager_al(email).update_watch_list_from_df(records)
+    return {"ok": True}
+
+@app.get("/users/{email}/drafts")
+def taslaklar(email: str):
+    df, hata = manager_al(email).taslaklari_getir()
+    if df is None:
+        return {"columns": [], "records": [], "error": hata}
+    return {"columns": list(df.columns), "records": df.to_dict("records"), "error": hata}
+
+@app.post("/users/{email}/accounts/fetch")
+def hesaplari_getir(email: str, refresh: bool = False):
+    mgr = manager_al(email)
+    return {"ok": bool(mgr.hesaplari_getir(yenile=refresh)), "accounts": mgr.available_accounts}
+
+@app.post("/users/{email}/accounts/switch")
+def hesap_degistir(email: str, req: HesapIstegi):
+    mgr = manager_al(email)
+    return {"ok": bool(mgr.hesap_degistir(req.account_id))}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="2DWorkflow bot worker")
+    parser.add_argument("--host", default=os.environ.get("BOT_WORKER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("BOT_WORKER_PORT", "8600")))
+    args = parser.parse_args()
+    if not WORKER_TOKEN:
+        sys.exit("BOT_WORKER_TOKEN is not set; the worker would accept anyone's requests.")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()